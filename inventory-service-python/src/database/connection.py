@@ -1,11 +1,21 @@
 import mysql.connector
 import os
+import threading
+import time
+from collections import deque
 from dotenv import load_dotenv
+from src.database.instrumentation import InstrumentedCursor
 
 load_dotenv()
 
-def get_db_connection():
-    """Get MySQL database connection"""
+# Connection pool configuration
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 1))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 3600))  # seconds
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))  # seconds to wait for a free connection
+
+def create_connection():
+    """Open a new MySQL database connection"""
     return mysql.connector.connect(
         host=os.getenv("DB_HOST", "localhost"),
         port=int(os.getenv("DB_PORT", 3306)),
@@ -15,10 +25,192 @@ def get_db_connection():
         autocommit=False
     )
 
+class PooledConnection:
+    """Connection proxy that returns the underlying connection to the pool on close()"""
+
+    def __init__(self, pool, raw, created_at: float):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        """Cursor that reports statements to the per-request query stats"""
+        return InstrumentedCursor(self._raw.cursor(*args, **kwargs))
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._pool.release(self._raw, self._created_at)
+
+class ConnectionPool:
+    """Thread-safe MySQL connection pool with health checks, recycling and metrics"""
+
+    def __init__(self, min_size: int, max_size: int, recycle: int, timeout: float):
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.recycle = recycle
+        self.timeout = timeout
+        self._idle = deque()
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {
+            "acquired": 0,
+            "timeouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "health_check_failures": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+            "peak_in_use": 0
+        }
 
+    def fill(self):
+        """Open connections up to min_size"""
+        with self._cond:
+            while self._size < self.min_size:
+                self._idle.append((create_connection(), time.time()))
+                self._size += 1
+                self._stats["created"] += 1
 
+    def _is_healthy(self, raw, created_at: float) -> bool:
+        if self.recycle and time.time() - created_at > self.recycle:
+            self._stats["recycled"] += 1
+            return False
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except Exception:
+            self._stats["health_check_failures"] += 1
+            return False
 
+    def _discard(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
 
+    def acquire(self) -> PooledConnection:
+        """Check out a healthy connection, waiting up to timeout if the pool is exhausted"""
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise Exception("Database connection pool is closed")
+                if self._idle:
+                    raw, created_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    raw, created_at = None, 0.0
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise Exception(f"Timed out waiting for a database connection ({self.max_size} in use)")
+                self._cond.wait(remaining)
 
+        # Health check / connect outside the lock
+        try:
+            if raw is not None and not self._is_healthy(raw, created_at):
+                self._discard(raw)
+                raw = None
+            if raw is None:
+                raw = create_connection()
+                created_at = time.time()
+                self._stats["created"] += 1
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        wait_ms = (time.perf_counter() - started) * 1000
+        with self._cond:
+            self._stats["acquired"] += 1
+            self._stats["total_wait_ms"] += wait_ms
+            self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], wait_ms)
+            in_use = self._size - len(self._idle)
+            self._stats["peak_in_use"] = max(self._stats["peak_in_use"], in_use)
+        return PooledConnection(self, raw, created_at)
+
+    def release(self, raw, created_at: float):
+        """Return a connection to the pool, ending any open transaction"""
+        try:
+            # Roll back so the next borrower starts with a fresh snapshot
+            raw.rollback()
+            reusable = not self._closed
+        except Exception:
+            reusable = False
+        with self._cond:
+            if reusable:
+                self._idle.append((raw, created_at))
+            else:
+                self._size -= 1
+                self._discard(raw)
+            self._cond.notify()
+
+    def close(self):
+        """Close all idle connections; in-use connections are closed on release"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                raw, _ = self._idle.pop()
+                self._size -= 1
+                self._discard(raw)
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            acquired = self._stats["acquired"]
+            idle = len(self._idle)
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": idle,
+                "in_use": self._size - idle,
+                "occupancy": round((self._size - idle) / self.max_size, 3),
+                "avg_wait_ms": round(self._stats["total_wait_ms"] / acquired, 3) if acquired else 0.0,
+                **{k: (round(v, 3) if isinstance(v, float) else v) for k, v in self._stats.items()}
+            }
+
+pool = None
+_pool_lock = threading.Lock()
+
+def init_pool():
+    """Initialize the MySQL connection pool"""
+    global pool
+    with _pool_lock:
+        if pool is None:
+            new_pool = ConnectionPool(DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_RECYCLE, DB_POOL_TIMEOUT)
+            try:
+                new_pool.fill()
+            except Exception:
+                new_pool.close()
+                raise
+            pool = new_pool
+    return pool
+
+def get_db_connection():
+    """Get MySQL database connection from the pool (close() returns it to the pool)"""
+    if pool is None:
+        init_pool()
+    return pool.acquire()
 
+def get_pool_stats() -> dict:
+    """Get connection pool occupancy and wait-time metrics"""
+    return pool.stats() if pool else {}
 
+def close_pool():
+    """Close the connection pool"""
+    global pool
+    with _pool_lock:
+        if pool:
+            pool.close()
+            pool = None
@@ -0,0 +1,151 @@
+"""
+SQL statement instrumentation
+Every cursor handed out by the pool counts statements, rows and time into the current request's QueryStats
+(a context variable, so it follows resolvers into the executor threads). Statements slower than
+SLOW_QUERY_MS are written to the slow-query log together with the GraphQL operation name.
+"""
+import os
+import json
+import time
+import threading
+import contextvars
+from datetime import datetime
+from typing import Optional, Dict, Any
+from dotenv import load_dotenv
+from src.tracing import TRACING_ENABLED, record_span
+
+load_dotenv()
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))  # 0 disables the slow-query log
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "")  # JSON-lines file, empty logs to stdout only
+
+class QueryStats:
+    """Statement, row and timing counters for one GraphQL operation"""
+
+    def __init__(self, operation_name: Optional[str] = None):
+        self.operation_name = operation_name or "anonymous"
+        self.statements = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.slow = 0
+        self._lock = threading.Lock()
+
+    def record(self, elapsed_ms: float, rows: int, slow: bool):
+        with self._lock:
+            self.statements += 1
+            self.rows += max(rows, 0)
+            self.total_ms += elapsed_ms
+            self.slow += int(slow)
+
+    def add_rows(self, rows: int):
+        with self._lock:
+            self.rows += rows
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "operation": self.operation_name,
+                "statements": self.statements,
+                "rows": self.rows,
+                "total_ms": round(self.total_ms, 3),
+                "slow": self.slow
+            }
+
+_current: contextvars.ContextVar = contextvars.ContextVar("query_stats", default=None)
+_totals = QueryStats("all")
+_log_lock = threading.Lock()
+
+def start_request(operation_name: Optional[str] = None) -> QueryStats:
+    """Begin counting statements for the current request"""
+    stats = QueryStats(operation_name)
+    _current.set(stats)
+    return stats
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+def get_query_totals() -> Dict[str, Any]:
+    """Process-wide statement counters (requests and background jobs)"""
+    totals = _totals.as_dict()
+    totals.pop("operation")
+    totals["slow_query_ms"] = SLOW_QUERY_MS
+    return totals
+
+def _log_slow_query(sql: str, elapsed_ms: float, rows: int, stats: Optional[QueryStats]):
+    entry = {
+        "time": datetime.now().isoformat(),
+        "operation": stats.operation_name if stats else "background",
+        "duration_ms": round(elapsed_ms, 3),
+        "rows": rows,
+        "statement": " ".join(sql.split())[:2000]
+    }
+    print(f"🐢 Slow query ({entry['duration_ms']}ms, {entry['operation']}): {entry['statement'][:200]}")
+    if SLOW_QUERY_LOG:
+        with _log_lock:
+            with open(SLOW_QUERY_LOG, "a", encoding="utf-8") as log:
+                log.write(json.dumps(entry) + "\n")
+
+def record_query(sql: str, elapsed_ms: float, rows: int):
+    """Count one executed statement against the current request and the process totals"""
+    slow = SLOW_QUERY_MS > 0 and elapsed_ms >= SLOW_QUERY_MS
+    stats = _current.get()
+    if stats is not None:
+        stats.record(elapsed_ms, rows, slow)
+    _totals.record(elapsed_ms, rows, slow)
+    if TRACING_ENABLED:
+        record_span("mysql", elapsed_ms, {"db.system": "mysql", "db.statement": " ".join(str(sql).split())[:1000], "db.rows": rows})
+    if slow:
+        _log_slow_query(str(sql), elapsed_ms, rows, stats)
+
+def record_rows(rows: int):
+    """Count rows fetched after the statement was recorded"""
+    if rows <= 0:
+        return
+    stats = _current.get()
+    if stats is not None:
+        stats.add_rows(rows)
+    _totals.add_rows(rows)
+
+class InstrumentedCursor:
+    """mysql.connector cursor proxy that times statements and counts affected and fetched rows"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def _timed(self, method, operation, params):
+        started = time.perf_counter()
+        try:
+            return method(operation, params)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            # SELECT rows are counted as they are fetched; DML reports affected rows here
+            rows = 0 if getattr(self._cursor, "with_rows", False) else self._cursor.rowcount
+            record_query(operation, elapsed_ms, rows or 0)
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        return self._timed(lambda op, p: self._cursor.execute(op, p, *args, **kwargs), operation, params)
+
+    def executemany(self, operation, seq_params):
+        return self._timed(self._cursor.executemany, operation, seq_params)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            record_rows(1)
+        return row
+
+    def fetchmany(self, size: int = 1):
+        rows = self._cursor.fetchmany(size)
+        record_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        record_rows(len(rows))
+        return rows
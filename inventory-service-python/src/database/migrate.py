@@ -100,6 +100,17 @@ def migrate():
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
         """)
 
+        # Indexes missing from tables created before they were declared (e.g. by the Node init-db script);
+        # reduceStockBatch looks movements up by reference inside its FOR UPDATE transaction
+        for table, index, columns in [
+            ("stock_movements", "idx_reference", "reference_type, reference_id")
+        ]:
+            try:
+                cursor.execute(f"ALTER TABLE {table} ADD INDEX {index} ({columns})")
+            except Exception as e:
+                if "Duplicate key name" not in str(e):
+                    print(f"⚠️  Could not add index {index} on {table}: {e}")
+
         # Insert sample suppliers
         cursor.execute("""
             INSERT IGNORE INTO suppliers (id, name, contact_person, email, phone, address) VALUES
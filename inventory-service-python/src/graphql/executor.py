@@ -0,0 +1,120 @@
+"""
+GraphQL execution modes for services with blocking (mysql.connector) resolvers
+
+- threadpool: async execution; sync resolvers are offloaded to a bounded thread pool
+- async:      async execution; sync resolvers run inline on the event loop
+- sync:       legacy graphql_sync execution on the event loop
+"""
+import os
+import time
+import asyncio
+import inspect
+import threading
+import contextvars
+from functools import wraps, partial
+from concurrent.futures import ThreadPoolExecutor
+from graphql import GraphQLObjectType
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EXECUTION_MODES = ("threadpool", "async", "sync")
+GRAPHQL_EXECUTION_MODE = os.getenv("GRAPHQL_EXECUTION_MODE", "threadpool").lower()
+GRAPHQL_EXECUTOR_WORKERS = int(os.getenv("GRAPHQL_EXECUTOR_WORKERS", 10))
+
+if GRAPHQL_EXECUTION_MODE not in EXECUTION_MODES:
+    raise ValueError(f"Invalid GRAPHQL_EXECUTION_MODE '{GRAPHQL_EXECUTION_MODE}'. Use one of: {', '.join(EXECUTION_MODES)}")
+
+class ResolverExecutor:
+    """Bounded thread pool that runs blocking resolvers off the event loop"""
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="resolver")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "errors": 0,
+            "peak_active": 0,
+            "total_queue_ms": 0.0,
+            "max_queue_ms": 0.0,
+            "total_run_ms": 0.0,
+            "max_run_ms": 0.0
+        }
+
+    def _call(self, func, submitted: float, *args, **kwargs):
+        started = time.perf_counter()
+        queue_ms = (started - submitted) * 1000
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+            self._stats["peak_active"] = max(self._stats["peak_active"], self._active)
+            self._stats["total_queue_ms"] += queue_ms
+            self._stats["max_queue_ms"] = max(self._stats["max_queue_ms"], queue_ms)
+        failed = False
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            run_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._active -= 1
+                self._stats["completed"] += 1
+                self._stats["errors"] += int(failed)
+                self._stats["total_run_ms"] += run_ms
+                self._stats["max_run_ms"] = max(self._stats["max_run_ms"], run_ms)
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking callable in the pool and await its result"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._queued += 1
+            self._stats["submitted"] += 1
+        # Copy context vars so per-request state follows the resolver into the worker
+        ctx = contextvars.copy_context()
+        call = partial(ctx.run, self._call, func, time.perf_counter(), *args, **kwargs)
+        return await loop.run_in_executor(self._executor, call)
+
+    def wrap(self, resolver):
+        """Turn a sync resolver into an async one that executes in the pool"""
+        @wraps(resolver)
+        async def offloaded(*args, **kwargs):
+            return await self.run(resolver, *args, **kwargs)
+        return offloaded
+
+    def stats(self) -> dict:
+        with self._lock:
+            completed = self._stats["completed"]
+            return {
+                "mode": GRAPHQL_EXECUTION_MODE,
+                "max_workers": self.max_workers,
+                "queued": self._queued,
+                "active": self._active,
+                "avg_queue_ms": round(self._stats["total_queue_ms"] / completed, 3) if completed else 0.0,
+                "avg_run_ms": round(self._stats["total_run_ms"] / completed, 3) if completed else 0.0,
+                **{k: (round(v, 3) if isinstance(v, float) else v) for k, v in self._stats.items()}
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+resolver_executor = ResolverExecutor(GRAPHQL_EXECUTOR_WORKERS)
+
+def offload_sync_resolvers(schema, executor: ResolverExecutor = resolver_executor):
+    """Wrap every explicitly bound sync resolver in the schema so it runs in the executor
+
+    Default (attribute lookup) resolvers are left alone, they never block.
+    """
+    for type_name, graphql_type in schema.type_map.items():
+        if type_name.startswith("__") or not isinstance(graphql_type, GraphQLObjectType):
+            continue
+        for field in graphql_type.fields.values():
+            resolver = field.resolve
+            if resolver is not None and not inspect.iscoroutinefunction(resolver):
+                field.resolve = executor.wrap(resolver)
+    return schema
@@ -0,0 +1,147 @@
+"""
+Ariadne extensions shared by the GraphQL endpoint
+"""
+import os
+import re
+import time
+from inspect import isawaitable
+from typing import Optional, Dict, Any
+from ariadne.types import Extension
+from src.database.instrumentation import start_request
+from src.graphql.metrics import resolver_duration, resolver_errors, operation_duration, operations_total, operations_in_flight
+from src.tracing import TRACING_ENABLED, start_span, activate, deactivate
+
+DEBUG = os.getenv("DEBUG", "False").lower() == "true"
+
+_OPERATION_RE = re.compile(r"^\s*(?:query|mutation|subscription)\s+(\w+)")
+
+def get_operation_name(data: Any) -> Optional[str]:
+    """operationName from the request body, falling back to the name in the document"""
+    if not isinstance(data, dict):
+        return None
+    if data.get("operationName"):
+        return data["operationName"]
+    match = _OPERATION_RE.match(data.get("query") or "")
+    return match.group(1) if match else None
+
+class QueryStatsExtension(Extension):
+    """Counts SQL statements per operation; the counters are added to `extensions.sql` in debug mode"""
+
+    def __init__(self):
+        self.stats = None
+
+    def request_started(self, context: Dict[str, Any]):
+        self.stats = start_request(context.get("operation_name"))
+        context["query_stats"] = self.stats
+
+    def format(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        if DEBUG and self.stats is not None:
+            return {"sql": self.stats.as_dict()}
+        return {}
+
+class MetricsExtension(Extension):
+    """Records resolver latency/errors and operation latency/in-flight gauges for /metrics
+
+    Only fields with a bound resolver are timed; default attribute lookups are skipped.
+    """
+
+    def __init__(self):
+        self.started = 0.0
+        self.operation = "anonymous"
+        self.failed = False
+
+    def request_started(self, context: Dict[str, Any]):
+        self.started = time.perf_counter()
+        self.operation = context.get("operation_name") or "anonymous"
+        operations_in_flight.inc()
+
+    def request_finished(self, context: Dict[str, Any]):
+        operations_in_flight.dec()
+        operation_duration.observe(time.perf_counter() - self.started, self.operation)
+        operations_total.inc(self.operation, "error" if self.failed else "success")
+
+    def has_errors(self, errors, context: Dict[str, Any]):
+        self.failed = True
+
+    def resolve(self, next_, obj, info, **kwargs):
+        field = info.parent_type.fields.get(info.field_name)
+        if field is None or field.resolve is None:
+            return next_(obj, info, **kwargs)
+        labels = (info.parent_type.name, info.field_name)
+        started = time.perf_counter()
+        try:
+            result = next_(obj, info, **kwargs)
+        except Exception:
+            resolver_errors.inc(*labels)
+            resolver_duration.observe(time.perf_counter() - started, *labels)
+            raise
+        if isawaitable(result):
+            return self._await(result, labels, started)
+        resolver_duration.observe(time.perf_counter() - started, *labels)
+        return result
+
+    async def _await(self, result, labels: tuple, started: float):
+        try:
+            return await result
+        except Exception:
+            resolver_errors.inc(*labels)
+            raise
+        finally:
+            resolver_duration.observe(time.perf_counter() - started, *labels)
+
+class TracingExtension(Extension):
+    """Opens a server span per operation (continuing the caller's traceparent) and a child span per bound resolver"""
+
+    def __init__(self):
+        self.span = None
+        self.token = None
+
+    def request_started(self, context: Dict[str, Any]):
+        operation = context.get("operation_name") or "anonymous"
+        self.span = start_span(
+            f"graphql {operation}", "server", context.get("trace_parent"),
+            {"graphql.operation.name": operation}
+        )
+        self.token = activate(self.span)
+
+    def request_finished(self, context: Dict[str, Any]):
+        deactivate(self.token)
+        if self.span is not None:
+            self.span.end()
+
+    def has_errors(self, errors, context: Dict[str, Any]):
+        if self.span is not None:
+            self.span.record_error("; ".join(str(error) for error in errors)[:500])
+
+    def resolve(self, next_, obj, info, **kwargs):
+        if not TRACING_ENABLED:
+            return next_(obj, info, **kwargs)
+        field = info.parent_type.fields.get(info.field_name)
+        if field is None or field.resolve is None:
+            return next_(obj, info, **kwargs)
+        span = start_span(f"{info.parent_type.name}.{info.field_name}", "internal")
+        token = activate(span)
+        try:
+            result = next_(obj, info, **kwargs)
+        except Exception as e:
+            span.record_error(e)
+            span.end()
+            raise
+        finally:
+            deactivate(token)
+        if isawaitable(result):
+            return self._await(result, span)
+        span.end()
+        return result
+
+    async def _await(self, result, span):
+        # Re-activate inside the coroutine so SQL and outbound calls nest under this resolver
+        token = activate(span)
+        try:
+            return await result
+        except Exception as e:
+            span.record_error(e)
+            raise
+        finally:
+            deactivate(token)
+            span.end()
@@ -0,0 +1,84 @@
+"""
+Per-request batch loaders (DataLoader style) for inventory resolvers
+Rows fetched by id are collapsed into one WHERE id IN (...) query and cached for the rest of the operation
+"""
+import threading
+from typing import Optional, Dict, Any, Iterable
+from src.database.connection import get_db_connection
+
+class BatchLoader:
+    """Load rows of one table by key, batching misses and caching hits for a single request"""
+
+    def __init__(self, table: str, key_column: str = "id"):
+        self.table = table
+        self.key_column = key_column
+        self.queries = 0
+        self._rows: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def prime(self, rows: Iterable[Dict[str, Any]]):
+        """Seed the cache with rows already fetched by the caller"""
+        with self._lock:
+            for row in rows:
+                self._rows[str(row[self.key_column])] = row
+
+    def load_many(self, keys: Iterable[Any], cursor=None) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Return {str(key): row or None}, fetching every uncached key in one query
+
+        Uses the caller's cursor when given, otherwise borrows a pooled connection.
+        """
+        wanted = {str(key) for key in keys if key is not None}
+        with self._lock:
+            missing = [key for key in wanted if key not in self._rows]
+        if missing:
+            self._fetch(missing, cursor)
+        with self._lock:
+            return {key: self._rows.get(key) for key in wanted}
+
+    def load(self, key: Any, cursor=None) -> Optional[Dict[str, Any]]:
+        """Return one row (or None), fetching it only if it is not cached yet"""
+        if key is None:
+            return None
+        return self.load_many([key], cursor).get(str(key))
+
+    def _fetch(self, keys: list, cursor=None):
+        placeholders = ", ".join(["%s"] * len(keys))
+        sql = f"SELECT * FROM {self.table} WHERE {self.key_column} IN ({placeholders})"
+        if cursor is not None:
+            cursor.execute(sql, keys)
+            rows = cursor.fetchall()
+        else:
+            conn = get_db_connection()
+            own_cursor = conn.cursor(dictionary=True)
+            try:
+                own_cursor.execute(sql, keys)
+                rows = own_cursor.fetchall()
+            finally:
+                own_cursor.close()
+                conn.close()
+        with self._lock:
+            self.queries += 1
+            for key in keys:
+                self._rows.setdefault(key, None)
+            for row in rows:
+                self._rows[str(row[self.key_column])] = row
+
+class Loaders:
+    """Loaders shared by all resolvers of one GraphQL operation"""
+
+    def __init__(self):
+        self.suppliers = BatchLoader("suppliers")
+        self.ingredients = BatchLoader("ingredients")
+
+_context_lock = threading.Lock()
+
+def get_loaders(info) -> Loaders:
+    """Get (or create) the loaders stored on the request context"""
+    context = info.context
+    loaders = context.get("loaders")
+    if loaders is None:
+        with _context_lock:
+            loaders = context.get("loaders")
+            if loaders is None:
+                loaders = context["loaders"] = Loaders()
+    return loaders
@@ -1,15 +1,20 @@
 from typing import Optional, Dict, Any
 from datetime import datetime
 import time
+import asyncio
 from ariadne import QueryType, MutationType, ObjectType
 from src.database.connection import get_db_connection
 from src.auth import require_auth, require_min_role
+from src.graphql.loaders import get_loaders
+from src.graphql.projection import project
 from src.services.toko_sembako_client import (
     get_products_from_toko_sembako,
-    get_product_by_id_from_toko_sembako,
     check_stock_from_toko_sembako,
     create_order_at_toko_sembako,
-    get_order_status_from_toko_sembako
+    get_order_status_from_toko_sembako,
+    get_products_by_ids_from_toko_sembako,
+    check_stock_bulk_from_toko_sembako,
+    invalidate_toko_sembako_cache
 )
 
 # Service startup time for uptime calculation
@@ -38,15 +43,29 @@ def resolve_health(_, info):
         'timestamp': datetime.utcnow().isoformat() + 'Z'
     }
 
+# Ingredient field -> ingredients columns, for projecting listings onto the selection set
+INGREDIENT_COLUMNS = {
+    'id': ('id',),
+    'name': ('name',),
+    'unit': ('unit',),
+    'category': ('category',),
+    'minStockLevel': ('min_stock_level',),
+    'currentStock': ('current_stock',),
+    'supplier': ('supplier_id',),
+    'costPerUnit': ('cost_per_unit',),
+    'status': ('status',)
+}
+
 # Query resolvers
 @query.field("ingredients")
 def resolve_ingredients(_, info, category: Optional[str] = None, status: Optional[str] = None):
-    """Get all ingredients"""
+    """Get all ingredients (only the selected columns; suppliers are loaded only when selected)"""
     conn = get_db_connection()
     cursor = conn.cursor(dictionary=True)
     
     try:
-        query_sql = "SELECT * FROM ingredients"
+        columns, fields = project(info, INGREDIENT_COLUMNS)
+        query_sql = f"SELECT {columns} FROM ingredients"
         params = []
         conditions = []
         
@@ -64,12 +83,17 @@ def resolve_ingredients(_, info, category: Optional[str] = None, status: Optiona
         cursor.execute(query_sql, params)
         ingredients_data = cursor.fetchall()
         
+        # One query for the suppliers of every row instead of one per ingredient
+        with_supplier = 'supplier' in fields
+        suppliers_by_id = get_loaders(info).suppliers.load_many(
+            [ing.get('supplier_id') for ing in ingredients_data], cursor
+        ) if with_supplier else {}
+        
         result = []
         for ing in ingredients_data:
             supplier_data = None
-            if ing.get('supplier_id'):
-                cursor.execute("SELECT * FROM suppliers WHERE id = %s", (ing['supplier_id'],))
-                sup = cursor.fetchone()
+            if with_supplier and ing.get('supplier_id'):
+                sup = suppliers_by_id.get(str(ing['supplier_id']))
                 if sup:
                     supplier_data = {
                         'id': str(sup['id']),
@@ -83,14 +107,14 @@ def resolve_ingredients(_, info, category: Optional[str] = None, status: Optiona
             
             result.append({
                 'id': str(ing['id']),
-                'name': ing['name'],
-                'unit': ing['unit'],
+                'name': ing.get('name', ""),
+                'unit': ing.get('unit', ""),
                 'category': ing.get('category'),
                 'minStockLevel': float(ing.get('min_stock_level', 0)),
                 'currentStock': float(ing.get('current_stock', 0)),
                 'supplier': supplier_data,
                 'costPerUnit': float(ing.get('cost_per_unit', 0)),
-                'status': ing['status']
+                'status': ing.get('status', "")
             })
         
         return result
@@ -290,12 +314,16 @@ def resolve_low_stock_ingredients(_, info):
         """)
         ingredients_data = cursor.fetchall()
         
+        # One query for the suppliers of every row instead of one per ingredient
+        suppliers_by_id = get_loaders(info).suppliers.load_many(
+            [ing.get('supplier_id') for ing in ingredients_data], cursor
+        )
+        
         result = []
         for ing in ingredients_data:
             supplier_data = None
             if ing.get('supplier_id'):
-                cursor.execute("SELECT * FROM suppliers WHERE id = %s", (ing['supplier_id'],))
-                sup = cursor.fetchone()
+                sup = suppliers_by_id.get(str(ing['supplier_id']))
                 if sup:
                     supplier_data = {
                         'id': str(sup['id']),
@@ -340,12 +368,16 @@ def resolve_out_of_stock_ingredients(_, info):
         """)
         ingredients_data = cursor.fetchall()
         
+        # One query for the suppliers of every row instead of one per ingredient
+        suppliers_by_id = get_loaders(info).suppliers.load_many(
+            [ing.get('supplier_id') for ing in ingredients_data], cursor
+        )
+        
         result = []
         for ing in ingredients_data:
             supplier_data = None
             if ing.get('supplier_id'):
-                cursor.execute("SELECT * FROM suppliers WHERE id = %s", (ing['supplier_id'],))
-                sup = cursor.fetchone()
+                sup = suppliers_by_id.get(str(ing['supplier_id']))
                 if sup:
                     supplier_data = {
                         'id': str(sup['id']),
@@ -439,6 +471,42 @@ def resolve_stock_movements(_, info, ingredientId: Optional[str] = None, movemen
         cursor.close()
         conn.close()
 
+def load_purchase_order_items(cursor, info, orders: list) -> Dict[Any, list]:
+    """Load items for a page of purchase orders, grouped by purchase_order_id
+
+    Items, their ingredients and the suppliers of both orders and ingredients
+    are fetched with one query each and primed into the request loaders.
+    """
+    if not orders:
+        return {}
+    order_ids = [order['id'] for order in orders]
+    placeholders = ", ".join(["%s"] * len(order_ids))
+    cursor.execute(
+        f"SELECT * FROM purchase_order_items WHERE purchase_order_id IN ({placeholders}) ORDER BY id",
+        order_ids
+    )
+    items = cursor.fetchall()
+    
+    loaders = get_loaders(info)
+    ingredients_by_id = loaders.ingredients.load_many([item['ingredient_id'] for item in items], cursor)
+    loaders.suppliers.load_many(
+        [order.get('supplier_id') for order in orders] +
+        [ing.get('supplier_id') for ing in ingredients_by_id.values() if ing],
+        cursor
+    )
+    
+    items_by_order = {}
+    for item in items:
+        items_by_order.setdefault(item['purchase_order_id'], []).append({
+            'id': str(item['id']),
+            'ingredient_id': item['ingredient_id'],
+            'quantity': float(item['quantity']),
+            'unitPrice': float(item['price_per_unit']),
+            'totalPrice': float(item['quantity'] * item['price_per_unit']),
+            'receivedQuantity': float(item.get('received_quantity', 0))
+        })
+    return items_by_order
+
 @query.field("purchaseOrders")
 def resolve_purchase_orders(_, info, status: Optional[str] = None):
     """Get all purchase orders"""
@@ -457,23 +525,11 @@ def resolve_purchase_orders(_, info, status: Optional[str] = None):
         cursor.execute(query_sql, params)
         orders = cursor.fetchall()
         
+        # Items, their ingredients and all suppliers for the page: one query each
+        items_by_order = load_purchase_order_items(cursor, info, orders)
+        
         result = []
         for order in orders:
-            # Fetch items
-            cursor.execute("SELECT * FROM purchase_order_items WHERE purchase_order_id = %s", (order['id'],))
-            items = cursor.fetchall()
-            
-            items_data = []
-            for item in items:
-                items_data.append({
-                    'id': str(item['id']),
-                    'ingredient_id': item['ingredient_id'], 
-                    'quantity': float(item['quantity']),
-                    'unitPrice': float(item['price_per_unit']),
-                    'totalPrice': float(item['quantity'] * item['price_per_unit']),
-                    'receivedQuantity': float(item.get('received_quantity', 0))
-                })
-
             result.append({
                 'id': str(order['id']),
                 'supplier_id': order['supplier_id'],
@@ -484,7 +540,7 @@ def resolve_purchase_orders(_, info, status: Optional[str] = None):
                 'expectedDeliveryDate': order['expected_delivery_date'].isoformat() if order.get('expected_delivery_date') else None,
                 'receivedDate': order['received_date'].isoformat() if order.get('received_date') else None,
                 'notes': order.get('notes'),
-                'items': items_data,
+                'items': items_by_order.get(order['id'], []),
                 'createdAt': order['created_at'].isoformat() if order.get('created_at') else "",
                 'updatedAt': order['updated_at'].isoformat() if order.get('updated_at') else ""
             })
@@ -509,20 +565,8 @@ def resolve_purchase_order(_, info, id: str):
         if not order:
             return None
             
-        # Fetch items
-        cursor.execute("SELECT * FROM purchase_order_items WHERE purchase_order_id = %s", (id,))
-        items = cursor.fetchall()
-        
-        items_data = []
-        for item in items:
-            items_data.append({
-                'id': str(item['id']),
-                'ingredient_id': item['ingredient_id'],
-                'quantity': float(item['quantity']),
-                'unitPrice': float(item['price_per_unit']),
-                'totalPrice': float(item['quantity'] * item['price_per_unit']),
-                'receivedQuantity': float(item.get('received_quantity', 0))
-            })
+        # Fetch items with their ingredients and suppliers batched
+        items_data = load_purchase_order_items(cursor, info, [order]).get(order['id'], [])
             
         return {
             'id': str(order['id']),
@@ -554,52 +598,51 @@ async def resolve_toko_sembako_order_status(_, info, orderId: str):
 
 @purchase_order.field("supplier")
 def resolve_purchase_order_supplier(order, info):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    try:
-        if not order.get('supplier_id'): return None
-        cursor.execute("SELECT * FROM suppliers WHERE id = %s", (order['supplier_id'],))
-        s = cursor.fetchone()
-        if not s: return None
-        return {
-            'id': str(s['id']),
-            'name': s['name'],
-            'contactPerson': s.get('contact_person'),
-            'email': s.get('email'),
-            'phone': s.get('phone'),
-            'address': s.get('address'),
-            'status': s['status'],
-            'createdAt': s['created_at'].isoformat() if s.get('created_at') else "",
-            'updatedAt': s['updated_at'].isoformat() if s.get('updated_at') else ""
-        }
-    finally:
-        cursor.close()
-        conn.close()
+    """Resolve PO supplier through the request loader (primed by the purchase order queries)"""
+    if not order.get('supplier_id'): return None
+    s = get_loaders(info).suppliers.load(order['supplier_id'])
+    if not s: return None
+    return {
+        'id': str(s['id']),
+        'name': s['name'],
+        'contactPerson': s.get('contact_person'),
+        'email': s.get('email'),
+        'phone': s.get('phone'),
+        'address': s.get('address'),
+        'status': s['status'],
+        'createdAt': s['created_at'].isoformat() if s.get('created_at') else "",
+        'updatedAt': s['updated_at'].isoformat() if s.get('updated_at') else ""
+    }
 
 @purchase_order_item.field("ingredient")
 def resolve_purchase_order_item_ingredient(item, info):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    try:
-        if not item.get('ingredient_id'): return None
-        cursor.execute("SELECT * FROM ingredients WHERE id = %s", (item['ingredient_id'],))
-        ing = cursor.fetchone()
-        if not ing: return None
-        
-        return {
-            'id': str(ing['id']),
-            'name': ing['name'],
-            'unit': ing['unit'],
-            'category': ing.get('category'),
-            'minStockLevel': float(ing.get('min_stock_level', 0)),
-            'currentStock': float(ing.get('current_stock', 0)),
-            'supplier_id': ing.get('supplier_id'),
-            'costPerUnit': float(ing.get('cost_per_unit', 0)),
-            'status': ing['status']
-        }
-    finally:
-        cursor.close()
-        conn.close()
+    """Resolve PO item ingredient through the request loader"""
+    if not item.get('ingredient_id'): return None
+    loaders = get_loaders(info)
+    ing = loaders.ingredients.load(item['ingredient_id'])
+    if not ing: return None
+    sup = loaders.suppliers.load(ing.get('supplier_id'))
+    
+    return {
+        'id': str(ing['id']),
+        'name': ing['name'],
+        'unit': ing['unit'],
+        'category': ing.get('category'),
+        'minStockLevel': float(ing.get('min_stock_level', 0)),
+        'currentStock': float(ing.get('current_stock', 0)),
+        'supplier_id': ing.get('supplier_id'),
+        'supplier': {
+            'id': str(sup['id']),
+            'name': sup['name'],
+            'contactPerson': sup.get('contact_person'),
+            'email': sup.get('email'),
+            'phone': sup.get('phone'),
+            'address': sup.get('address'),
+            'status': sup['status']
+        } if sup else None,
+        'costPerUnit': float(ing.get('cost_per_unit', 0)),
+        'status': ing['status']
+    }
 
 # Mutation resolvers
 @mutation.field("createIngredient")
@@ -902,6 +945,141 @@ def resolve_reduce_stock(_, info, ingredientId: str, quantity: float, reason: Op
         cursor.close()
         conn.close()
 
+def reference_movements(cursor, reference_type: str, reference_id: str) -> list:
+    """'out' movements recorded for a reference, oldest first (served by idx_reference)"""
+    cursor.execute("""
+        SELECT * FROM stock_movements
+        WHERE reference_type = %s AND reference_id = %s AND movement_type = 'out'
+        ORDER BY id
+    """, (reference_type, reference_id))
+    return cursor.fetchall()
+
+@mutation.field("reduceStockBatch")
+def resolve_reduce_stock_batch(_, info, items: list, reason: Optional[str] = None, referenceId: Optional[str] = None, referenceType: Optional[str] = None):
+    """Reduce stock for several ingredients in one transaction - requires authentication
+
+    All-or-nothing: if any ingredient is missing or short, nothing is deducted.
+    """
+    require_auth(info.context)
+
+    # Merge repeated ingredients (same ingredient used by several menu items)
+    quantities = {}
+    for item in items:
+        try:
+            ingredient_id = int(item['ingredientId'])
+        except (TypeError, ValueError):
+            raise Exception(f"Error reducing stock: invalid ingredient id {item['ingredientId']}")
+        quantities[ingredient_id] = quantities.get(ingredient_id, 0.0) + float(item['quantity'])
+
+    if not quantities:
+        return []
+
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        ids = list(quantities.keys())
+        id_placeholders = ", ".join(["%s"] * len(ids))
+
+        # Lock all affected rows so the check and the deduction see the same stock
+        cursor.execute(
+            f"SELECT id, current_stock FROM ingredients WHERE id IN ({id_placeholders}) FOR UPDATE",
+            ids
+        )
+        current = {row['id']: float(row['current_stock']) for row in cursor.fetchall()}
+
+        # A batch already applied for the same reference (e.g. a retried order) is returned as-is
+        movements = []
+        if referenceId and referenceType:
+            movements = reference_movements(cursor, referenceType, referenceId)
+
+        if not movements:
+            missing = [str(i) for i in ids if i not in current]
+            if missing:
+                raise Exception(f"Ingredient not found: {', '.join(missing)}")
+
+            insufficient = [
+                f"{i} (available: {current[i]}, requested: {quantities[i]})"
+                for i in ids if current[i] < quantities[i]
+            ]
+            if insufficient:
+                raise Exception(f"Insufficient stock for ingredients: {'; '.join(insufficient)}")
+
+            # Deduct and update status in a single statement (MySQL applies SET left to right)
+            case_sql = " ".join(["WHEN %s THEN %s"] * len(ids))
+            case_params = [v for i in ids for v in (i, quantities[i])]
+            cursor.execute(f"""
+                UPDATE ingredients
+                SET current_stock = current_stock - CASE id {case_sql} END,
+                    status = CASE WHEN current_stock <= 0 THEN 'out_of_stock' ELSE status END
+                WHERE id IN ({id_placeholders})
+            """, case_params + ids)
+
+            if referenceId and referenceType:
+                # One multi-row insert for all movements, read back by their reference (auto-increment ids of a
+                # multi-row insert are not guaranteed consecutive outside innodb_autoinc_lock_mode=1)
+                values_sql = ", ".join(["(%s, 'out', %s, %s, %s, %s)"] * len(ids))
+                movement_params = [v for i in ids for v in (i, quantities[i], reason, referenceId, referenceType)]
+                cursor.execute(f"""
+                    INSERT INTO stock_movements (ingredient_id, movement_type, quantity, reason, reference_id, reference_type)
+                    VALUES {values_sql}
+                """, movement_params)
+                conn.commit()
+                movements = reference_movements(cursor, referenceType, referenceId)
+            else:
+                # No reference to read the batch back by: insert row by row and keep each id
+                movement_ids = []
+                for i in ids:
+                    cursor.execute("""
+                        INSERT INTO stock_movements (ingredient_id, movement_type, quantity, reason, reference_id, reference_type)
+                        VALUES (%s, 'out', %s, %s, %s, %s)
+                    """, (i, quantities[i], reason, referenceId, referenceType))
+                    movement_ids.append(cursor.lastrowid)
+                conn.commit()
+                cursor.execute(
+                    f"SELECT * FROM stock_movements WHERE id IN ({', '.join(['%s'] * len(movement_ids))}) ORDER BY id",
+                    movement_ids
+                )
+                movements = cursor.fetchall()
+
+        movement_ingredient_ids = list({movement['ingredient_id'] for movement in movements})
+        cursor.execute(
+            f"SELECT * FROM ingredients WHERE id IN ({', '.join(['%s'] * len(movement_ingredient_ids))})",
+            movement_ingredient_ids
+        )
+        ingredients_by_id = {ing['id']: ing for ing in cursor.fetchall()}
+
+        result = []
+        for movement in movements:
+            ing = ingredients_by_id[movement['ingredient_id']]
+            result.append({
+                'id': str(movement['id']),
+                'ingredient': {
+                    'id': str(ing['id']),
+                    'name': ing['name'],
+                    'unit': ing['unit'],
+                    'category': ing.get('category'),
+                    'minStockLevel': float(ing.get('min_stock_level', 0)),
+                    'currentStock': float(ing.get('current_stock', 0)),
+                    'supplier': None,
+                    'costPerUnit': float(ing.get('cost_per_unit', 0)),
+                    'status': ing['status']
+                },
+                'movementType': movement['movement_type'],
+                'quantity': float(movement['quantity']),
+                'reason': movement.get('reason'),
+                'referenceId': movement.get('reference_id'),
+                'referenceType': movement.get('reference_type'),
+                'createdAt': movement['created_at'].isoformat() if movement.get('created_at') else ""
+            })
+        return result
+    except Exception as e:
+        conn.rollback()
+        raise Exception(f"Error reducing stock: {str(e)}")
+    finally:
+        cursor.close()
+        conn.close()
+
 # Helper for smart category mapping
 def determine_category(name: str) -> str:
     name_lower = name.lower()
@@ -927,16 +1105,20 @@ async def resolve_purchase_from_toko_sembako(_, info, input: Dict[str, Any]):
     notes = input.get('notes')
     
     try:
-        # 1. Check stock availability for all items
+        # 1. Check stock availability for all items (one inventory snapshot) while fetching product details
+        stock_checks, products = await asyncio.gather(
+            check_stock_bulk_from_toko_sembako(items),
+            get_products_by_ids_from_toko_sembako([item['productId'] for item in items])
+        )
         for item in items:
-            stock_check = await check_stock_from_toko_sembako(item['productId'], item['quantity'])
+            stock_check = stock_checks[str(item['productId'])]
             if not stock_check.get('available'):
                 raise Exception(f"Stock tidak tersedia untuk product {item['productId']}: {stock_check.get('message')}")
         
         # 2. Get product details
         product_details = []
         for item in items:
-            product = await get_product_by_id_from_toko_sembako(item['productId'])
+            product = products.get(str(item['productId']))
             if not product:
                 raise Exception(f"Product {item['productId']} tidak ditemukan")
             product_details.append({
@@ -953,6 +1135,9 @@ async def resolve_purchase_from_toko_sembako(_, info, input: Dict[str, Any]):
         if not order_result.get('success'):
             raise Exception(f"Gagal membuat order: {order_result.get('message')}")
         
+        # The order changed supplier stock; drop the cached snapshot
+        invalidate_toko_sembako_cache()
+        
         # 4. Add stock to local inventory
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
@@ -1427,6 +1612,7 @@ async def resolve_sync_stock_from_toko_sembako(_, info, productId: str, quantity
         """, (ingredient_id, quantity))
         
         conn.commit()
+        invalidate_toko_sembako_cache()
         
         cursor.execute("SELECT * FROM ingredients WHERE id = %s", (ingredient_id,))
         updated_ing = cursor.fetchone()
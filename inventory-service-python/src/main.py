@@ -1,16 +1,27 @@
 import os
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
-from ariadne import make_executable_schema, load_schema_from_path, graphql_sync
+from fastapi.responses import HTMLResponse, PlainTextResponse
+from ariadne import make_executable_schema, load_schema_from_path, graphql, graphql_sync
 from dotenv import load_dotenv
-from src.database.connection import get_db_connection
+from src.codec import JSONResponse, CODEC_NAME
+from src.database.connection import get_db_connection, init_pool, close_pool, get_pool_stats
 from src.graphql.resolvers import resolvers
+from src.graphql.executor import GRAPHQL_EXECUTION_MODE, resolver_executor, offload_sync_resolvers
 from src.auth import get_auth_context
+from src.tracing import extract as extract_trace_context, shutdown_tracing, get_tracing_stats
+from src.graphql.extensions import QueryStatsExtension, MetricsExtension, TracingExtension, get_operation_name
+from src.graphql.metrics import render_metrics, render_stats
+from src.graphql.documents import (
+    PersistedQueryError, parse_query, validate_query, resolve_persisted_query, load_allowed_operations, get_document_stats
+)
+from src.database.instrumentation import get_query_totals
+from src.services.toko_sembako_client import close_session as close_toko_sembako_session, get_toko_sembako_stats
+from src.services.stock_reconciliation import stock_reconciler
 
 load_dotenv()
 
-app = FastAPI(title="Inventory Service (Python)", version="1.0.0")
+app = FastAPI(title="Inventory Service (Python)", version="1.0.0", default_response_class=JSONResponse)
 
 # CORS middleware
 app.add_middleware(
@@ -28,16 +39,24 @@ type_defs = load_schema_from_path(schema_path)
 # Create executable schema
 schema = make_executable_schema(type_defs, resolvers)
 
+# Run blocking resolvers in a bounded thread pool instead of on the event loop
+if GRAPHQL_EXECUTION_MODE == "threadpool":
+    offload_sync_resolvers(schema, resolver_executor)
+
 @app.on_event("startup")
 async def startup_event():
     """Test database connection on startup"""
-    import time
+    import asyncio
     print("🚀 Inventory Service (Python/Ariadne) running on http://localhost:4002")
     print("📊 GraphQL Explorer: http://localhost:4002/graphql")
     
+    # Preload the allowed operations registry (and warm the document cache)
+    load_allowed_operations()
+    
     max_retries = 10
     for i in range(max_retries):
         try:
+            init_pool()
             conn = get_db_connection()
             cursor = conn.cursor()
             cursor.execute("SELECT 1")
@@ -45,10 +64,11 @@ async def startup_event():
             cursor.close()
             conn.close()
             print("✅ Inventory Service (Python/Ariadne): MySQL database connected")
+            stock_reconciler.start()
             return
         except Exception as e:
             if i < max_retries - 1:
-                time.sleep(2)
+                await asyncio.sleep(2)
             else:
                 print(f"❌ Error connecting to database: {e}")
                 raise
@@ -63,10 +83,48 @@ async def root():
         "graphql": "/graphql"
     }
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background jobs, then close resolver executor, Toko Sembako HTTP session and database connection pool"""
+    await stock_reconciler.stop()
+    resolver_executor.shutdown()
+    await close_toko_sembako_session()
+    close_pool()
+    shutdown_tracing()
+
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
 
+@app.get("/stats")
+async def stats():
+    """Database connection pool, resolver executor, SQL, Toko Sembako client, reconciliation, tracing and document cache metrics"""
+    return {
+        "db_pool": get_pool_stats(),
+        "executor": resolver_executor.stats(),
+        "toko_sembako": get_toko_sembako_stats(),
+        "stock_reconciliation": stock_reconciler.stats(),
+        "sql": get_query_totals(),
+        "tracing": get_tracing_stats(),
+        "graphql_documents": get_document_stats(),
+        "json_codec": CODEC_NAME
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Resolver, operation, DB pool, executor, Toko Sembako client, reconciliation, SQL and document cache metrics in Prometheus text format"""
+    return PlainTextResponse(
+        render_metrics(
+            render_stats("db_pool", get_pool_stats()),
+            render_stats("executor", resolver_executor.stats()),
+            render_stats("toko_sembako", get_toko_sembako_stats()),
+            render_stats("stock_reconciliation", stock_reconciler.stats()),
+            render_stats("sql", get_query_totals()),
+            render_stats("graphql", get_document_stats())
+        ),
+        media_type="text/plain; version=0.0.4"
+    )
+
 # Ariadne GraphQL Explorer HTML (native GraphiQL with dark theme)
 GRAPHQL_EXPLORER_HTML = """
 <!DOCTYPE html>
@@ -120,16 +178,33 @@ async def graphql_playground():
 @app.post("/graphql")
 async def graphql_server(request: Request):
     """GraphQL endpoint with auth context"""
-    data = await request.json()
+    try:
+        data = resolve_persisted_query(await request.json())
+    except PersistedQueryError as e:
+        return e.response()
     auth_context = get_auth_context(request)
-    success, result = graphql_sync(
-        schema,
-        data,
-        context_value={"request": request, **auth_context},
-        debug=os.getenv("DEBUG", "False").lower() == "true"
-    )
+    context_value = {
+        "request": request,
+        "operation_name": get_operation_name(data),
+        "trace_parent": extract_trace_context(request.headers),
+        **auth_context
+    }
+    debug = os.getenv("DEBUG", "False").lower() == "true"
+    extensions = [QueryStatsExtension, MetricsExtension, TracingExtension]
+    
+    if GRAPHQL_EXECUTION_MODE == "sync":
+        success, result = graphql_sync(
+            schema, data, context_value=context_value, debug=debug, extensions=extensions,
+            query_parser=parse_query, query_validator=validate_query
+        )
+    else:
+        success, result = await graphql(
+            schema, data, context_value=context_value, debug=debug, extensions=extensions,
+            query_parser=parse_query, query_validator=validate_query
+        )
     status_code = 200 if success else 400
-    return result
+    # Rendered straight from the result (no jsonable_encoder pass)
+    return JSONResponse(result)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,217 @@
+"""
+Scheduled stock reconciliation against Toko Sembako
+The supplier catalogue and stock snapshot are fetched once per run, diffed in memory against the local
+ingredients supplied by Toko Sembako (matched by product name), and every change is applied in one transaction.
+Only supplier-owned fields (cost_per_unit, unit) are written. Local current_stock is what the restaurant holds
+(purchases add to it, orders deduct from it), so the supplier's warehouse stock is reported, never copied over it.
+"""
+import os
+import time
+import asyncio
+from datetime import datetime
+from typing import Optional, List, Dict, Any
+from src.database.connection import get_db_connection
+from src.services.toko_sembako_client import get_supplier_snapshot_from_toko_sembako
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TOKO_SEMBAKO_RECONCILE_INTERVAL = float(os.getenv("TOKO_SEMBAKO_RECONCILE_INTERVAL", 0))  # seconds, 0 disables
+TOKO_SEMBAKO_SUPPLIER_NAME = "Toko Sembako"
+RECONCILED_COLUMNS = ("cost_per_unit", "unit")
+
+def compute_changes(ingredients: List[Dict[str, Any]], products: List[Dict], inventory: List[Dict]) -> Dict[str, Any]:
+    """Diff local ingredients against the supplier snapshot
+
+    Ingredients are matched to products by case-insensitive name; products are joined to stock by product id.
+    Returns the per-ingredient cost/unit changes, the ingredients whose local stock differs from the supplier's
+    (report only) and match counts.
+    """
+    ingredients_by_name = {(ing["name"] or "").strip().lower(): ing for ing in ingredients}
+    stock_by_product = {item["product_id"]: item["stock"] for item in inventory}
+
+    changes = []
+    stock_differences = []
+    seen = set()
+    matched = 0
+    unmatched_products = 0
+    for product in products:
+        ing = ingredients_by_name.get((product.get("name") or "").strip().lower())
+        if ing is None:
+            unmatched_products += 1
+            continue
+        if ing["id"] in seen:
+            continue
+        seen.add(ing["id"])
+        matched += 1
+        change = {"id": ing["id"], "product_id": product["id"]}
+
+        current_stock = float(ing.get("current_stock") or 0)
+        supplier_stock = stock_by_product.get(product["id"])
+        # Columns are DECIMAL(10, 2); compare at that precision
+        if supplier_stock is not None and round(supplier_stock, 2) != round(current_stock, 2):
+            stock_differences.append({
+                "ingredientId": ing["id"],
+                "productId": product["id"],
+                "localStock": round(current_stock, 2),
+                "supplierStock": round(supplier_stock, 2),
+                "difference": round(supplier_stock - current_stock, 2)
+            })
+
+        price = round(float(product.get("price") or 0), 2)
+        if price > 0 and price != round(float(ing.get("cost_per_unit") or 0), 2):
+            change["cost_per_unit"] = price
+        if product.get("unit") and product["unit"] != ing.get("unit"):
+            change["unit"] = product["unit"]
+
+        if len(change) > 2:
+            changes.append(change)
+
+    return {
+        "changes": changes, "stock_differences": stock_differences,
+        "matched": matched, "unmatched_products": unmatched_products
+    }
+
+def _case_update(column: str, changes: List[Dict[str, Any]]) -> tuple:
+    """CASE id WHEN ... expression for one column over the rows that change it"""
+    rows = [c for c in changes if column in c]
+    if not rows:
+        return None, []
+    params = []
+    for c in rows:
+        params.extend([c["id"], c[column]])
+    return f"{column} = CASE id {' '.join(['WHEN %s THEN %s'] * len(rows))} ELSE {column} END", params
+
+def apply_reconciliation(products: List[Dict], inventory: List[Dict]) -> Dict[str, Any]:
+    """Lock the Toko Sembako ingredients, diff them and apply all changes in a single transaction"""
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT id FROM suppliers WHERE name = %s", (TOKO_SEMBAKO_SUPPLIER_NAME,))
+        supplier = cursor.fetchone()
+        if not supplier:
+            conn.rollback()
+            return {
+                "ingredients": 0, "matched": 0, "unmatched_products": len(products),
+                "changes": [], "stock_differences": [], "diff_ms": 0.0
+            }
+
+        cursor.execute("""
+            SELECT id, name, unit, current_stock, cost_per_unit
+            FROM ingredients WHERE supplier_id = %s FOR UPDATE
+        """, (supplier["id"],))
+        ingredients = cursor.fetchall()
+
+        diff_started = time.perf_counter()
+        result = compute_changes(ingredients, products, inventory)
+        result["diff_ms"] = (time.perf_counter() - diff_started) * 1000
+        result["ingredients"] = len(ingredients)
+        changes = result["changes"]
+
+        if changes:
+            assignments, params = [], []
+            for column in RECONCILED_COLUMNS:
+                assignment, column_params = _case_update(column, changes)
+                if assignment:
+                    assignments.append(assignment)
+                    params.extend(column_params)
+            ids = [c["id"] for c in changes]
+            cursor.execute(
+                f"UPDATE ingredients SET {', '.join(assignments)} WHERE id IN ({', '.join(['%s'] * len(ids))})",
+                params + ids
+            )
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+async def reconcile_stock() -> Dict[str, Any]:
+    """Run one reconciliation and return a change summary with timings"""
+    started = time.perf_counter()
+    run_id = f"reconcile-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+
+    products, inventory = await get_supplier_snapshot_from_toko_sembako()
+    fetched = time.perf_counter()
+
+    result = await asyncio.to_thread(apply_reconciliation, products, inventory)
+    finished = time.perf_counter()
+
+    changes = result["changes"]
+    return {
+        "runId": run_id,
+        "products": len(products),
+        "inventoryItems": len(inventory),
+        "ingredients": result["ingredients"],
+        "matched": result["matched"],
+        "unmatchedProducts": result["unmatched_products"],
+        "changed": len(changes),
+        "priceUpdated": sum(1 for c in changes if "cost_per_unit" in c),
+        "unitUpdated": sum(1 for c in changes if "unit" in c),
+        "stockDiffering": len(result["stock_differences"]),
+        "stockDifferences": result["stock_differences"],
+        "timings": {
+            "fetch_ms": round((fetched - started) * 1000, 2),
+            "diff_ms": round(result["diff_ms"], 2),
+            "apply_ms": round((finished - fetched) * 1000, 2),
+            "total_ms": round((finished - started) * 1000, 2)
+        }
+    }
+
+class StockReconciler:
+    """Background task that runs reconcile_stock() every `interval` seconds"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"runs": 0, "errors": 0, "last_run_at": None, "last_summary": None, "last_error": None}
+
+    def start(self):
+        """Start the schedule on the running event loop (no-op when the interval is 0)"""
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_once(self) -> Dict[str, Any]:
+        self._stats["last_run_at"] = datetime.now().isoformat()
+        try:
+            summary = await reconcile_stock()
+        except Exception as e:
+            self._stats["errors"] += 1
+            self._stats["last_error"] = str(e)
+            raise
+        self._stats["runs"] += 1
+        self._stats["last_summary"] = summary
+        print(f"🔄 Toko Sembako reconciliation {summary['runId']}: {summary['changed']} ingredients changed, "
+              f"{summary['stockDiffering']} differ from supplier stock, in {summary['timings']['total_ms']}ms")
+        return summary
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Toko Sembako reconciliation failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval": self.interval,
+            "running": self._task is not None and not self._task.done(),
+            **self._stats
+        }
+
+stock_reconciler = StockReconciler(TOKO_SEMBAKO_RECONCILE_INTERVAL)
@@ -0,0 +1,107 @@
+"""
+TTL cache for Toko Sembako supplier data
+Fresh entries are served from memory; entries past their TTL but inside the stale window are served
+immediately while a single background task refreshes them. Misses are loaded once (single flight).
+"""
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Callable, Awaitable, Hashable
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TOKO_SEMBAKO_CATALOGUE_TTL = float(os.getenv("TOKO_SEMBAKO_CATALOGUE_TTL", 300))  # seconds, 0 disables caching
+TOKO_SEMBAKO_STOCK_TTL = float(os.getenv("TOKO_SEMBAKO_STOCK_TTL", 15))  # seconds, 0 disables caching
+TOKO_SEMBAKO_STALE_TTL = float(os.getenv("TOKO_SEMBAKO_STALE_TTL", 60))  # seconds a stale entry may still be served
+TOKO_SEMBAKO_CACHE_MAX_ENTRIES = int(os.getenv("TOKO_SEMBAKO_CACHE_MAX_ENTRIES", 64))
+
+Loader = Callable[[], Awaitable[Any]]
+
+class SupplierCache:
+    """Bounded stale-while-revalidate cache for one kind of supplier data"""
+
+    def __init__(self, name: str, ttl: float, stale_ttl: float, max_entries: int):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max(max_entries, 1)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (value, fetched_at)
+        self._loading: Dict[Hashable, asyncio.Task] = {}
+        self._generation = 0
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "loads": 0, "refresh_errors": 0, "invalidations": 0}
+
+    async def get(self, key: Hashable, loader: Loader) -> Any:
+        """Cached value for key, loading it with loader() on a miss
+
+        Loader errors propagate on a miss; a failed background refresh keeps serving the stale value.
+        """
+        if self.ttl <= 0:
+            self._stats["misses"] += 1
+            return await loader()
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[1]
+            if age < self.ttl:
+                self._stats["hits"] += 1
+                self._entries.move_to_end(key)
+                return entry[0]
+            if age < self.ttl + self.stale_ttl:
+                self._stats["stale_hits"] += 1
+                self._entries.move_to_end(key)
+                self._load(key, loader)
+                return entry[0]
+        self._stats["misses"] += 1
+        return await asyncio.shield(self._load(key, loader))
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Last known value for key regardless of age (used as a fallback when the supplier is down)"""
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def _load(self, key: Hashable, loader: Loader) -> asyncio.Task:
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key, loader, self._generation))
+            self._loading[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        return task
+
+    async def _fetch(self, key: Hashable, loader: Loader, generation: int) -> Any:
+        value = await loader()
+        self._stats["loads"] += 1
+        # Skip installing if the cache was invalidated while the load was running
+        if generation == self._generation:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        self._loading.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            self._stats["refresh_errors"] += 1
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one key (or every key when key is None)"""
+        self._stats["invalidations"] += 1
+        self._generation += 1
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["stale_hits"] + self._stats["misses"]
+        return {
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "size": len(self._entries),
+            "hit_rate": round((self._stats["hits"] + self._stats["stale_hits"]) / lookups, 3) if lookups else 0.0,
+            **self._stats
+        }
+
+catalogue_cache = SupplierCache("catalogue", TOKO_SEMBAKO_CATALOGUE_TTL, TOKO_SEMBAKO_STALE_TTL, TOKO_SEMBAKO_CACHE_MAX_ENTRIES)
+stock_cache = SupplierCache("stock", TOKO_SEMBAKO_STOCK_TTL, TOKO_SEMBAKO_STALE_TTL, TOKO_SEMBAKO_CACHE_MAX_ENTRIES)
@@ -3,8 +3,15 @@ Toko Sembako Client - Python HTTP Client for Integration
 Connects to Toko Sembako GraphQL APIs deployed on Railway
 """
 import os
+import json
+import time
+import random
+import asyncio
 import aiohttp
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Awaitable
+from src.services.toko_sembako_cache import catalogue_cache, stock_cache
+from src.tracing import span, inject
+from src import codec
 
 # URLs from environment or defaults (Railway deployment)
 TOKO_SEMBAKO_PRODUCT_URL = os.getenv(
@@ -25,49 +32,238 @@ print(f"   Product Service: {TOKO_SEMBAKO_PRODUCT_URL}")
 print(f"   Inventory Service: {TOKO_SEMBAKO_INVENTORY_URL}")
 print(f"   Order Service: {TOKO_SEMBAKO_ORDER_URL}")
 
-import asyncio
+# Connection pool configuration (one shared keep-alive session)
+TOKO_SEMBAKO_TIMEOUT = float(os.getenv('TOKO_SEMBAKO_TIMEOUT', 10))  # seconds per attempt
+TOKO_SEMBAKO_CONNECT_TIMEOUT = float(os.getenv('TOKO_SEMBAKO_CONNECT_TIMEOUT', 3))
+TOKO_SEMBAKO_MAX_CONNECTIONS = int(os.getenv('TOKO_SEMBAKO_MAX_CONNECTIONS', 20))
+TOKO_SEMBAKO_KEEPALIVE = float(os.getenv('TOKO_SEMBAKO_KEEPALIVE', 30))  # seconds
+TOKO_SEMBAKO_CONCURRENCY = int(os.getenv('TOKO_SEMBAKO_CONCURRENCY', 5))  # concurrent calls per fan-out
 
-# Retry configuration
-MAX_RETRIES = 3
-RETRY_DELAY = 1  # seconds (will use exponential backoff: 1s, 2s, 4s)
+# Retry configuration (full jitter: sleep a random time up to RETRY_DELAY * 2^attempt)
+MAX_RETRIES = int(os.getenv('TOKO_SEMBAKO_MAX_RETRIES', 3))
+RETRY_DELAY = float(os.getenv('TOKO_SEMBAKO_RETRY_DELAY', 0.5))  # seconds
+RETRY_MAX_DELAY = float(os.getenv('TOKO_SEMBAKO_RETRY_MAX_DELAY', 4))  # seconds
 
-async def graphql_request(url: str, query: str, variables: Dict = None, retries: int = MAX_RETRIES) -> Dict:
-    """Execute a GraphQL request with automatic retry on failure"""
+# Circuit breaker: open after N consecutive failures, allow one trial call after the reset timeout
+BREAKER_THRESHOLD = int(os.getenv('TOKO_SEMBAKO_BREAKER_THRESHOLD', 5))
+BREAKER_RESET_TIMEOUT = float(os.getenv('TOKO_SEMBAKO_BREAKER_RESET', 30))  # seconds
+
+class TokoSembakoGraphQLError(Exception):
+    """The supplier answered with GraphQL errors (not retried, does not trip the breaker)"""
+
+class CircuitOpenError(Exception):
+    """The supplier endpoint is failing; calls are rejected until the breaker resets"""
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one upstream endpoint"""
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.stats = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self, url: str) -> bool:
+        """Admit or reject a call; returns True when the call is the half-open trial"""
+        state = self.state
+        if state == "closed":
+            return False
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        self.stats["rejected"] += 1
+        raise CircuitOpenError(f"Toko Sembako circuit open for {url}, failing fast")
+
+    def record_success(self):
+        self.stats["successes"] += 1
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.stats["failures"] += 1
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            if self.opened_at is None:
+                self.stats["opened"] += 1
+                print(f"🔌 Toko Sembako circuit opened after {self.failures} consecutive failures")
+            self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """Free the trial slot of a call that neither succeeded nor failed (e.g. cancelled)"""
+        self.trial_in_flight = False
+
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop = None
+_breakers: Dict[str, CircuitBreaker] = {}
+_in_flight: Dict[tuple, asyncio.Task] = {}
+_stats = {"requests": 0, "attempts": 0, "retries": 0, "coalesced": 0}
+
+def get_session() -> aiohttp.ClientSession:
+    """Get the shared keep-alive session (recreated if closed or bound to another loop)"""
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        _session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=TOKO_SEMBAKO_TIMEOUT, connect=TOKO_SEMBAKO_CONNECT_TIMEOUT),
+            connector=aiohttp.TCPConnector(limit=TOKO_SEMBAKO_MAX_CONNECTIONS, keepalive_timeout=TOKO_SEMBAKO_KEEPALIVE),
+            headers={"Content-Type": "application/json"},
+            json_serialize=codec.dumps
+        )
+        _session_loop = loop
+    return _session
+
+async def close_session():
+    """Close the shared session (call on shutdown)"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+def _breaker(url: str) -> CircuitBreaker:
+    breaker = _breakers.get(url)
+    if breaker is None:
+        breaker = _breakers[url] = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_RESET_TIMEOUT)
+    return breaker
+
+async def _post(url: str, payload: Dict) -> Dict:
+    """Single attempt; raises TokoSembakoGraphQLError for GraphQL errors, anything else is retriable"""
+    with span("POST toko-sembako", "client", attributes={"http.url": url}) as current:
+        async with get_session().post(url, json=payload, headers=inject()) as response:
+            if current is not None:
+                current.set_attribute("http.status_code", response.status)
+            if response.status >= 500:
+                raise Exception(f"HTTP {response.status} from {url}")
+            result = await response.json(loads=codec.loads, content_type=None)
+            if result.get("errors"):
+                error_messages = [e.get("message", "Unknown error") for e in result["errors"]]
+                raise TokoSembakoGraphQLError(f"GraphQL errors: {', '.join(error_messages)}")
+            if response.status >= 400:
+                raise Exception(f"HTTP {response.status} from {url}")
+            return result.get("data") or {}
+
+async def _request_with_retry(url: str, payload: Dict, retries: int) -> Dict:
+    breaker = _breaker(url)
     last_error = None
-    
     for attempt in range(retries):
+        trial = breaker.before_call(url)
+        _stats["attempts"] += 1
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-                payload = {"query": query}
-                if variables:
-                    payload["variables"] = variables
-                
-                async with session.post(
-                    url,
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                ) as response:
-                    result = await response.json()
-                    
-                    if "errors" in result:
-                        error_messages = [e.get("message", "Unknown error") for e in result["errors"]]
-                        raise Exception(f"GraphQL errors: {', '.join(error_messages)}")
-                    
-                    return result.get("data", {})
-                    
+            data = await _post(url, payload)
+            breaker.record_success()
+            return data
+        except TokoSembakoGraphQLError:
+            # The endpoint is up, the query was rejected; retrying will not help
+            breaker.record_success()
+            raise
         except Exception as e:
+            breaker.record_failure()
             last_error = e
-            if attempt < retries - 1:
-                delay = RETRY_DELAY * (2 ** attempt)  # Exponential backoff: 1, 2, 4...
-                print(f"⚠️ Request failed (attempt {attempt + 1}/{retries}), retrying in {delay}s: {e}")
+            if attempt < retries - 1 and breaker.state == "closed":
+                delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_DELAY * (2 ** attempt)))
+                _stats["retries"] += 1
+                print(f"⚠️ Request failed (attempt {attempt + 1}/{retries}), retrying in {delay:.2f}s: {e}")
                 await asyncio.sleep(delay)
             else:
-                print(f"❌ Request failed after {retries} attempts: {e}")
-    
+                print(f"❌ Request failed after {attempt + 1} attempts: {e}")
+                break
+        finally:
+            # A cancelled trial leaves the breaker half-open so the next call can probe again
+            if trial:
+                breaker.release_trial()
     raise last_error
 
+async def graphql_request(url: str, query: str, variables: Dict = None, retries: int = MAX_RETRIES) -> Dict:
+    """Execute a GraphQL request through the shared session with jittered retries and a circuit breaker
+
+    Identical concurrent queries (not mutations) share one upstream call.
+    """
+    payload = {"query": query}
+    if variables:
+        payload["variables"] = variables
+    _stats["requests"] += 1
+
+    if query.lstrip().startswith("mutation"):
+        return await _request_with_retry(url, payload, retries)
+
+    key = (url, query, json.dumps(variables or {}, sort_keys=True))
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_request_with_retry(url, payload, retries))
+        _in_flight[key] = task
+        task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    else:
+        _stats["coalesced"] += 1
+    # Shield so one cancelled caller does not cancel the shared call for the others
+    return await asyncio.shield(task)
+
+def get_toko_sembako_stats() -> Dict[str, Any]:
+    """Request, retry, coalescing and circuit breaker metrics"""
+    return {
+        **_stats,
+        "in_flight": len(_in_flight),
+        "session_open": _session is not None and not _session.closed,
+        "cache": {"catalogue": catalogue_cache.stats(), "stock": stock_cache.stats()},
+        "breakers": {
+            url: {"state": breaker.state, "consecutive_failures": breaker.failures, **breaker.stats}
+            for url, breaker in _breakers.items()
+        }
+    }
+
+async def gather_bounded(coros: List[Awaitable], limit: int = TOKO_SEMBAKO_CONCURRENCY) -> List[Any]:
+    """Await coroutines concurrently, at most `limit` at a time, returning results in order"""
+    semaphore = asyncio.Semaphore(max(limit, 1))
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(coro) for coro in coros))
+
+def invalidate_toko_sembako_cache(catalogue: bool = False):
+    """Drop cached stock levels (and the product catalogue when catalogue=True)"""
+    stock_cache.invalidate()
+    if catalogue:
+        catalogue_cache.invalidate()
+
+
+def _index_products(products: List[Dict]) -> Dict[str, Any]:
+    return {"products": products, "by_id": {p["id"]: p for p in products}}
+
+async def _catalogue(category: Optional[str] = None) -> Dict[str, Any]:
+    """Cached catalogue for a category (None = full catalogue) with a per-product index"""
+    async def load():
+        return _index_products(await _fetch_products(category))
+    return await catalogue_cache.get(("products", category), load)
 
 async def get_products_from_toko_sembako(category: Optional[str] = None) -> List[Dict]:
+    """Fetch all products from Toko Sembako Product Service (cached for TOKO_SEMBAKO_CATALOGUE_TTL)
+
+    Falls back to the last known catalogue when the supplier is unreachable.
+    """
+    try:
+        catalogue = await _catalogue(category)
+    except Exception as e:
+        print(f"❌ Error fetching products from Toko Sembako: {e}")
+        catalogue = catalogue_cache.peek(("products", category))
+        if catalogue is None:
+            return []
+    # Callers decorate the dicts (e.g. with stock), so hand out copies
+    return [dict(p) for p in catalogue["products"]]
+
+
+async def _fetch_products(category: Optional[str] = None) -> List[Dict]:
     """Fetch all products from Toko Sembako Product Service
     
     Updated to match Node.js logic: tries 'products' query first, falls back to 'getProducts'
@@ -136,11 +332,19 @@ async def get_products_from_toko_sembako(category: Optional[str] = None) -> List
             ]
         except Exception as e2:
             print(f"❌ Error fetching products from Toko Sembako (fallback): {e2}")
-            return []
+            raise
 
 
 async def get_product_by_id_from_toko_sembako(product_id: str) -> Optional[Dict]:
-    """Fetch single product by ID from Toko Sembako"""
+    """Fetch single product by ID, served from the cached full catalogue when it lists the product"""
+    if catalogue_cache.ttl > 0:
+        try:
+            product = (await _catalogue())["by_id"].get(str(product_id))
+            if product:
+                return dict(product)
+        except Exception as e:
+            print(f"⚠️ Catalogue unavailable, fetching product {product_id} directly: {e}")
+
     query = """
         query GetProduct($id: ID!) {
             getProductById(id: $id) {
@@ -177,6 +381,56 @@ async def get_product_by_id_from_toko_sembako(product_id: str) -> Optional[Dict]
         return None
 
 
+async def get_products_by_ids_from_toko_sembako(product_ids: List[str]) -> Dict[str, Optional[Dict]]:
+    """Fetch several products concurrently (bounded), returns {product_id: product or None}"""
+    ids = list(dict.fromkeys(str(product_id) for product_id in product_ids))
+    products = await gather_bounded([get_product_by_id_from_toko_sembako(product_id) for product_id in ids])
+    return dict(zip(ids, products))
+
+
+def _stock_result(stock: float, quantity: float) -> Dict:
+    available = stock >= quantity
+    return {
+        "available": available,
+        "current_stock": stock,
+        "requested_quantity": quantity,
+        "message": f"Stock {'tersedia' if available else 'tidak cukup'}: {stock} unit"
+    }
+
+
+async def check_stock_bulk_from_toko_sembako(items: List[Dict]) -> Dict[str, Dict]:
+    """Check a whole cart against one fresh getAllInventory snapshot
+
+    Quantities are summed per product. Products missing from the snapshot (or every product, when
+    getAllInventory is unavailable) fall back to concurrent per-item checkStock calls.
+    Returns {product_id: stock check result}.
+    """
+    requested: Dict[str, float] = {}
+    for item in items:
+        product_id = str(item["productId"])
+        requested[product_id] = requested.get(product_id, 0) + float(item["quantity"])
+
+    stock_by_product = {}
+    try:
+        # Purchases need current stock, not the cached listing snapshot
+        stock_cache.invalidate("inventory")
+        inventory = await stock_cache.get("inventory", _fetch_all_inventory)
+        stock_by_product = {item["product_id"]: item["stock"] for item in inventory}
+    except Exception as e:
+        print(f"⚠️ getAllInventory unavailable, checking products one by one: {e}")
+
+    results = {
+        product_id: _stock_result(stock_by_product[product_id], quantity)
+        for product_id, quantity in requested.items()
+        if product_id in stock_by_product
+    }
+    missing = [product_id for product_id in requested if product_id not in results]
+    if missing:
+        checks = await gather_bounded([check_stock_from_toko_sembako(product_id, requested[product_id]) for product_id in missing])
+        results.update(zip(missing, checks))
+    return results
+
+
 async def check_stock_from_toko_sembako(product_id: str, quantity: float) -> Dict:
     """Check stock availability at Toko Sembako Inventory Service
     
@@ -239,15 +493,7 @@ async def check_stock_from_toko_sembako(product_id: str, quantity: float) -> Dic
                 "message": "Product not found in inventory"
             }
         
-        stock = float(inventory.get("stock", 0))
-        available = stock >= quantity
-        
-        return {
-            "available": available,
-            "current_stock": stock,
-            "requested_quantity": quantity,
-            "message": f"Stock {'tersedia' if available else 'tidak cukup'}: {stock} unit"
-        }
+        return _stock_result(float(inventory.get("stock", 0)), quantity)
     except Exception as e:
         print(f"❌ Error checking stock: {e}")
         return {
@@ -259,6 +505,32 @@ async def check_stock_from_toko_sembako(product_id: str, quantity: float) -> Dic
 
 
 async def get_all_inventory_from_toko_sembako() -> List[Dict]:
+    """Get all inventory items from Toko Sembako (cached for TOKO_SEMBAKO_STOCK_TTL)
+
+    Falls back to the last known snapshot when the supplier is unreachable.
+    """
+    try:
+        items = await stock_cache.get("inventory", _fetch_all_inventory)
+    except Exception as e:
+        print(f"❌ Error fetching all inventory from Toko Sembako: {e}")
+        items = stock_cache.peek("inventory") or []
+    return [dict(item) for item in items]
+
+
+async def get_supplier_snapshot_from_toko_sembako() -> tuple:
+    """Full product catalogue plus a fresh getAllInventory snapshot, fetched concurrently
+
+    Unlike the listing helpers this raises when either call fails, so callers never act on empty data.
+    """
+    stock_cache.invalidate("inventory")
+    catalogue, inventory = await asyncio.gather(
+        _catalogue(),
+        stock_cache.get("inventory", _fetch_all_inventory)
+    )
+    return [dict(p) for p in catalogue["products"]], [dict(item) for item in inventory]
+
+
+async def _fetch_all_inventory() -> List[Dict]:
     """Get all inventory items from Toko Sembako
     
     Only available in toko-sembako-revisi version
@@ -285,7 +557,7 @@ async def get_all_inventory_from_toko_sembako() -> List[Dict]:
         ]
     except Exception as e:
         print(f"❌ Error fetching all inventory from Toko Sembako: {e}")
-        return []
+        raise
 
 
 async def set_stock_at_toko_sembako(product_id: str, stock: int) -> Optional[Dict]:
@@ -462,8 +734,10 @@ async def get_products_with_stock_from_toko_sembako(category: Optional[str] = No
     """
     try:
         # Get products and inventory in parallel
-        products = await get_products_from_toko_sembako(category)
-        inventory_items = await get_all_inventory_from_toko_sembako()
+        products, inventory_items = await asyncio.gather(
+            get_products_from_toko_sembako(category),
+            get_all_inventory_from_toko_sembako()
+        )
         
         # Create stock lookup
         stock_lookup = {item["product_id"]: item["stock"] for item in inventory_items}
@@ -0,0 +1,78 @@
+"""
+JSON codec shared by JSON columns, inter-service payloads and GraphQL HTTP responses
+Uses orjson when it is installed (JSON_CODEC=auto) and falls back to the stdlib json module;
+JSON_CODEC=stdlib forces the fallback. Both paths produce compact JSON and accept Decimal/datetime values.
+"""
+import os
+import json
+from decimal import Decimal
+from datetime import date, datetime
+from typing import Any
+from starlette.responses import JSONResponse as StarletteJSONResponse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+JSON_CODEC = os.getenv("JSON_CODEC", "auto").lower()  # auto | orjson | stdlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if JSON_CODEC == "orjson" and orjson is None:
+    print("⚠️ JSON_CODEC=orjson but orjson is not installed, using stdlib json")
+
+USE_ORJSON = orjson is not None and JSON_CODEC != "stdlib"
+CODEC_NAME = "orjson" if USE_ORJSON else "stdlib"
+
+def _default(value: Any) -> Any:
+    """Types neither encoder handles natively (DECIMAL columns; datetimes for stdlib)"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {value.__class__.__name__} is not JSON serializable")
+
+if USE_ORJSON:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def loads(data: Any) -> Any:
+        return orjson.loads(data)
+
+    def dumps_bytes(value: Any) -> bytes:
+        return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+
+    def dumps(value: Any) -> str:
+        return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS).decode("utf-8")
+else:
+    _decoder = json.JSONDecoder()
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=_default)
+
+    def loads(data: Any) -> Any:
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data).decode("utf-8")
+        return _decoder.decode(data)
+
+    def dumps(value: Any) -> str:
+        return _encoder.encode(value)
+
+    def dumps_bytes(value: Any) -> bytes:
+        return _encoder.encode(value).encode("utf-8")
+
+def parse_json_field(field: Any, default: Any = None) -> Any:
+    """Decode a JSON column value; already-decoded values pass through, malformed text is returned as-is"""
+    if not field:
+        return default
+    if isinstance(field, (str, bytes)):
+        try:
+            return loads(field)
+        except ValueError:
+            return field
+    return field
+
+class JSONResponse(StarletteJSONResponse):
+    """Starlette JSONResponse rendered with the codec"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
@@ -0,0 +1,82 @@
+"""
+In-process chef cache for kitchen order listings
+Chefs for a whole board are loaded with one WHERE id IN (...) query; entries expire after CHEF_CACHE_TTL
+and are invalidated by the mutations that change a chef row
+"""
+import os
+import time
+import threading
+from typing import Optional, Dict, Any, Iterable
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CHEF_CACHE_TTL = float(os.getenv("CHEF_CACHE_TTL", 30))  # seconds, 0 disables caching
+
+class ChefCache:
+    """Thread-safe TTL cache of chef rows keyed by id"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[str, tuple] = {}  # id -> (row or None, expires_at)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "queries": 0, "invalidations": 0}
+
+    def get_many(self, cursor, chef_ids: Iterable[Any]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Return {str(chef_id): row or None}, loading every uncached chef in one query"""
+        wanted = {str(chef_id) for chef_id in chef_ids if chef_id is not None}
+        now = time.monotonic()
+        result = {}
+        with self._lock:
+            for chef_id in wanted:
+                entry = self._entries.get(chef_id)
+                if entry and entry[1] > now:
+                    result[chef_id] = entry[0]
+            self._stats["hits"] += len(result)
+            self._stats["misses"] += len(wanted) - len(result)
+        missing = [chef_id for chef_id in wanted if chef_id not in result]
+        if missing:
+            placeholders = ", ".join(["%s"] * len(missing))
+            cursor.execute(f"SELECT * FROM chefs WHERE id IN ({placeholders})", missing)
+            rows = {str(row['id']): row for row in cursor.fetchall()}
+            expires_at = time.monotonic() + self.ttl
+            with self._lock:
+                self._stats["queries"] += 1
+                for chef_id in missing:
+                    result[chef_id] = rows.get(chef_id)
+                    if self.ttl > 0:
+                        self._entries[chef_id] = (result[chef_id], expires_at)
+        return result
+
+    def invalidate(self, chef_id: Any = None):
+        """Drop one chef (or every chef when chef_id is None) from the cache"""
+        with self._lock:
+            self._stats["invalidations"] += 1
+            if chef_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(chef_id), None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "ttl": self.ttl,
+                "size": len(self._entries),
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                **self._stats
+            }
+
+chef_cache = ChefCache(CHEF_CACHE_TTL)
+
+def format_chef(chef_data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Shape a chefs row for the Chef GraphQL type"""
+    if not chef_data:
+        return None
+    return {
+        'id': str(chef_data['id']),
+        'name': chef_data['name'],
+        'specialization': chef_data.get('specialization'),
+        'status': chef_data['status'],
+        'currentOrders': chef_data.get('current_orders', 0)
+    }
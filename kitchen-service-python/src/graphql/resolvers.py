@@ -1,8 +1,13 @@
 from typing import Optional, List, Dict, Any
-import json
 from ariadne import QueryType, MutationType, ObjectType
+from mysql.connector import IntegrityError, errorcode
 from src.database.connection import get_db_connection
 from src.auth import require_auth, require_min_role
+from src.graphql.chef_cache import chef_cache, format_chef
+from src.tracing import span, inject
+from src import codec
+from src.graphql.projection import project
+from src.graphql.subscriptions import subscription, previous_status, publish_kitchen_order_update
 
 query = QueryType()
 mutation = MutationType()
@@ -10,15 +15,32 @@ order_item = ObjectType("OrderItem")
 chef = ObjectType("Chef")
 kitchen_order = ObjectType("KitchenOrder")
 
+# KitchenOrder field -> kitchen_orders columns, for projecting listings onto the selection set
+KITCHEN_ORDER_COLUMNS = {
+    'id': ('id',),
+    'orderId': ('order_id',),
+    'tableNumber': ('table_number',),
+    'status': ('status',),
+    'items': ('items',),
+    'priority': ('priority',),
+    'estimatedTime': ('estimated_time',),
+    'chefId': ('chef_id',),
+    'chef': ('chef_id',),
+    'notes': ('notes',),
+    'createdAt': ('created_at',),
+    'updatedAt': ('updated_at',)
+}
+
 # Query resolvers
 @query.field("kitchenOrders")
 def resolve_kitchen_orders(_, info, status: Optional[str] = None):
-    """Get all kitchen orders"""
+    """Get all kitchen orders (only the selected columns; items are decoded and chefs loaded only when selected)"""
     conn = get_db_connection()
     cursor = conn.cursor(dictionary=True)
     
     try:
-        query_sql = "SELECT * FROM kitchen_orders"
+        columns, fields = project(info, KITCHEN_ORDER_COLUMNS)
+        query_sql = f"SELECT {columns} FROM kitchen_orders"
         params = []
         
         if status:
@@ -30,32 +52,25 @@ def resolve_kitchen_orders(_, info, status: Optional[str] = None):
         cursor.execute(query_sql, params)
         orders = cursor.fetchall()
         
+        # Chefs for the whole board come from the cache, misses are loaded in one query
+        with_chef = 'chef' in fields
+        chefs_by_id = chef_cache.get_many(cursor, [order.get('chef_id') for order in orders]) if with_chef else {}
+        with_items = 'items' in fields
+        
         result = []
         for order in orders:
-            items = json.loads(order.get('items', '[]'))
-            
-            # Get chef if exists
-            chef_data = None
-            if order.get('chef_id'):
-                cursor.execute("SELECT * FROM chefs WHERE id = %s", (order['chef_id'],))
-                chef_data = cursor.fetchone()
+            items = codec.loads(order.get('items') or '[]') if with_items else []
             
             result.append({
                 'id': str(order['id']),
-                'orderId': order['order_id'],
+                'orderId': order.get('order_id', ""),
                 'tableNumber': order.get('table_number'),
-                'status': order['status'],
+                'status': order.get('status', ""),
                 'items': items,
                 'priority': order.get('priority', 0),
                 'estimatedTime': order.get('estimated_time'),
                 'chefId': order.get('chef_id'),
-                'chef': {
-                    'id': str(chef_data['id']),
-                    'name': chef_data['name'],
-                    'specialization': chef_data.get('specialization'),
-                    'status': chef_data['status'],
-                    'currentOrders': chef_data.get('current_orders', 0)
-                } if chef_data else None,
+                'chef': format_chef(chefs_by_id.get(str(order['chef_id']))) if with_chef and order.get('chef_id') else None,
                 'notes': order.get('notes'),
                 'createdAt': order['created_at'].isoformat() if order.get('created_at') else "",
                 'updatedAt': order['updated_at'].isoformat() if order.get('updated_at') else ""
@@ -81,7 +96,7 @@ def resolve_kitchen_order(_, info, id: str):
         if not order:
             return None
         
-        items = json.loads(order.get('items', '[]'))
+        items = codec.loads(order.get('items', '[]'))
         
         # Get chef if exists
         chef_data = None
@@ -128,7 +143,7 @@ def resolve_kitchen_order_by_order_id(_, info, orderId: str):
         if not order:
             return None
         
-        items = json.loads(order.get('items', '[]'))
+        items = codec.loads(order.get('items', '[]'))
         
         # Get chef if exists
         chef_data = None
@@ -229,7 +244,7 @@ def resolve_orders_by_chef(_, info, chefId: str):
         
         result = []
         for order in orders:
-            items = json.loads(order.get('items', '[]'))
+            items = codec.loads(order.get('items', '[]'))
             
             result.append({
                 'id': str(order['id']),
@@ -264,10 +279,11 @@ def resolve_pending_orders(_, info):
             "SELECT * FROM kitchen_orders WHERE status = 'pending' ORDER BY priority DESC, created_at ASC"
         )
         orders = cursor.fetchall()
+        chefs_by_id = chef_cache.get_many(cursor, [order.get('chef_id') for order in orders])
         
         result = []
         for order in orders:
-            items = json.loads(order.get('items', '[]'))
+            items = codec.loads(order.get('items', '[]'))
             
             result.append({
                 'id': str(order['id']),
@@ -278,7 +294,7 @@ def resolve_pending_orders(_, info):
                 'priority': order.get('priority', 0),
                 'estimatedTime': order.get('estimated_time'),
                 'chefId': order.get('chef_id'),
-                'chef': None,
+                'chef': format_chef(chefs_by_id.get(str(order['chef_id']))) if order.get('chef_id') else None,
                 'notes': order.get('notes'),
                 'createdAt': order['created_at'].isoformat() if order.get('created_at') else "",
                 'updatedAt': order['updated_at'].isoformat() if order.get('updated_at') else ""
@@ -302,10 +318,11 @@ def resolve_preparing_orders(_, info):
             "SELECT * FROM kitchen_orders WHERE status = 'preparing' ORDER BY priority DESC, created_at ASC"
         )
         orders = cursor.fetchall()
+        chefs_by_id = chef_cache.get_many(cursor, [order.get('chef_id') for order in orders])
         
         result = []
         for order in orders:
-            items = json.loads(order.get('items', '[]'))
+            items = codec.loads(order.get('items', '[]'))
             
             result.append({
                 'id': str(order['id']),
@@ -316,7 +333,7 @@ def resolve_preparing_orders(_, info):
                 'priority': order.get('priority', 0),
                 'estimatedTime': order.get('estimated_time'),
                 'chefId': order.get('chef_id'),
-                'chef': None,
+                'chef': format_chef(chefs_by_id.get(str(order['chef_id']))) if order.get('chef_id') else None,
                 'notes': order.get('notes'),
                 'createdAt': order['created_at'].isoformat() if order.get('created_at') else "",
                 'updatedAt': order['updated_at'].isoformat() if order.get('updated_at') else ""
@@ -338,19 +355,19 @@ def resolve_create_kitchen_order(_, info, input: Dict[str, Any]):
     cursor = conn.cursor(dictionary=True)
     
     try:
-        # Check if order already exists
-        cursor.execute("SELECT id FROM kitchen_orders WHERE order_id = %s", (input['orderId'],))
-        if cursor.fetchone():
-            raise Exception("Order already exists in kitchen queue")
-        
         # Prepare items JSON
-        items_json = json.dumps(input['items'])
+        items_json = codec.dumps(input['items'])
         
-        # Insert order
-        cursor.execute("""
-            INSERT INTO kitchen_orders (order_id, table_number, status, items, priority, notes)
-            VALUES (%s, %s, 'pending', %s, %s, %s)
-        """, (input['orderId'], input.get('tableNumber'), items_json, input.get('priority', 0), input.get('notes')))
+        # Insert order; the unique order_id rejects a repeated or concurrent ticket for the same order
+        try:
+            cursor.execute("""
+                INSERT INTO kitchen_orders (order_id, table_number, status, items, priority, notes)
+                VALUES (%s, %s, 'pending', %s, %s, %s)
+            """, (input['orderId'], input.get('tableNumber'), items_json, input.get('priority', 0), input.get('notes')))
+        except IntegrityError as e:
+            if e.errno != errorcode.ER_DUP_ENTRY:
+                raise
+            raise Exception("Order already exists in kitchen queue")
         
         order_id = cursor.lastrowid
         conn.commit()
@@ -359,9 +376,9 @@ def resolve_create_kitchen_order(_, info, input: Dict[str, Any]):
         cursor.execute("SELECT * FROM kitchen_orders WHERE id = %s", (order_id,))
         order = cursor.fetchone()
         
-        items = json.loads(order.get('items', '[]'))
+        items = codec.loads(order.get('items', '[]'))
         
-        return {
+        updated = {
             'id': str(order['id']),
             'orderId': order['order_id'],
             'tableNumber': order.get('table_number'),
@@ -375,6 +392,8 @@ def resolve_create_kitchen_order(_, info, input: Dict[str, Any]):
             'createdAt': order['created_at'].isoformat() if order.get('created_at') else "",
             'updatedAt': order['updated_at'].isoformat() if order.get('updated_at') else ""
         }
+        publish_kitchen_order_update(updated, 'created')
+        return updated
     except Exception as e:
         conn.rollback()
         raise Exception(f"Error creating kitchen order: {str(e)}")
@@ -390,6 +409,7 @@ def resolve_update_order_status(_, info, id: str, status: str):
     cursor = conn.cursor(dictionary=True)
     
     try:
+        previous = previous_status(cursor, id)
         cursor.execute("UPDATE kitchen_orders SET status = %s WHERE id = %s", (status, id))
         
         # Update chef status if order is ready or completed
@@ -404,6 +424,8 @@ def resolve_update_order_status(_, info, id: str, status: str):
                 """, (order['chef_id'],))
         
         conn.commit()
+        if status in ('ready', 'completed') and order and order.get('chef_id'):
+            chef_cache.invalidate(order['chef_id'])
         
         # Fetch updated order
         cursor.execute("SELECT * FROM kitchen_orders WHERE id = %s", (id,))
@@ -412,9 +434,9 @@ def resolve_update_order_status(_, info, id: str, status: str):
         if not order:
             raise Exception("Order not found")
         
-        items = json.loads(order.get('items', '[]'))
+        items = codec.loads(order.get('items', '[]'))
         
-        return {
+        updated = {
             'id': str(order['id']),
             'orderId': order['order_id'],
             'tableNumber': order.get('table_number'),
@@ -428,6 +450,8 @@ def resolve_update_order_status(_, info, id: str, status: str):
             'createdAt': order['created_at'].isoformat() if order.get('created_at') else "",
             'updatedAt': order['updated_at'].isoformat() if order.get('updated_at') else ""
         }
+        publish_kitchen_order_update(updated, 'updated', ['status'], previous)
+        return updated
     except Exception as e:
         conn.rollback()
         raise Exception(f"Error updating order status: {str(e)}")
@@ -470,14 +494,16 @@ def resolve_assign_chef(_, info, orderId: str, chefId: str):
                     }
                 }
                 """
-                response = httpx.post(
-                    user_service_url, 
-                    json={'query': query, 'variables': {'id': chefId}},
-                    timeout=5.0
-                )
+                with span("POST user-service", "client", attributes={"http.url": user_service_url}):
+                    response = httpx.post(
+                        user_service_url, 
+                        content=codec.dumps_bytes({'query': query, 'variables': {'id': chefId}}),
+                        headers=inject({"Content-Type": "application/json"}),
+                        timeout=5.0
+                    )
                 
                 if response.status_code == 200:
-                    data = response.json()
+                    data = codec.loads(response.content)
                     staff = data.get('data', {}).get('staffById')
                     
                     if staff and staff['role'] == 'CHEF':
@@ -487,6 +513,7 @@ def resolve_assign_chef(_, info, orderId: str, chefId: str):
                             VALUES (%s, %s, 'General', 'available', 0)
                         """, (staff['id'], staff['name']))
                         conn.commit()
+                        chef_cache.invalidate(staff['id'])
                         print(f"✅ Chef {staff['name']} synced successfully!")
                     else:
                         raise Exception("Chef not found in User Service or not a Chef role")
@@ -500,6 +527,7 @@ def resolve_assign_chef(_, info, orderId: str, chefId: str):
         # Proceed with assignment (Chef guaranteed to exist now)
         
         # Update order
+        previous = previous_status(cursor, orderId)
         cursor.execute("""
             UPDATE kitchen_orders 
             SET chef_id = %s, status = 'preparing' 
@@ -514,14 +542,15 @@ def resolve_assign_chef(_, info, orderId: str, chefId: str):
         """, (chefId,))
         
         conn.commit()
+        chef_cache.invalidate(chefId)
         
         # Fetch updated order
         cursor.execute("SELECT * FROM kitchen_orders WHERE id = %s", (orderId,))
         order = cursor.fetchone()
         
-        items = json.loads(order.get('items', '[]'))
+        items = codec.loads(order.get('items', '[]'))
         
-        return {
+        updated = {
             'id': str(order['id']),
             'orderId': order['order_id'],
             'tableNumber': order.get('table_number'),
@@ -535,6 +564,8 @@ def resolve_assign_chef(_, info, orderId: str, chefId: str):
             'createdAt': order['created_at'].isoformat() if order.get('created_at') else "",
             'updatedAt': order['updated_at'].isoformat() if order.get('updated_at') else ""
         }
+        publish_kitchen_order_update(updated, 'updated', ['chefId', 'chef', 'status'], previous)
+        return updated
     except Exception as e:
         conn.rollback()
         raise Exception(f"Error assigning chef: {str(e)}")
@@ -550,6 +581,7 @@ def resolve_complete_order(_, info, orderId: str):
     cursor = conn.cursor(dictionary=True)
     
     try:
+        previous = previous_status(cursor, orderId)
         cursor.execute("""
             UPDATE kitchen_orders 
             SET status = 'completed' 
@@ -571,6 +603,8 @@ def resolve_complete_order(_, info, orderId: str):
             """, (order['chef_id'],))
         
         conn.commit()
+        if order and order.get('chef_id'):
+            chef_cache.invalidate(order['chef_id'])
         
         # Fetch updated order
         cursor.execute("SELECT * FROM kitchen_orders WHERE id = %s", (orderId,))
@@ -579,9 +613,9 @@ def resolve_complete_order(_, info, orderId: str):
         if not order:
             raise Exception("Order not found")
         
-        items = json.loads(order.get('items', '[]'))
+        items = codec.loads(order.get('items', '[]'))
         
-        return {
+        updated = {
             'id': str(order['id']),
             'orderId': order['order_id'],
             'tableNumber': order.get('table_number'),
@@ -595,6 +629,8 @@ def resolve_complete_order(_, info, orderId: str):
             'createdAt': order['created_at'].isoformat() if order.get('created_at') else "",
             'updatedAt': order['updated_at'].isoformat() if order.get('updated_at') else ""
         }
+        publish_kitchen_order_update(updated, 'updated', ['status'], previous)
+        return updated
     except Exception as e:
         conn.rollback()
         raise Exception(f"Error completing order: {str(e)}")
@@ -618,7 +654,7 @@ def resolve_update_kitchen_order(_, info, id: str, input: Dict[str, Any]):
             params.append(input['tableNumber'])
         if 'items' in input and input['items']:
             updates.append("items = %s")
-            params.append(json.dumps(input['items']))
+            params.append(codec.dumps(input['items']))
         if 'priority' in input:
             updates.append("priority = %s")
             params.append(input['priority'])
@@ -644,9 +680,9 @@ def resolve_update_kitchen_order(_, info, id: str, input: Dict[str, Any]):
         if not order:
             raise Exception("Order not found")
         
-        items = json.loads(order.get('items', '[]'))
+        items = codec.loads(order.get('items', '[]'))
         
-        return {
+        updated = {
             'id': str(order['id']),
             'orderId': order['order_id'],
             'tableNumber': order.get('table_number'),
@@ -660,6 +696,9 @@ def resolve_update_kitchen_order(_, info, id: str, input: Dict[str, Any]):
             'createdAt': order['created_at'].isoformat() if order.get('created_at') else "",
             'updatedAt': order['updated_at'].isoformat() if order.get('updated_at') else ""
         }
+        if updates:
+            publish_kitchen_order_update(updated, 'updated', [field for field in input if field in KITCHEN_ORDER_COLUMNS])
+        return updated
     except Exception as e:
         conn.rollback()
         raise Exception(f"Error updating kitchen order: {str(e)}")
@@ -688,9 +727,9 @@ def resolve_update_estimated_time(_, info, orderId: str, estimatedTime: int):
         if not order:
             raise Exception("Order not found")
         
-        items = json.loads(order.get('items', '[]'))
+        items = codec.loads(order.get('items', '[]'))
         
-        return {
+        updated = {
             'id': str(order['id']),
             'orderId': order['order_id'],
             'tableNumber': order.get('table_number'),
@@ -704,6 +743,8 @@ def resolve_update_estimated_time(_, info, orderId: str, estimatedTime: int):
             'createdAt': order['created_at'].isoformat() if order.get('created_at') else "",
             'updatedAt': order['updated_at'].isoformat() if order.get('updated_at') else ""
         }
+        publish_kitchen_order_update(updated, 'updated', ['estimatedTime'])
+        return updated
     except Exception as e:
         conn.rollback()
         raise Exception(f"Error updating estimated time: {str(e)}")
@@ -719,8 +760,8 @@ def resolve_cancel_order(_, info, orderId: str):
     cursor = conn.cursor(dictionary=True)
     
     try:
-        # Get current order to check chef
-        cursor.execute("SELECT chef_id FROM kitchen_orders WHERE id = %s", (orderId,))
+        # Get current order to check chef (and its status for subscribers)
+        cursor.execute("SELECT chef_id, status FROM kitchen_orders WHERE id = %s", (orderId,))
         current_order = cursor.fetchone()
         
         cursor.execute(
@@ -741,6 +782,8 @@ def resolve_cancel_order(_, info, orderId: str):
             """, (current_order['chef_id'],))
         
         conn.commit()
+        if current_order and current_order.get('chef_id'):
+            chef_cache.invalidate(current_order['chef_id'])
         
         # Fetch updated order
         cursor.execute("SELECT * FROM kitchen_orders WHERE id = %s", (orderId,))
@@ -749,9 +792,9 @@ def resolve_cancel_order(_, info, orderId: str):
         if not order:
             raise Exception("Order not found")
         
-        items = json.loads(order.get('items', '[]'))
+        items = codec.loads(order.get('items', '[]'))
         
-        return {
+        updated = {
             'id': str(order['id']),
             'orderId': order['order_id'],
             'tableNumber': order.get('table_number'),
@@ -765,6 +808,8 @@ def resolve_cancel_order(_, info, orderId: str):
             'createdAt': order['created_at'].isoformat() if order.get('created_at') else "",
             'updatedAt': order['updated_at'].isoformat() if order.get('updated_at') else ""
         }
+        publish_kitchen_order_update(updated, 'updated', ['status'], current_order['status'] if current_order else None)
+        return updated
     except Exception as e:
         conn.rollback()
         raise Exception(f"Error cancelling order: {str(e)}")
@@ -773,5 +818,5 @@ def resolve_cancel_order(_, info, orderId: str):
         conn.close()
 
 # Export resolvers as list for Ariadne
-resolvers = [query, mutation, order_item, chef, kitchen_order]
+resolvers = [query, mutation, subscription, order_item, chef, kitchen_order]
 
@@ -0,0 +1,58 @@
+"""
+GraphQL subscriptions (graphql-transport-ws on /graphql)
+kitchenOrderUpdated pushes one KitchenOrderUpdate per committed kitchen order change instead of boards polling
+`kitchenOrders`/`pendingOrders`. Events are indexed by order and by status (new and previous), so
+`kitchenOrderUpdated(status: "pending")` also sees the update that moves an order out of pending.
+Mutations run in the resolver thread pool; the bus hands events over to the event loop.
+"""
+from datetime import datetime
+from typing import Optional, Dict, Any, Iterable
+from ariadne import SubscriptionType
+from src.event_bus import event_bus
+
+KITCHEN_ORDER_UPDATED = "kitchenOrderUpdated"
+
+subscription = SubscriptionType()
+
+def _status_filter(status: str):
+    return lambda event: status in (event['order']['status'], event['previousStatus'])
+
+def previous_status(cursor, id: str) -> Optional[str]:
+    """Lock the kitchen order and return its status before an update; skipped (None) while nobody is subscribed"""
+    if not event_bus.has_subscribers(KITCHEN_ORDER_UPDATED):
+        return None
+    cursor.execute("SELECT status FROM kitchen_orders WHERE id = %s FOR UPDATE", (id,))
+    row = cursor.fetchone()
+    return row['status'] if row else None
+
+def publish_kitchen_order_update(order: Dict[str, Any], event: str, changes: Iterable[str] = (),
+                                 previous_status: Optional[str] = None):
+    """Publish a committed change; `changes` lists the KitchenOrder fields it touched"""
+    if not event_bus.has_subscribers(KITCHEN_ORDER_UPDATED):
+        return
+    event_bus.publish(KITCHEN_ORDER_UPDATED, {
+        'event': event,
+        'orderId': order['orderId'],
+        'changes': list(changes),
+        'previousStatus': previous_status,
+        'order': order,
+        'at': datetime.utcnow().isoformat() + 'Z'
+    }, keys=(f"order:{order['orderId']}", f"status:{order['status']}", previous_status and f"status:{previous_status}"))
+
+@subscription.source("kitchenOrderUpdated")
+async def kitchen_order_updated_source(_, info, orderId: Optional[str] = None, status: Optional[str] = None):
+    if orderId:
+        subscriber = event_bus.subscribe(
+            KITCHEN_ORDER_UPDATED, f"order:{orderId}", _status_filter(status) if status else None
+        )
+    else:
+        subscriber = event_bus.subscribe(KITCHEN_ORDER_UPDATED, f"status:{status}" if status else None)
+    try:
+        async for event in subscriber:
+            yield event
+    finally:
+        event_bus.unsubscribe(subscriber)
+
+@subscription.field("kitchenOrderUpdated")
+async def resolve_kitchen_order_updated(event: Dict[str, Any], info, **kwargs):
+    return event
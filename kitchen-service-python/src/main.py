@@ -1,16 +1,29 @@
 import os
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
-from ariadne import make_executable_schema, load_schema_from_path, graphql_sync
+from fastapi.responses import HTMLResponse, PlainTextResponse
+from ariadne import make_executable_schema, load_schema_from_path, graphql, graphql_sync
+from ariadne.asgi import GraphQL
+from ariadne.asgi.handlers import GraphQLTransportWSHandler
 from dotenv import load_dotenv
-from src.database.connection import get_db_connection
+from src.codec import JSONResponse, CODEC_NAME
+from src.database.connection import get_db_connection, init_pool, close_pool, get_pool_stats
 from src.graphql.resolvers import resolvers
+from src.graphql.executor import GRAPHQL_EXECUTION_MODE, resolver_executor, offload_sync_resolvers
+from src.graphql.chef_cache import chef_cache
 from src.auth import get_auth_context
+from src.tracing import extract as extract_trace_context, shutdown_tracing, get_tracing_stats
+from src.graphql.extensions import QueryStatsExtension, MetricsExtension, TracingExtension, get_operation_name
+from src.graphql.metrics import render_metrics, render_stats
+from src.graphql.documents import (
+    PersistedQueryError, parse_query, validate_query, resolve_persisted_query, load_allowed_operations, get_document_stats
+)
+from src.database.instrumentation import get_query_totals
+from src.event_bus import event_bus
 
 load_dotenv()
 
-app = FastAPI(title="Kitchen Service (Python)", version="1.0.0")
+app = FastAPI(title="Kitchen Service (Python)", version="1.0.0", default_response_class=JSONResponse)
 
 # CORS middleware
 app.add_middleware(
@@ -28,16 +41,34 @@ type_defs = load_schema_from_path(schema_path)
 # Create executable schema
 schema = make_executable_schema(type_defs, resolvers)
 
+# Run blocking resolvers in a bounded thread pool instead of on the event loop
+if GRAPHQL_EXECUTION_MODE == "threadpool":
+    offload_sync_resolvers(schema, resolver_executor)
+
+def get_context_value(request, data: dict = None) -> dict:
+    """Build context with authentication info (HTTP requests and WebSocket connections)"""
+    auth_context = get_auth_context(request)
+    return {
+        "request": request,
+        "operation_name": get_operation_name(data),
+        "trace_parent": extract_trace_context(request.headers),
+        **auth_context
+    }
+
 @app.on_event("startup")
 async def startup_event():
     """Test database connection on startup"""
-    import time
+    import asyncio
     print("🚀 Kitchen Service (Python/Ariadne) running on http://localhost:4001")
     print("📊 GraphQL Explorer: http://localhost:4001/graphql")
     
+    # Preload the allowed operations registry (and warm the document cache)
+    load_allowed_operations()
+    
     max_retries = 10
     for i in range(max_retries):
         try:
+            init_pool()
             conn = get_db_connection()
             cursor = conn.cursor()
             cursor.execute("SELECT 1")
@@ -48,7 +79,7 @@ async def startup_event():
             return
         except Exception as e:
             if i < max_retries - 1:
-                time.sleep(2)
+                await asyncio.sleep(2)
             else:
                 print(f"❌ Error connecting to database: {e}")
                 raise
@@ -63,10 +94,38 @@ async def root():
         "graphql": "/graphql"
     }
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """End subscriptions, close resolver executor and database connection pool on shutdown"""
+    event_bus.close_all()
+    resolver_executor.shutdown()
+    close_pool()
+    shutdown_tracing()
+
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
 
+@app.get("/stats")
+async def stats():
+    """Database connection pool, resolver executor, SQL, chef cache, tracing, document cache and subscription metrics"""
+    return {"db_pool": get_pool_stats(), "executor": resolver_executor.stats(), "chef_cache": chef_cache.stats(), "sql": get_query_totals(), "tracing": get_tracing_stats(), "graphql_documents": get_document_stats(), "json_codec": CODEC_NAME, "subscriptions": event_bus.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Resolver, operation, DB pool, executor, chef cache, SQL, document cache and subscription metrics in Prometheus text format"""
+    return PlainTextResponse(
+        render_metrics(
+            render_stats("db_pool", get_pool_stats()),
+            render_stats("executor", resolver_executor.stats()),
+            render_stats("chef_cache", chef_cache.stats()),
+            render_stats("sql", get_query_totals()),
+            render_stats("graphql", get_document_stats()),
+            render_stats("subscriptions", event_bus.stats())
+        ),
+        media_type="text/plain; version=0.0.4"
+    )
+
 # Ariadne GraphQL Explorer HTML (native GraphiQL with dark theme)
 GRAPHQL_EXPLORER_HTML = """
 <!DOCTYPE html>
@@ -120,16 +179,42 @@ async def graphql_playground():
 @app.post("/graphql")
 async def graphql_server(request: Request):
     """GraphQL endpoint with auth context"""
-    data = await request.json()
-    auth_context = get_auth_context(request)
-    success, result = graphql_sync(
-        schema,
-        data,
-        context_value={"request": request, **auth_context},
-        debug=os.getenv("DEBUG", "False").lower() == "true"
-    )
+    try:
+        data = resolve_persisted_query(await request.json())
+    except PersistedQueryError as e:
+        return e.response()
+    context_value = get_context_value(request, data)
+    debug = os.getenv("DEBUG", "False").lower() == "true"
+    extensions = [QueryStatsExtension, MetricsExtension, TracingExtension]
+    
+    if GRAPHQL_EXECUTION_MODE == "sync":
+        success, result = graphql_sync(
+            schema, data, context_value=context_value, debug=debug, extensions=extensions,
+            query_parser=parse_query, query_validator=validate_query
+        )
+    else:
+        success, result = await graphql(
+            schema, data, context_value=context_value, debug=debug, extensions=extensions,
+            query_parser=parse_query, query_validator=validate_query
+        )
     status_code = 200 if success else 400
-    return result
+    # Rendered straight from the result (no jsonable_encoder pass)
+    return JSONResponse(result)
+
+# Subscriptions use Ariadne's WebSocket handler; queries and mutations stay on graphql_server
+graphql_ws_app = GraphQL(
+    schema,
+    debug=os.getenv("DEBUG", "False").lower() == "true",
+    context_value=get_context_value,
+    query_parser=parse_query,
+    query_validator=validate_query,
+    websocket_handler=GraphQLTransportWSHandler()
+)
+
+@app.websocket("/graphql")
+async def graphql_subscriptions(websocket: WebSocket):
+    """GraphQL subscriptions over WebSocket (graphql-transport-ws)"""
+    await graphql_ws_app.handle_websocket(websocket)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,266 @@
+"""
+Lightweight distributed tracing with W3C trace context propagation
+Spans for GraphQL operations, resolvers, SQL statements and outbound calls share one trace id across services
+(via the `traceparent` header) and are exported in batches as OTLP/JSON to a local file or an OTLP HTTP collector.
+"""
+import os
+import json
+import time
+import queue
+import random
+import secrets
+import threading
+import contextvars
+import urllib.request
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, NamedTuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()  # none | file | otlp
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME") or "kitchen-service"
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", 1.0))
+TRACE_EXPORT_BATCH_SIZE = int(os.getenv("TRACE_EXPORT_BATCH_SIZE", 256))
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", 2.0))  # seconds
+
+TRACING_ENABLED = TRACING_EXPORTER in ("file", "otlp")
+
+# OTLP SpanKind values
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3, "producer": 4, "consumer": 5}
+
+class SpanContext(NamedTuple):
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+def parse_traceparent(header: Optional[str]) -> Optional[SpanContext]:
+    """Parse a W3C traceparent header, returns None when missing or malformed"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    trace_id, span_id = parts[1].lower(), parts[2].lower()
+    try:
+        int(trace_id, 16)
+        int(span_id, 16)
+        flags = int(parts[3][:2], 16)
+    except ValueError:
+        return None
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return SpanContext(trace_id, span_id, bool(flags & 1))
+
+def extract(headers) -> Optional[SpanContext]:
+    """Incoming trace context from request headers"""
+    return parse_traceparent(headers.get("traceparent")) if headers is not None else None
+
+def _attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+class Span:
+    """One timed unit of work; exported when ended if its trace is sampled"""
+
+    def __init__(self, name: str, context: SpanContext, parent_id: Optional[str], kind: str, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_error(self, error: Any):
+        self.error = str(error) or error.__class__.__name__
+
+    def end(self, end_ns: Optional[int] = None):
+        if self.end_ns is None:
+            self.end_ns = end_ns or time.time_ns()
+            if self.context.sampled:
+                _exporter.submit(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.context.trace_id,
+            "spanId": self.context.span_id,
+            "name": self.name,
+            "kind": SPAN_KINDS.get(self.kind, 1),
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_attribute(k, v) for k, v in self.attributes.items() if v is not None],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 0}
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+_current: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+def start_span(name: str, kind: str = "internal", parent: Optional[SpanContext] = None, attributes: Optional[Dict[str, Any]] = None) -> Optional[Span]:
+    """Start a span under `parent` (default: the active span); returns None when tracing is disabled"""
+    if not TRACING_ENABLED:
+        return None
+    if parent is None:
+        active = _current.get()
+        parent = active.context if active is not None else None
+    if parent is not None:
+        context = SpanContext(parent.trace_id, secrets.token_hex(8), parent.sampled)
+    else:
+        context = SpanContext(secrets.token_hex(16), secrets.token_hex(8), random.random() < TRACE_SAMPLE_RATIO)
+    return Span(name, context, parent.span_id if parent else None, kind, attributes)
+
+def activate(span: Optional[Span]):
+    """Make span the active span, returns a token for deactivate()"""
+    return _current.set(span) if span is not None else None
+
+def deactivate(token):
+    if token is not None:
+        _current.reset(token)
+
+@contextmanager
+def span(name: str, kind: str = "internal", parent: Optional[SpanContext] = None, attributes: Optional[Dict[str, Any]] = None):
+    """Run a block inside an active span (yields None when tracing is disabled)"""
+    current = start_span(name, kind, parent, attributes)
+    token = activate(current)
+    try:
+        yield current
+    except BaseException as e:
+        if current is not None:
+            current.record_error(e)
+        raise
+    finally:
+        deactivate(token)
+        if current is not None:
+            current.end()
+
+def record_span(name: str, duration_ms: float, attributes: Optional[Dict[str, Any]] = None, kind: str = "client"):
+    """Record an already finished child of the active span (no-op outside a trace)"""
+    active = _current.get()
+    if active is None or not active.context.sampled:
+        return
+    end_ns = time.time_ns()
+    child = Span(name, SpanContext(active.context.trace_id, secrets.token_hex(8), True), active.context.span_id, kind, attributes)
+    child.start_ns = end_ns - int(duration_ms * 1_000_000)
+    child.end(end_ns)
+
+def inject(headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Add the active span's traceparent to outbound headers"""
+    headers = dict(headers or {})
+    active = _current.get()
+    if active is not None:
+        headers["traceparent"] = active.context.traceparent()
+    return headers
+
+def current_traceparent() -> Optional[str]:
+    """traceparent of the active span, for carrying a trace through queues"""
+    active = _current.get()
+    return active.context.traceparent() if active is not None else None
+
+class BatchExporter:
+    """Background thread that ships ended spans as OTLP/JSON batches"""
+
+    def __init__(self, exporter: str, batch_size: int, interval: float):
+        self.exporter = exporter
+        self.batch_size = max(batch_size, 1)
+        self.interval = interval
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=self.batch_size * 20)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats = {"exported": 0, "dropped": 0, "export_errors": 0}
+
+    def submit(self, span: Span):
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self._stats["dropped"] += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = self._drain(block=True)
+            if batch:
+                self._export(batch)
+
+    def _drain(self, block: bool) -> list:
+        batch = []
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if block and timeout > 0:
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _export(self, batch: list):
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_attribute("service.name", TRACE_SERVICE_NAME)]},
+                "scopeSpans": [{"scope": {"name": "restaurant.tracing"}, "spans": [s.to_otlp() for s in batch]}]
+            }]
+        }
+        try:
+            body = json.dumps(payload)
+            if self.exporter == "file":
+                with open(TRACE_FILE, "a", encoding="utf-8") as sink:
+                    sink.write(body + "\n")
+            else:
+                request = urllib.request.Request(
+                    TRACE_OTLP_ENDPOINT, data=body.encode("utf-8"),
+                    headers={"Content-Type": "application/json"}, method="POST"
+                )
+                urllib.request.urlopen(request, timeout=5).close()
+            self._stats["exported"] += len(batch)
+        except Exception as e:
+            self._stats["export_errors"] += 1
+            print(f"⚠️ Trace export failed ({len(batch)} spans): {e}")
+
+    def flush(self):
+        """Export everything queued so far (call on shutdown)"""
+        while True:
+            batch = self._drain(block=False)
+            if not batch:
+                return
+            self._export(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"exporter": self.exporter, "queued": self._queue.qsize(), **self._stats}
+
+_exporter = BatchExporter(TRACING_EXPORTER, TRACE_EXPORT_BATCH_SIZE, TRACE_EXPORT_INTERVAL)
+
+def shutdown_tracing():
+    """Flush pending spans"""
+    if TRACING_ENABLED:
+        _exporter.flush()
+
+def get_tracing_stats() -> Dict[str, Any]:
+    return {"enabled": TRACING_ENABLED, "sample_ratio": TRACE_SAMPLE_RATIO, **_exporter.stats()}
@@ -0,0 +1,91 @@
+"""
+Microbenchmark: JSON codec
+Compares the stdlib and orjson paths of src/codec.py on the payloads the services handle: decoding
+orders.items and menus.ingredients columns, encoding an outbound kitchen payload, and rendering a GraphQL
+`orders` response. The codec module is reloaded with JSON_CODEC set for each path. No database needed:
+
+    python benchmark_json_codec.py [orders] [repeats]
+"""
+import os
+import sys
+import time
+import importlib
+from src import codec
+
+def make_items(n: int):
+    return [
+        {"menuId": f"MENU{n + i:03d}", "name": f"Nasi Goreng Spesial {i}", "quantity": i % 3 + 1,
+         "price": 25000 + i * 1500, "specialInstructions": "tanpa sambal" if i % 2 else None}
+        for i in range(2 + n % 5)
+    ]
+
+def make_ingredients(n: int):
+    return [
+        {"ingredientId": f"ING{n + i:03d}", "ingredientName": f"Bahan {i}", "quantity": 0.25 * (i + 1), "unit": "kg"}
+        for i in range(3 + n % 6)
+    ]
+
+def make_response(count: int, items_columns):
+    """A GraphQL `orders` result as graphql-core hands it to the response renderer"""
+    return {
+        "data": {
+            "orders": [
+                {
+                    "id": str(n), "orderId": f"ORD-{n:08X}", "customerId": f"CUST{n % 500:04d}",
+                    "tableNumber": str(n % 30), "items": items, "subtotal": 118000.0, "tax": 11800.0,
+                    "serviceCharge": 5900.0, "discount": 0.0, "total": 135700.0, "paymentMethod": "cash",
+                    "paymentStatus": "paid", "orderStatus": "completed", "kitchenStatus": "completed",
+                    "createdAt": f"2026-01-01T12:{n % 60:02d}:00", "updatedAt": f"2026-01-01T12:{n % 60:02d}:00",
+                    "completedAt": None
+                }
+                for n, items in enumerate(items_columns)
+            ]
+        }
+    }
+
+def best_of(repeats: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def run(name: str, count: int, repeats: int):
+    os.environ["JSON_CODEC"] = name
+    impl = importlib.reload(codec)
+    if impl.CODEC_NAME != name:
+        print(f"{name}: not available")
+        return None
+    items_columns = [impl.dumps(make_items(n)) for n in range(count)]
+    ingredient_columns = [impl.dumps(make_ingredients(n)) for n in range(count)]
+    decoded_items = [impl.loads(column) for column in items_columns]
+    kitchen_payloads = [
+        {"query": "mutation CreateKitchenOrder($input: KitchenOrderInput!) { createKitchenOrder(input: $input) { id } }",
+         "variables": {"input": {"orderId": f"ORD-{n:08X}", "tableNumber": str(n % 30), "items": items}}}
+        for n, items in enumerate(decoded_items)
+    ]
+    response = make_response(count, decoded_items)
+    results = {
+        "decode orders.items": best_of(repeats, lambda: [impl.parse_json_field(c, []) for c in items_columns]),
+        "decode menus.ingredients": best_of(repeats, lambda: [impl.parse_json_field(c, []) for c in ingredient_columns]),
+        "encode kitchen payloads": best_of(repeats, lambda: [impl.dumps_bytes(p) for p in kitchen_payloads]),
+        "render orders response": best_of(repeats, lambda: impl.dumps_bytes(response)),
+    }
+    print(f"{name}: response {len(impl.dumps_bytes(response)) / 1024:.0f} KiB")
+    return results
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    print(f"orders/menus: {count}, best of {repeats}")
+    stdlib = run("stdlib", count, repeats)
+    fast = run("orjson", count, repeats)
+    for label, elapsed in stdlib.items():
+        line = f"  {label:<26} stdlib {elapsed * 1000:8.2f} ms"
+        if fast:
+            line += f"  orjson {fast[label] * 1000:8.2f} ms  x{elapsed / fast[label]:.1f}"
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Microbenchmark: orders row serialization
+Compares the previous per-resolver dict literal with OrderRow for a large `orders` listing, both when every
+field is selected and when only id/orderId/orderStatus are (the kitchen board / status polling case).
+Field access mimics graphql-core's default resolver (dict.get or getattr). No database needed:
+
+    python benchmark_order_rows.py [rows] [repeats]
+"""
+import sys
+import json
+import time
+import tracemalloc
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+from decimal import Decimal
+from src.graphql.order_rows import OrderRow
+
+ALL_FIELDS = (
+    "id", "orderId", "customerId", "tableNumber", "items", "subtotal", "tax", "serviceCharge", "discount",
+    "loyaltyPointsUsed", "loyaltyPointsEarned", "total", "paymentMethod", "paymentStatus", "orderStatus",
+    "kitchenStatus", "staffId", "notes", "createdAt", "updatedAt", "completedAt"
+)
+ITEM_FIELDS = ("menuId", "name", "quantity", "price", "specialInstructions")
+STATUS_FIELDS = ("id", "orderId", "orderStatus")
+
+def make_rows(count: int):
+    """Rows shaped like aiomysql DictCursor results (DECIMAL columns, datetimes, JSON text)"""
+    created = datetime(2026, 1, 1, 12, 0, 0)
+    items = json.dumps([
+        {"menuId": f"MENU{i:03d}", "name": f"Menu {i}", "quantity": i % 3 + 1, "price": 25000 + i * 1000,
+         "specialInstructions": None}
+        for i in range(4)
+    ])
+    return [
+        {
+            "id": n, "order_id": f"ORD-{n:08X}", "customer_id": f"CUST{n % 500:04d}", "table_number": str(n % 30),
+            "items": items, "subtotal": Decimal("118000.00"), "tax": Decimal("11800.00"),
+            "service_charge": Decimal("5900.00"), "discount": Decimal("0.00"), "loyalty_points_used": Decimal("0.00"),
+            "loyalty_points_earned": Decimal("1180.00"), "total": Decimal("135700.00"), "payment_method": "cash",
+            "payment_status": "paid", "order_status": "completed", "kitchen_status": "completed", "staff_id": None,
+            "notes": None, "created_at": created + timedelta(minutes=n), "updated_at": created + timedelta(minutes=n),
+            "completed_at": None
+        }
+        for n in range(count)
+    ]
+
+def legacy_order(row):
+    """The dict literal previously copied into each order resolver"""
+    items_data = row.get("items")
+    items_data = json.loads(items_data) if isinstance(items_data, str) else (items_data or [])
+    return {
+        'id': str(row.get("id")),
+        'orderId': row.get("order_id", ""),
+        'customerId': row.get("customer_id"),
+        'tableNumber': row.get("table_number"),
+        'items': [
+            {
+                'menuId': item.get("menuId", "") if isinstance(item, dict) else "",
+                'name': item.get("name", "") if isinstance(item, dict) else "",
+                'quantity': item.get("quantity", 0) if isinstance(item, dict) else 0,
+                'price': float(item.get("price", 0) if isinstance(item, dict) else 0),
+                'specialInstructions': item.get("specialInstructions") if isinstance(item, dict) else None
+            }
+            for item in items_data
+        ],
+        'subtotal': float(row.get("subtotal", 0) or 0),
+        'tax': float(row.get("tax", 0) or 0),
+        'serviceCharge': float(row.get("service_charge", 0) or 0),
+        'discount': float(row.get("discount", 0) or 0),
+        'loyaltyPointsUsed': float(row.get("loyalty_points_used", 0) or 0),
+        'loyaltyPointsEarned': float(row.get("loyalty_points_earned", 0) or 0),
+        'total': float(row.get("total", 0) or 0),
+        'paymentMethod': row.get("payment_method", "cash"),
+        'paymentStatus': row.get("payment_status", "pending"),
+        'orderStatus': row.get("order_status", "pending"),
+        'kitchenStatus': row.get("kitchen_status"),
+        'staffId': row.get("staff_id"),
+        'notes': row.get("notes"),
+        'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
+        'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else "",
+        'completedAt': row.get("completed_at").isoformat() if row.get("completed_at") else None
+    }
+
+def default_resolver(source, field_name):
+    """graphql-core's default_field_resolver without the info/args plumbing"""
+    value = source.get(field_name) if isinstance(source, Mapping) else getattr(source, field_name, None)
+    return value() if callable(value) else value
+
+def resolve_fields(objects, fields, item_fields):
+    """Read the selected fields the way the default resolver does"""
+    for obj in objects:
+        for field in fields:
+            value = default_resolver(obj, field)
+            if field == "items":
+                for item in value:
+                    for item_field in item_fields:
+                        default_resolver(item, item_field)
+
+def run(label: str, serialize, rows, fields, repeats: int):
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        objects = [serialize(row) for row in rows]
+        resolve_fields(objects, fields, ITEM_FIELDS)
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    objects = [serialize(row) for row in rows]
+    resolve_fields(objects, fields, ITEM_FIELDS)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    print(f"  {label:<8} {best * 1000:9.2f} ms  {best / len(rows) * 1e6:7.2f} µs/row  {retained / len(rows):8.0f} B/row")
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    rows = make_rows(count)
+    print(f"orders rows: {count}, best of {repeats}")
+    for title, fields in (("all fields + items", ALL_FIELDS), ("id, orderId, orderStatus", STATUS_FIELDS)):
+        print(title)
+        run("dict", legacy_order, rows, fields, repeats)
+        run("OrderRow", OrderRow, rows, fields, repeats)
+
+if __name__ == "__main__":
+    main()
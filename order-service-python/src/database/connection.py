@@ -1,7 +1,7 @@
 import os
 import aiomysql
-from aiomysql import DictCursor
 from dotenv import load_dotenv
+from src.database.instrumentation import InstrumentedCursor
 
 load_dotenv()
 
@@ -19,7 +19,7 @@ async def init_db():
         minsize=1,
         maxsize=10,
         autocommit=False,
-        cursorclass=DictCursor
+        cursorclass=InstrumentedCursor
     )
     # Test connection
     async with pool.acquire() as conn:
@@ -31,6 +31,18 @@ def get_db():
     """Get database pool instance"""
     return pool
 
+def get_pool_stats() -> dict:
+    """Connection pool occupancy"""
+    if pool is None:
+        return {}
+    return {
+        "min_size": pool.minsize,
+        "max_size": pool.maxsize,
+        "size": pool.size,
+        "idle": pool.freesize,
+        "in_use": pool.size - pool.freesize
+    }
+
 async def close_db():
     """Close database pool"""
     global pool
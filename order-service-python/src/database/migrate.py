@@ -62,10 +62,64 @@ async def migrate():
                     INDEX idx_cart_id (cart_id),
                     INDEX idx_user_id (user_id),
                     INDEX idx_customer_id (customer_id),
-                    INDEX idx_status (status)
+                    INDEX idx_status (status),
+                    INDEX idx_customer_created (customer_id, created_at),
+                    INDEX idx_status_created (status, created_at)
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
             """)
             
+            # Create cart_items table (one row per cart line, replaces the carts.items JSON)
+            await cur.execute("""
+                CREATE TABLE IF NOT EXISTS cart_items (
+                    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                    cart_id VARCHAR(255) NOT NULL,
+                    menu_id VARCHAR(255) NOT NULL,
+                    name VARCHAR(255) NOT NULL DEFAULT '',
+                    quantity INT NOT NULL DEFAULT 1,
+                    price DECIMAL(10, 2) NOT NULL DEFAULT 0,
+                    special_instructions TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                    UNIQUE KEY uniq_cart_menu (cart_id, menu_id)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+            """)
+            
+            # Move lines still stored in carts.items JSON into cart_items and rebuild the stored totals;
+            # the JSON is emptied afterwards, so re-running the migration is a no-op
+            await cur.execute("""
+                INSERT INTO cart_items (cart_id, menu_id, name, quantity, price, special_instructions)
+                SELECT c.cart_id, j.menu_id, MAX(COALESCE(j.name, '')), SUM(COALESCE(j.quantity, 1)),
+                       MAX(COALESCE(j.price, 0)), MAX(j.special_instructions)
+                FROM carts c
+                JOIN JSON_TABLE(c.items, '$[*]' COLUMNS (
+                    menu_id VARCHAR(255) PATH '$.menuId',
+                    name VARCHAR(255) PATH '$.name',
+                    quantity INT PATH '$.quantity',
+                    price DECIMAL(10, 2) PATH '$.price',
+                    special_instructions TEXT PATH '$.specialInstructions'
+                )) j
+                WHERE c.cart_id IS NOT NULL AND JSON_LENGTH(c.items) > 0 AND j.menu_id IS NOT NULL
+                GROUP BY c.cart_id, j.menu_id
+                ON DUPLICATE KEY UPDATE quantity = cart_items.quantity + VALUES(quantity)
+            """)
+            migrated_lines = cur.rowcount
+            await cur.execute("""
+                UPDATE carts c
+                LEFT JOIN (
+                    SELECT cart_id, subtotal, ROUND(subtotal * 0.1, 2) AS tax, ROUND(subtotal * 0.05, 2) AS service_charge
+                    FROM (SELECT cart_id, SUM(quantity * price) AS subtotal FROM cart_items GROUP BY cart_id) per_cart
+                ) t ON t.cart_id = c.cart_id
+                SET c.subtotal = COALESCE(t.subtotal, 0),
+                    c.tax = COALESCE(t.tax, 0),
+                    c.service_charge = COALESCE(t.service_charge, 0),
+                    c.total = COALESCE(t.subtotal + t.tax + t.service_charge, 0) - c.discount,
+                    c.items = '[]'
+                WHERE JSON_LENGTH(c.items) > 0
+            """)
+            await conn.commit()
+            if migrated_lines:
+                print(f"✅ Moved {migrated_lines} cart lines from carts.items into cart_items")
+            
             # Create orders table
             await cur.execute("""
                 CREATE TABLE IF NOT EXISTS orders (
@@ -84,7 +138,7 @@ async def migrate():
                     payment_method ENUM('cash', 'card', 'digital_wallet', 'loyalty_points', 'qris', 'transfer') DEFAULT 'cash',
                     payment_status ENUM('pending', 'paid', 'refunded') DEFAULT 'pending',
                     order_status ENUM('pending', 'confirmed', 'preparing', 'ready', 'served', 'completed', 'cancelled') DEFAULT 'pending',
-                    kitchen_status ENUM('pending', 'preparing', 'ready', 'completed') DEFAULT 'pending',
+                    kitchen_status ENUM('pending', 'preparing', 'ready', 'completed', 'cancelled') DEFAULT 'pending',
                     staff_id VARCHAR(255),
                     notes TEXT,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -95,7 +149,10 @@ async def migrate():
                     INDEX idx_table_number (table_number),
                     INDEX idx_order_status (order_status),
                     INDEX idx_payment_status (payment_status),
-                    INDEX idx_created_at (created_at)
+                    INDEX idx_created_at (created_at),
+                    INDEX idx_customer_created (customer_id, created_at),
+                    INDEX idx_order_status_created (order_status, created_at),
+                    INDEX idx_payment_status_created (payment_status, created_at)
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
             """)
             
@@ -110,7 +167,64 @@ async def migrate():
                 # Table might not exist or column might already be updated
                 if "Unknown column" not in str(e) and "Duplicate column name" not in str(e):
                     print(f"⚠️  Could not update payment_method ENUM: {e}")
-        
+            
+            # Allow cancelled kitchen status (set when a kitchen cancellation is delivered)
+            try:
+                await cur.execute("""
+                    ALTER TABLE orders 
+                    MODIFY COLUMN kitchen_status ENUM('pending', 'preparing', 'ready', 'completed', 'cancelled') DEFAULT 'pending'
+                """)
+            except Exception as e:
+                print(f"⚠️  Could not update kitchen_status ENUM: {e}")
+            
+            # Composite (filter, created_at) indexes for the keyset-paginated listings on existing tables;
+            # InnoDB appends the primary key, so they also cover the (created_at, id) tie-break
+            for table, index, columns in [
+                ("carts", "idx_customer_created", "customer_id, created_at"),
+                ("carts", "idx_status_created", "status, created_at"),
+                ("orders", "idx_customer_created", "customer_id, created_at"),
+                ("orders", "idx_order_status_created", "order_status, created_at"),
+                ("orders", "idx_payment_status_created", "payment_status, created_at")
+            ]:
+                try:
+                    await cur.execute(f"ALTER TABLE {table} ADD INDEX {index} ({columns})")
+                except Exception as e:
+                    if "Duplicate key name" not in str(e):
+                        print(f"⚠️  Could not add index {index} on {table}: {e}")
+            
+            # Create order_outbox table (side-effects written with the order, delivered by the dispatcher)
+            await cur.execute("""
+                CREATE TABLE IF NOT EXISTS order_outbox (
+                    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                    event_type VARCHAR(100) NOT NULL,
+                    aggregate_id VARCHAR(255) NOT NULL,
+                    idempotency_key VARCHAR(255) NOT NULL UNIQUE,
+                    payload JSON NOT NULL,
+                    status ENUM('pending', 'processing', 'done', 'failed') DEFAULT 'pending',
+                    attempts INT DEFAULT 0,
+                    last_error TEXT,
+                    next_attempt_at TIMESTAMP(3) DEFAULT CURRENT_TIMESTAMP(3),
+                    locked_until TIMESTAMP(3) NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    processed_at TIMESTAMP NULL,
+                    INDEX idx_status_next_attempt (status, next_attempt_at),
+                    INDEX idx_aggregate_id (aggregate_id)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+            """)
+
+            # Create order_idempotency_keys table (one row per createOrder idempotencyKey, claimed with the order)
+            await cur.execute("""
+                CREATE TABLE IF NOT EXISTS order_idempotency_keys (
+                    idempotency_key VARCHAR(255) NOT NULL PRIMARY KEY,
+                    operation VARCHAR(64) NOT NULL,
+                    request_hash CHAR(64) NOT NULL,
+                    order_id VARCHAR(255) NOT NULL,
+                    response JSON,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    INDEX idx_created_at (created_at)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+            """)
+
         conn.close()
         print("✅ Order Service (Python) migrations completed")
         sys.exit(0)
@@ -0,0 +1,156 @@
+"""
+In-process pub/sub bus feeding GraphQL subscriptions
+Mutations publish a change event after they commit. Subscribers register for a topic, optionally narrowed to
+one key (an orderId or a status), so an event is only handed to the subscribers that asked for it.
+Each subscriber has a bounded queue and publishing never blocks: when a queue is full its oldest event is
+dropped, and a subscriber that falls SUBSCRIPTION_MAX_DROPS events behind is disconnected.
+publish() is thread-safe; events are delivered on each subscriber's own event loop.
+"""
+import os
+import asyncio
+import threading
+from typing import Optional, Dict, Any, Set, Tuple, Iterable, Callable
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SUBSCRIPTION_QUEUE_SIZE = int(os.getenv("SUBSCRIPTION_QUEUE_SIZE", 100))  # pending events per subscription
+SUBSCRIPTION_MAX_DROPS = int(os.getenv("SUBSCRIPTION_MAX_DROPS", 500))  # dropped in a row before disconnecting, 0 never
+SUBSCRIPTION_MAX = int(os.getenv("SUBSCRIPTION_MAX", 1000))  # concurrent subscriptions per process
+
+_CLOSED = object()
+
+class Subscriber:
+    """One subscription: a bounded queue consumed with `async for`"""
+
+    def __init__(self, bus: "EventBus", topic: str, key: Optional[str], predicate: Optional[Callable[[Any], bool]],
+                 loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.bus = bus
+        self.topic = topic
+        self.key = key
+        self.predicate = predicate
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.overflow = 0  # events dropped since the consumer last caught up
+        self.slow = False
+
+    def _offer(self, event: Any):
+        """Enqueue on the subscriber's loop, dropping the oldest pending event when full"""
+        if self.slow:
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.overflow += 1
+            self.bus._count("dropped")
+            if SUBSCRIPTION_MAX_DROPS and self.overflow >= SUBSCRIPTION_MAX_DROPS:
+                self.slow = True
+                self.bus.unsubscribe(self)
+                self.bus._count("disconnected")
+                event = _CLOSED
+        self.queue.put_nowait(event)
+
+    def close(self):
+        """End the iteration (thread-safe)"""
+        self.bus.unsubscribe(self)
+        try:
+            self.loop.call_soon_threadsafe(self._end)
+        except RuntimeError:
+            pass  # loop already closed
+
+    def _end(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(_CLOSED)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Any:
+        event = await self.queue.get()
+        if event is _CLOSED:
+            if self.slow:
+                raise Exception("Subscription closed: client is not keeping up, resubscribe and refetch")
+            raise StopAsyncIteration
+        if self.queue.empty():
+            self.overflow = 0
+        return event
+
+class EventBus:
+    """Topic/key index of subscribers with per-subscriber bounded queues"""
+
+    def __init__(self, queue_size: int, max_subscribers: int):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers: Dict[Tuple[str, Optional[str]], Set[Subscriber]] = {}
+        self._topics: Dict[str, int] = {}  # topic -> subscriber count
+        self._active = 0
+        self._lock = threading.Lock()
+        self._stats = {"subscribed": 0, "published": 0, "delivered": 0, "dropped": 0, "disconnected": 0}
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def subscribe(self, topic: str, key: Optional[Any] = None,
+                  predicate: Optional[Callable[[Any], bool]] = None) -> Subscriber:
+        """Register on the running loop for a topic, or only for events published under `key`"""
+        subscriber = Subscriber(
+            self, topic, str(key) if key is not None else None, predicate,
+            asyncio.get_running_loop(), self.queue_size
+        )
+        with self._lock:
+            if self._active >= self.max_subscribers:
+                raise Exception("Too many active subscriptions, try again later")
+            self._subscribers.setdefault((topic, subscriber.key), set()).add(subscriber)
+            self._topics[topic] = self._topics.get(topic, 0) + 1
+            self._active += 1
+            self._stats["subscribed"] += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            index = (subscriber.topic, subscriber.key)
+            subscribers = self._subscribers.get(index)
+            if subscribers and subscriber in subscribers:
+                subscribers.discard(subscriber)
+                self._topics[subscriber.topic] -= 1
+                self._active -= 1
+                if not subscribers:
+                    del self._subscribers[index]
+
+    def has_subscribers(self, topic: str) -> bool:
+        """Lets publishers skip building events (and extra reads) nobody would receive"""
+        return self._topics.get(topic, 0) > 0
+
+    def publish(self, topic: str, event: Any, keys: Iterable[Any] = ()):
+        """Hand `event` to the topic's unkeyed subscribers and to those subscribed to any of `keys`"""
+        with self._lock:
+            self._stats["published"] += 1
+            targets = set(self._subscribers.get((topic, None), ()))
+            for key in keys:
+                if key is not None:
+                    targets.update(self._subscribers.get((topic, str(key)), ()))
+        delivered = 0
+        for subscriber in targets:
+            if subscriber.predicate is not None and not subscriber.predicate(event):
+                continue
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber._offer, event)
+                delivered += 1
+            except RuntimeError:
+                self.unsubscribe(subscriber)  # its loop is gone
+        if delivered:
+            self._count("delivered", delivered)
+
+    def close_all(self):
+        """End every subscription (call on shutdown)"""
+        with self._lock:
+            subscribers = [s for group in self._subscribers.values() for s in group]
+        for subscriber in subscribers:
+            subscriber.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"active": self._active, "queue_size": self.queue_size, **self._stats}
+
+event_bus = EventBus(SUBSCRIPTION_QUEUE_SIZE, SUBSCRIPTION_MAX)
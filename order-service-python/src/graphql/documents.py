@@ -0,0 +1,223 @@
+"""
+Parsed query document cache, Automatic Persisted Queries and an allowed-operations registry
+
+Documents are parsed once and kept in an LRU keyed by the query's sha256 (the same hash APQ clients send);
+validation results are cached alongside each document. Operations listed in GRAPHQL_ALLOWED_OPERATIONS_FILE
+are preloaded at startup, and GRAPHQL_ALLOWED_OPERATIONS_ONLY restricts execution to them.
+"""
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List
+from graphql import parse, validate, GraphQLError
+from ariadne.asgi.handlers import GraphQLHTTPHandler
+from dotenv import load_dotenv
+from src.codec import JSONResponse
+
+load_dotenv()
+
+GRAPHQL_DOCUMENT_CACHE_SIZE = int(os.getenv("GRAPHQL_DOCUMENT_CACHE_SIZE", 256))
+GRAPHQL_APQ_CACHE_SIZE = int(os.getenv("GRAPHQL_APQ_CACHE_SIZE", 1000))
+GRAPHQL_ALLOWED_OPERATIONS_FILE = os.getenv("GRAPHQL_ALLOWED_OPERATIONS_FILE", "")
+GRAPHQL_ALLOWED_OPERATIONS_ONLY = os.getenv("GRAPHQL_ALLOWED_OPERATIONS_ONLY", "False").lower() == "true"
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+class PersistedQueryError(Exception):
+    """APQ / allowlist rejection, reported as a regular GraphQL error response"""
+
+    def __init__(self, message: str, code: str):
+        super().__init__(message)
+        self.code = code
+
+    def response(self) -> Dict[str, Any]:
+        return {"errors": [{"message": str(self), "extensions": {"code": self.code}}]}
+
+class _CachedDocument:
+    __slots__ = ("document", "validation")
+
+    def __init__(self, document):
+        self.document = document
+        self.validation: Dict[tuple, List[GraphQLError]] = {}
+
+class DocumentCache:
+    """LRU of parsed documents with their validation results"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max(max_size, 1)
+        self._entries: "OrderedDict[str, _CachedDocument]" = OrderedDict()
+        self._by_document: Dict[int, _CachedDocument] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "validation_hits": 0, "validation_misses": 0, "evictions": 0}
+
+    def parse(self, query: str):
+        key = query_hash(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry.document
+            self._stats["misses"] += 1
+        # Syntax errors propagate and are never cached
+        document = parse(query)
+        with self._lock:
+            if key not in self._entries:
+                entry = _CachedDocument(document)
+                self._entries[key] = entry
+                self._by_document[id(document)] = entry
+                while len(self._entries) > self.max_size:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._by_document.pop(id(evicted.document), None)
+                    self._stats["evictions"] += 1
+            return self._entries[key].document
+
+    def validate(self, schema, document, rules=None, max_errors=None, type_info=None) -> List[GraphQLError]:
+        rules_key = tuple(rules or ())
+        with self._lock:
+            entry = self._by_document.get(id(document))
+            if entry is not None and entry.document is document and rules_key in entry.validation:
+                self._stats["validation_hits"] += 1
+                return entry.validation[rules_key]
+            self._stats["validation_misses"] += 1
+        errors = validate(schema, document, rules=rules, max_errors=max_errors, type_info=type_info)
+        if entry is not None and entry.document is document:
+            with self._lock:
+                entry.validation[rules_key] = errors
+        return errors
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size, **self._stats}
+
+class PersistedQueryStore:
+    """sha256 -> query text for APQ (bounded LRU) plus the preloaded allowed operations (never evicted)"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max(max_size, 1)
+        self._queries: "OrderedDict[str, str]" = OrderedDict()
+        self._allowed: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stats = {"apq_hits": 0, "apq_misses": 0, "apq_registered": 0, "rejected": 0}
+
+    def allow(self, query: str) -> str:
+        key = query_hash(query)
+        with self._lock:
+            self._allowed[key] = query
+        return key
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            query = self._allowed.get(key)
+            if query is None:
+                query = self._queries.get(key)
+                if query is not None:
+                    self._queries.move_to_end(key)
+            self._stats["apq_hits" if query is not None else "apq_misses"] += 1
+            return query
+
+    def register(self, key: str, query: str):
+        with self._lock:
+            self._queries[key] = query
+            self._queries.move_to_end(key)
+            self._stats["apq_registered"] += 1
+            while len(self._queries) > self.max_size:
+                self._queries.popitem(last=False)
+
+    def is_allowed(self, query: str) -> bool:
+        with self._lock:
+            return query_hash(query) in self._allowed
+
+    def reject(self):
+        with self._lock:
+            self._stats["rejected"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "allowed_operations": len(self._allowed),
+                "allowed_only": GRAPHQL_ALLOWED_OPERATIONS_ONLY,
+                "apq_size": len(self._queries),
+                **self._stats
+            }
+
+document_cache = DocumentCache(GRAPHQL_DOCUMENT_CACHE_SIZE)
+persisted_queries = PersistedQueryStore(GRAPHQL_APQ_CACHE_SIZE)
+
+def parse_query(context_value, data: Dict[str, Any]):
+    """Ariadne query_parser hook"""
+    return document_cache.parse(data["query"])
+
+def validate_query(schema, document, rules=None, max_errors=None, type_info=None) -> List[GraphQLError]:
+    """Ariadne query_validator hook"""
+    return document_cache.validate(schema, document, rules=rules, max_errors=max_errors, type_info=type_info)
+
+def resolve_persisted_query(data: Any) -> Any:
+    """Apply the APQ protocol and the allowlist to a request body, returning the body to execute
+
+    Raises PersistedQueryError for unknown hashes, hash mismatches and operations outside the allowlist.
+    """
+    if not isinstance(data, dict):
+        return data
+    persisted = ((data.get("extensions") or {}).get("persistedQuery") or {})
+    query = data.get("query")
+    key = persisted.get("sha256Hash")
+
+    if key:
+        if query is None:
+            query = persisted_queries.get(key)
+            if query is None:
+                raise PersistedQueryError("PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND")
+            data = {**data, "query": query}
+        elif query_hash(query) != key:
+            raise PersistedQueryError("provided sha does not match query", "PERSISTED_QUERY_HASH_MISMATCH")
+        elif not GRAPHQL_ALLOWED_OPERATIONS_ONLY:
+            persisted_queries.register(key, query)
+
+    if GRAPHQL_ALLOWED_OPERATIONS_ONLY and isinstance(query, str) and not persisted_queries.is_allowed(query):
+        persisted_queries.reject()
+        raise PersistedQueryError("Operation is not in the allowed operations registry", "OPERATION_NOT_ALLOWED")
+    return data
+
+def load_allowed_operations(path: str = GRAPHQL_ALLOWED_OPERATIONS_FILE) -> int:
+    """Preload allowed operations and warm the document cache
+
+    The file is JSON: either {"<sha256>": "<query>", ...} (e.g. a persisted-query manifest) or a list of queries.
+    """
+    if not path:
+        return 0
+    with open(path, encoding="utf-8") as source:
+        manifest = json.load(source)
+    queries = list(manifest.values()) if isinstance(manifest, dict) else list(manifest)
+    for query in queries:
+        persisted_queries.allow(query)
+        document_cache.parse(query)
+    print(f"📜 Loaded {len(queries)} allowed GraphQL operations from {path}")
+    return len(queries)
+
+class PersistedQueryHTTPHandler(GraphQLHTTPHandler):
+    """ASGI handler that resolves APQ hashes and enforces the allowlist before execution
+
+    Responses are rendered with the shared JSON codec.
+    """
+
+    async def extract_data_from_request(self, request):
+        data = await super().extract_data_from_request(request)
+        if isinstance(data, list):
+            return [resolve_persisted_query(item) for item in data]
+        return resolve_persisted_query(data)
+
+    async def handle_request(self, request):
+        try:
+            return await super().handle_request(request)
+        except PersistedQueryError as e:
+            return JSONResponse(e.response())
+
+    async def create_json_response(self, request, result: dict, success: bool):
+        return JSONResponse(result, status_code=200 if success else 400)
+
+def get_document_stats() -> Dict[str, Any]:
+    return {"documents": document_cache.stats(), "persisted_queries": persisted_queries.stats()}
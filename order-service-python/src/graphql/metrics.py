@@ -0,0 +1,148 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format
+Resolver latency histograms, error counters and operation gauges are fed by MetricsExtension;
+pool and client stats dicts are exported as gauges when /metrics is scraped.
+"""
+import re
+import threading
+from typing import Optional, Dict, Any, List, Tuple
+
+# Seconds, the Prometheus client defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NAME_RE = re.compile(r"^[a-zA-Z_][a-zA-Z0-9_]*$")
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values"""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: Dict[tuple, list] = {}  # label values -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        for label_values, series in sorted(items):
+            labels = tuple(zip(self.label_names, label_values))
+            cumulative = 0
+            for i, bound in enumerate(self.buckets):
+                cumulative += series[i]
+                lines.append(f"{self.name}_bucket{_labels(labels + (('le', repr(bound)),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(labels + (('le', '+Inf'),))} {series[-2]}")
+            lines.append(f"{self.name}_count{_labels(labels)} {series[-2]}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {_number(series[-1])}")
+        return lines
+
+class Counter:
+    """Monotonic counter (or gauge, with kind='gauge') keyed by label values"""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = (), kind: str = "counter"):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.kind = kind
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values: str, amount: float = 1):
+        self.inc(*label_values, amount=-amount)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.label_names:
+            items = [((), 0)]
+        for label_values, value in items:
+            lines.append(f"{self.name}{_labels(tuple(zip(self.label_names, label_values)))} {_number(value)}")
+        return lines
+
+resolver_duration = Histogram(
+    "graphql_resolver_duration_seconds", "Resolver latency by parent type and field", ("type", "field")
+)
+resolver_errors = Counter(
+    "graphql_resolver_errors_total", "Resolvers that raised, by parent type and field", ("type", "field")
+)
+operation_duration = Histogram(
+    "graphql_operation_duration_seconds", "GraphQL operation latency by operation name", ("operation",)
+)
+operations_total = Counter(
+    "graphql_operations_total", "GraphQL operations by operation name and outcome", ("operation", "status")
+)
+operations_in_flight = Counter(
+    "graphql_operations_in_flight", "GraphQL operations currently executing", kind="gauge"
+)
+
+REGISTRY = (resolver_duration, resolver_errors, operation_duration, operations_total, operations_in_flight)
+
+def _flatten(prefix: str, value: Any, labels: tuple, out: Dict[str, list]):
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, (int, float)):
+        out.setdefault(prefix, []).append((labels, value))
+    elif isinstance(value, dict):
+        for key, child in value.items():
+            key = str(key)
+            if _NAME_RE.match(key):
+                _flatten(f"{prefix}_{key}", child, labels, out)
+            else:
+                # Dynamic keys (URLs, origins) become a label instead of part of the name
+                _flatten(prefix, child, labels + (("key", key),), out)
+
+def render_stats(prefix: str, stats: Dict[str, Any], label: Optional[str] = None) -> List[str]:
+    """Export the numeric leaves of a stats dict as gauges named <prefix>_<path>
+
+    With label set, the top-level keys become values of that label (e.g. one series per service).
+    """
+    out: Dict[str, list] = {}
+    if label:
+        for key, child in (stats or {}).items():
+            _flatten(prefix, child, ((label, str(key)),), out)
+    else:
+        _flatten(prefix, stats or {}, (), out)
+    lines = []
+    for name, samples in sorted(out.items()):
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(f"{name}{_labels(labels)} {_number(value)}" for labels, value in samples)
+    return lines
+
+def render_metrics(*sections: List[str]) -> str:
+    """Registry metrics followed by any extra rendered sections"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for section in sections:
+        lines.extend(section)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,134 @@
+"""
+Compact GraphQL objects for orders rows
+OrderRow copies the columns it needs into __slots__ (so the cursor's row dict can be freed); the items JSON
+is decoded once, on first access, and never for queries that don't select `items`. Rows may be projected
+(see ORDER_COLUMNS); columns that weren't selected read as their defaults.
+"""
+from typing import Optional, List, Dict, Any
+from src import codec
+
+class OrderItemRow:
+    """One entry of orders.items"""
+
+    __slots__ = ("menuId", "name", "quantity", "price", "specialInstructions")
+
+    def __init__(self, item: Any):
+        if isinstance(item, dict):
+            get = item.get
+            self.menuId = get("menuId", "")
+            self.name = get("name", "")
+            self.quantity = get("quantity", 0)
+            self.price = float(get("price", 0) or 0)
+            self.specialInstructions = get("specialInstructions")
+        else:
+            self.menuId = ""
+            self.name = ""
+            self.quantity = 0
+            self.price = 0.0
+            self.specialInstructions = None
+
+def _decode_items(raw: Any) -> list:
+    if not raw:
+        return []
+    if isinstance(raw, (str, bytes)):
+        try:
+            raw = codec.loads(raw)
+        except ValueError:
+            return []
+    return raw if isinstance(raw, list) else []
+
+# Order field -> orders columns, for projecting SELECTs onto the selection set
+ORDER_COLUMNS = {
+    "id": ("id",),
+    "orderId": ("order_id",),
+    "customerId": ("customer_id",),
+    "tableNumber": ("table_number",),
+    "items": ("items",),
+    "subtotal": ("subtotal",),
+    "tax": ("tax",),
+    "serviceCharge": ("service_charge",),
+    "discount": ("discount",),
+    "loyaltyPointsUsed": ("loyalty_points_used",),
+    "loyaltyPointsEarned": ("loyalty_points_earned",),
+    "total": ("total",),
+    "paymentMethod": ("payment_method",),
+    "paymentStatus": ("payment_status",),
+    "orderStatus": ("order_status",),
+    "kitchenStatus": ("kitchen_status",),
+    "staffId": ("staff_id",),
+    "notes": ("notes",),
+    "createdAt": ("created_at",),
+    "updatedAt": ("updated_at",),
+    "completedAt": ("completed_at",)
+}
+
+def _iso(value) -> Optional[str]:
+    return value.isoformat() if value else None
+
+class OrderRow:
+    """Order GraphQL object over one orders row; the default resolver reads the camelCase attributes
+
+    Scalars are converted up front (plain slot reads are cheaper than properties when every field is
+    selected); items and the timestamps are converted on first access.
+    """
+
+    __slots__ = (
+        "id", "orderId", "customerId", "tableNumber", "subtotal", "tax", "serviceCharge", "discount",
+        "loyaltyPointsUsed", "loyaltyPointsEarned", "total", "paymentMethod", "paymentStatus", "orderStatus",
+        "kitchenStatus", "staffId", "notes", "_items_raw", "_items", "_created_at", "_updated_at",
+        "_completed_at"
+    )
+
+    def __init__(self, row: Dict[str, Any]):
+        get = row.get
+        self.id = str(get("id"))
+        self.orderId = get("order_id") or ""
+        self.customerId = get("customer_id")
+        self.tableNumber = get("table_number")
+        value = get("subtotal")
+        self.subtotal = float(value) if value else 0.0
+        value = get("tax")
+        self.tax = float(value) if value else 0.0
+        value = get("service_charge")
+        self.serviceCharge = float(value) if value else 0.0
+        value = get("discount")
+        self.discount = float(value) if value else 0.0
+        value = get("loyalty_points_used")
+        self.loyaltyPointsUsed = float(value) if value else 0.0
+        value = get("loyalty_points_earned")
+        self.loyaltyPointsEarned = float(value) if value else 0.0
+        value = get("total")
+        self.total = float(value) if value else 0.0
+        self.paymentMethod = get("payment_method") or "cash"
+        self.paymentStatus = get("payment_status") or "pending"
+        self.orderStatus = get("order_status") or "pending"
+        self.kitchenStatus = get("kitchen_status")
+        self.staffId = get("staff_id")
+        self.notes = get("notes")
+        self._items_raw = get("items")
+        self._items = None
+        self._created_at = get("created_at")
+        self._updated_at = get("updated_at")
+        self._completed_at = get("completed_at")
+
+    @property
+    def items(self) -> List[OrderItemRow]:
+        if self._items is None:
+            self._items = [OrderItemRow(item) for item in _decode_items(self._items_raw)]
+            self._items_raw = None
+        return self._items
+
+    @property
+    def createdAt(self) -> str:
+        return _iso(self._created_at) or ""
+
+    @property
+    def updatedAt(self) -> str:
+        return _iso(self._updated_at) or ""
+
+    @property
+    def completedAt(self) -> Optional[str]:
+        return _iso(self._completed_at)
+
+def order_rows(rows: List[Dict[str, Any]]) -> List[OrderRow]:
+    return [OrderRow(row) for row in rows]
@@ -0,0 +1,102 @@
+"""
+Keyset pagination and sargable date ranges for the order and cart listings
+Pages are ordered by (created_at DESC, id DESC); the opaque cursor encodes the last row's pair, so each page is an
+index range scan instead of an OFFSET. Date filters are half-open timestamp ranges on the bare column.
+The *Connection fields default to ORDER_PAGE_SIZE rows; the legacy list fields return every matching row unless
+the client passes `first`.
+"""
+import os
+import base64
+from datetime import datetime, date, timedelta
+from typing import Optional, Dict, Any, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ORDER_PAGE_SIZE = int(os.getenv("ORDER_PAGE_SIZE", 100))  # connection rows returned when `first` is omitted
+ORDER_PAGE_MAX = int(os.getenv("ORDER_PAGE_MAX", 500))  # largest `first` honoured
+
+KEYSET_ORDER = "ORDER BY created_at DESC, id DESC"
+
+def page_size(first: Optional[int], default: Optional[int] = ORDER_PAGE_SIZE) -> Optional[int]:
+    """Rows to fetch; `default` applies when `first` is omitted (None fetches every row)"""
+    if first is None:
+        return default
+    if first < 1:
+        raise Exception("first must be a positive number")
+    return min(first, ORDER_PAGE_MAX)
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeError):
+        raise Exception("Invalid cursor")
+
+def keyset_condition(after: Optional[str]) -> Tuple[str, list]:
+    """Rows strictly after the cursor in (created_at DESC, id DESC) order
+
+    Written as a range on created_at plus a tie-break so MySQL can use the (…, created_at) indexes;
+    the row-constructor form `(created_at, id) < (%s, %s)` is not optimised as a range.
+    """
+    if not after:
+        return "", []
+    created_at, row_id = decode_cursor(after)
+    return " AND created_at <= %s AND (created_at < %s OR id < %s)", [created_at, created_at, row_id]
+
+def _parse_date(value: str, name: str) -> date:
+    try:
+        return date.fromisoformat(value[:10])
+    except (TypeError, ValueError):
+        raise Exception(f"Invalid {name}: expected YYYY-MM-DD")
+
+def date_range(start_date: str, end_date: str) -> Tuple[datetime, datetime]:
+    """Inclusive calendar dates as a half-open [start 00:00, day after end 00:00) timestamp range"""
+    start = _parse_date(start_date, "startDate")
+    end = _parse_date(end_date, "endDate")
+    return datetime.combine(start, datetime.min.time()), datetime.combine(end + timedelta(days=1), datetime.min.time())
+
+# Columns every page needs whatever the selection (the cursor is built from them)
+KEYSET_COLUMNS = ("id", "created_at")
+
+async def fetch_page(cur, table: str, where: str, params: list, first: Optional[int], after: Optional[str],
+                     columns: str = "*", default_size: Optional[int] = ORDER_PAGE_SIZE) -> Dict[str, Any]:
+    """Fetch one keyset page; the `where` filters are reused for the lazy total count
+
+    A projected `columns` list must include KEYSET_COLUMNS. With `first` omitted and no default_size every
+    remaining row is returned.
+    """
+    limit = page_size(first, default_size)
+    keyset_sql, keyset_params = keyset_condition(after)
+    if limit is None:
+        await cur.execute(
+            f"SELECT {columns} FROM {table} WHERE {where}{keyset_sql} {KEYSET_ORDER}",
+            params + keyset_params
+        )
+    else:
+        await cur.execute(
+            f"SELECT {columns} FROM {table} WHERE {where}{keyset_sql} {KEYSET_ORDER} LIMIT %s",
+            params + keyset_params + [limit + 1]
+        )
+    rows = await cur.fetchall()
+    has_next = limit is not None and len(rows) > limit
+    rows = list(rows[:limit])
+    return {
+        "rows": rows,
+        "pageInfo": {
+            "hasNextPage": has_next,
+            "endCursor": encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if rows else None
+        },
+        # Only run by the totalCount resolver when a client selects it
+        "count": (f"SELECT COUNT(*) AS total FROM {table} WHERE {where}", params)
+    }
+
+def connection(page: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Connection object for a page whose rows were shaped into page["nodes"]"""
+    if page is None:
+        return {"nodes": [], "pageInfo": {"hasNextPage": False, "endCursor": None}, "_count": None}
+    return {"nodes": page["nodes"], "pageInfo": page["pageInfo"], "_count": page["count"]}
@@ -0,0 +1,52 @@
+"""
+Column projection from the GraphQL selection set
+Listing resolvers select only the columns behind the fields a client asked for (plus the ones they always
+need), so `{ orders { id orderId orderStatus } }` never reads or decodes the large JSON columns.
+"""
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+from graphql import FieldNode, FragmentSpreadNode, InlineFragmentNode
+
+def _collect(selection_set, fragments, names: Set[str], nested: Dict[str, list]):
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            names.add(selection.name.value)
+            if selection.selection_set is not None:
+                nested.setdefault(selection.name.value, []).append(selection.selection_set)
+        elif isinstance(selection, InlineFragmentNode):
+            _collect(selection.selection_set, fragments, names, nested)
+        elif isinstance(selection, FragmentSpreadNode):
+            fragment = fragments.get(selection.name.value)
+            if fragment is not None:
+                _collect(fragment.selection_set, fragments, names, nested)
+
+def selected_fields(info, path: Sequence[str] = ()) -> Set[str]:
+    """Names selected under the resolved field, or under `path` inside it (e.g. ("nodes",) for a connection)
+
+    Fragments are expanded; @skip/@include are ignored, so a conditional field counts as selected.
+    """
+    selection_sets = [node.selection_set for node in info.field_nodes if node.selection_set is not None]
+    for name in path:
+        nested: Dict[str, list] = {}
+        for selection_set in selection_sets:
+            _collect(selection_set, info.fragments, set(), nested)
+        selection_sets = nested.get(name, [])
+    names: Set[str] = set()
+    for selection_set in selection_sets:
+        _collect(selection_set, info.fragments, names, {})
+    return names
+
+def project(info, columns: Dict[str, Tuple[str, ...]], required: Iterable[str] = ("id",),
+            path: Sequence[str] = ()) -> Tuple[str, Set[str]]:
+    """SQL column list for the selection and the selected field names
+
+    `columns` maps GraphQL field names to the columns they are built from; fields without an entry
+    (__typename, resolver-computed fields) add nothing.
+    """
+    fields = selected_fields(info, path)
+    wanted: List[str] = list(required)
+    for field, field_columns in columns.items():
+        if field in fields:
+            for column in field_columns:
+                if column not in wanted:
+                    wanted.append(column)
+    return ", ".join(wanted), fields
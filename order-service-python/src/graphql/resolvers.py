@@ -1,53 +1,65 @@
 from typing import Optional, List, Dict, Any
-import httpx
-import os
-import json
+import asyncio
 from ariadne import QueryType, MutationType, ObjectType
 from src.database.connection import get_db
+from src.services.integrations import call_graphql_service, INVENTORY_SERVICE_URL
+from src.services.outbox import enqueue, outbox_dispatcher, get_aggregate_events
+from src.services.menu_cache import menu_cache, format_menu, MENU_COLUMNS
+from src import codec
+from src.codec import parse_json_field
+from src.services import cart_items
+from src.graphql.pagination import fetch_page, connection, date_range, KEYSET_COLUMNS, ORDER_PAGE_SIZE
+from src.graphql.order_rows import OrderRow, order_rows, ORDER_COLUMNS
+from src.graphql.projection import project
+from src.graphql.subscriptions import subscription, previous_status, publish_order_update
+from src.services.idempotency import idempotent_requests, claim, record_response
+from src.services.order_events import KITCHEN_CREATE_ORDER, KITCHEN_CANCEL_ORDER, INVENTORY_REDUCE_STOCK, LOYALTY_EARN_POINTS
 from src.auth import require_auth, require_role, require_min_role
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Service URLs
-KITCHEN_SERVICE_URL = os.getenv("KITCHEN_SERVICE_URL", "http://localhost:4001/graphql")
-INVENTORY_SERVICE_URL = os.getenv("INVENTORY_SERVICE_URL", "http://localhost:4002/graphql")
-USER_SERVICE_URL = os.getenv("USER_SERVICE_URL", "http://localhost:4003/graphql")
-
-async def call_graphql_service(url: str, query: str, variables: dict = None, token: str = None):
-    """Helper function to call GraphQL service"""
-    try:
-        headers = {"Content-Type": "application/json"}
-        if token:
-            headers["Authorization"] = token
-
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                url,
-                json={"query": query, "variables": variables or {}},
-                headers=headers
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            if "errors" in data:
-                raise Exception(data["errors"][0]["message"])
-            
-            return data.get("data", {})
-    except Exception as e:
-        print(f"Error calling service at {url}: {str(e)}")
-        raise
-
-def parse_json_field(field):
-    """Parse JSON field from database"""
-    if not field:
-        return None
-    if isinstance(field, str):
-        try:
-            return json.loads(field)
-        except:
-            return field
-    return field
+async def get_stock_deductions(cur, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Build the ingredient deductions for order items (one query for all menus)"""
+    menu_ids = list({order_item.get("menuId") for order_item in items})
+    deductions = []
+    if not menu_ids:
+        return deductions
+    placeholders = ", ".join(["%s"] * len(menu_ids))
+    await cur.execute(
+        f"SELECT menu_id, ingredients FROM menus WHERE menu_id IN ({placeholders})",
+        menu_ids
+    )
+    menu_ingredients = {
+        menu_row["menu_id"]: parse_json_field(menu_row.get("ingredients")) or []
+        for menu_row in await cur.fetchall()
+    }
+    for order_item in items:
+        for ingredient in menu_ingredients.get(order_item.get("menuId"), []):
+            deductions.append({
+                "ingredientId": ingredient.get("ingredientId"),
+                "quantity": float(ingredient.get("quantity", 0)) * int(order_item.get("quantity", 1))
+            })
+    return deductions
+
+async def enqueue_order_side_effects(cur, order_id: str, table_number, items: List[Dict[str, Any]], notes: Optional[str],
+                                     customer_id: Optional[str], loyalty_points: float):
+    """Queue kitchen, inventory and loyalty updates for an order in the caller's transaction"""
+    await enqueue(cur, KITCHEN_CREATE_ORDER, order_id, {
+        "orderId": order_id,
+        "tableNumber": table_number,
+        "items": items,
+        "notes": notes
+    })
+    deductions = await get_stock_deductions(cur, items)
+    if deductions:
+        await enqueue(cur, INVENTORY_REDUCE_STOCK, order_id, {"orderId": order_id, "deductions": deductions})
+    if customer_id and loyalty_points:
+        await enqueue(cur, LOYALTY_EARN_POINTS, order_id, {
+            "orderId": order_id,
+            "customerId": customer_id,
+            "points": float(loyalty_points)
+        })
 
 query = QueryType()
 mutation = MutationType()
@@ -57,122 +69,32 @@ cart = ObjectType("Cart")
 order_item = ObjectType("OrderItem")
 ingredient_info = ObjectType("IngredientInfo")
 stock_check_result = ObjectType("StockCheckResult")
+order_connection = ObjectType("OrderConnection")
+cart_connection = ObjectType("CartConnection")
+order_creation_result = ObjectType("OrderCreationResult")
 
 # Query resolvers
 @query.field("menus")
 async def resolve_menus(_, info, category: Optional[str] = None, available: Optional[bool] = None):
-    """Get all menus"""
-    pool = get_db()
-    if not pool:
+    """Get all menus (served from the menu cache)"""
+    if not get_db():
         return []
-    
-    query_sql = "SELECT * FROM menus WHERE 1=1"
-    params = []
-    
-    if category:
-        query_sql += " AND category = %s"
-        params.append(category)
-    if available is not None:
-        query_sql += " AND available = %s"
-        params.append(available)
-    
-    query_sql += " ORDER BY name ASC"
-    
-    async with pool.acquire() as conn:
-        async with conn.cursor() as cur:
-            await cur.execute(query_sql, params)
-            rows = await cur.fetchall()
-            
-            menus = []
-            for row in rows:
-                # With DictCursor, row is already a dictionary
-                menu_id = row.get("id")
-                if menu_id is None:
-                    continue
-                    
-                ingredients_data = parse_json_field(row.get("ingredients")) or []
-                tags_data = parse_json_field(row.get("tags")) or []
-                
-                menus.append({
-                    'id': str(menu_id),
-                    'menuId': row.get("menu_id", ""),
-                    'name': row.get("name", ""),
-                    'description': row.get("description"),
-                    'category': row.get("category", ""),
-                    'price': float(row.get("price", 0) or 0),
-                    'image': row.get("image"),
-                    'ingredients': [
-                        {
-                            'ingredientId': ing.get("ingredientId", ""),
-                            'ingredientName': ing.get("ingredientName", ""),
-                            'quantity': float(ing.get("quantity", 0)),
-                            'unit': ing.get("unit", "")
-                        }
-                        for ing in ingredients_data
-                    ],
-                    'available': bool(row.get("available", True)),
-                    'preparationTime': row.get("preparation_time", 15),
-                    'tags': tags_data,
-                    'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
-                    'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else ""
-                })
-    
-    return menus
+    columns, _ = project(info, MENU_COLUMNS)
+    return await menu_cache.list(category, available, columns)
 
 @query.field("menu")
 async def resolve_menu(_, info, id: str):
     """Get menu by ID"""
-    pool = get_db()
-    if not pool:
+    if not get_db():
         return None
-    
-    async with pool.acquire() as conn:
-        async with conn.cursor() as cur:
-            await cur.execute("SELECT * FROM menus WHERE id = %s", (id,))
-            row = await cur.fetchone()
-            
-            if not row:
-                return None
-            
-            ingredients_data = parse_json_field(row.get("ingredients")) or []
-            tags_data = parse_json_field(row.get("tags")) or []
-            
-            return {
-                'id': str(row.get("id")),
-                'menuId': row.get("menu_id", ""),
-                'name': row.get("name", ""),
-                'description': row.get("description"),
-                'category': row.get("category", ""),
-                'price': float(row.get("price", 0) or 0),
-                'image': row.get("image"),
-                'ingredients': [
-                    {
-                        'ingredientId': ing.get("ingredientId", ""),
-                        'ingredientName': ing.get("ingredientName", ""),
-                        'quantity': float(ing.get("quantity", 0)),
-                        'unit': ing.get("unit", "")
-                    }
-                    for ing in ingredients_data
-                ],
-                'available': bool(row.get("available", True)),
-                'preparationTime': row.get("preparation_time", 15),
-                'tags': tags_data,
-                'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
-                'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else ""
-            }
+    return await menu_cache.get(id)
 
 @query.field("menuCategories")
 async def resolve_menu_categories(_, info):
     """Get menu categories"""
-    pool = get_db()
-    if not pool:
+    if not get_db():
         return []
-    
-    async with pool.acquire() as conn:
-        async with conn.cursor() as cur:
-            await cur.execute("SELECT DISTINCT category FROM menus WHERE category IS NOT NULL ORDER BY category")
-            rows = await cur.fetchall()
-            return [row[0] for row in rows]
+    return await menu_cache.categories()
 
 @query.field("cart")
 async def resolve_cart(_, info, cartId: str):
@@ -183,202 +105,86 @@ async def resolve_cart(_, info, cartId: str):
     
     async with pool.acquire() as conn:
         async with conn.cursor() as cur:
-            await cur.execute("SELECT * FROM carts WHERE cart_id = %s", (cartId,))
-            row = await cur.fetchone()
-            
-            if not row:
-                return None
-            
-            items_data = parse_json_field(row.get("items")) or []
-            subtotal = sum(float(i.get("price", 0)) * int(i.get("quantity", 0)) for i in items_data)
-            tax = subtotal * 0.1
-            service_charge = subtotal * 0.05
-            discount = float(row.get("discount", 0) or 0)
-            total = subtotal + tax + service_charge - discount
-            
-            return {
-                'id': str(row.get("id")),
-                'cartId': row.get("cart_id", ""),
-                'customerId': row.get("customer_id"),
-                'tableNumber': row.get("table_number"),
-                'items': [
-                    {
-                        'menuId': i.get("menuId", ""),
-                        'name': i.get("name", ""),
-                        'quantity': i.get("quantity", 0),
-                        'price': float(i.get("price", 0)),
-                        'specialInstructions': i.get("specialInstructions")
-                    }
-                    for i in items_data
-                ],
-                'subtotal': subtotal,
-                'tax': tax,
-                'serviceCharge': service_charge,
-                'discount': discount,
-                'total': total,
-                'status': row.get("status", "active"),
-                'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
-                'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else ""
-            }
+            return await cart_items.load_cart(cur, cartId)
 
-@query.field("cartsByCustomer")
-async def resolve_carts_by_customer(_, info, customerId: str):
-    """Get carts by customer ID"""
+async def _list_page(table: str, where: str, params: list, first: Optional[int], after: Optional[str], shape,
+                     columns: str = "*", default_size: Optional[int] = ORDER_PAGE_SIZE):
+    """One keyset page of a listing shaped into GraphQL nodes, None when the database is unavailable"""
     pool = get_db()
     if not pool:
-        return []
-    
+        return None
     async with pool.acquire() as conn:
         async with conn.cursor() as cur:
-            await cur.execute("SELECT * FROM carts WHERE customer_id = %s ORDER BY created_at DESC", (customerId,))
-            rows = await cur.fetchall()
-            
-            carts = []
-            for row in rows:
-                items_data = parse_json_field(row.get("items")) or []
-                subtotal = sum(float(i.get("price", 0)) * int(i.get("quantity", 0)) for i in items_data)
-                tax = subtotal * 0.1
-                service_charge = subtotal * 0.05
-                discount = float(row.get("discount", 0) or 0)
-                total = subtotal + tax + service_charge - discount
-                
-                carts.append({
-                    'id': str(row.get("id")),
-                    'cartId': row.get("cart_id", ""),
-                    'customerId': row.get("customer_id"),
-                    'tableNumber': row.get("table_number"),
-                    'items': [
-                        {
-                            'menuId': i.get("menuId", ""),
-                            'name': i.get("name", ""),
-                            'quantity': i.get("quantity", 0),
-                            'price': float(i.get("price", 0)),
-                            'specialInstructions': i.get("specialInstructions")
-                        }
-                        for i in items_data
-                    ],
-                    'subtotal': subtotal,
-                    'tax': tax,
-                    'serviceCharge': service_charge,
-                    'discount': discount,
-                    'total': total,
-                    'status': row.get("status", "active"),
-                    'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
-                    'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else ""
-                })
-            
-            return carts
+            page = await fetch_page(cur, table, where, params, first, after, columns, default_size)
+            page["nodes"] = await shape(cur, page["rows"])
+            return page
 
-@query.field("activeCarts")
-async def resolve_active_carts(_, info):
-    """Get all active carts"""
-    pool = get_db()
-    if not pool:
-        return []
-    
-    async with pool.acquire() as conn:
-        async with conn.cursor() as cur:
-            await cur.execute("SELECT * FROM carts WHERE status = 'active' ORDER BY created_at DESC")
-            rows = await cur.fetchall()
-            
-            carts = []
-            for row in rows:
-                items_data = parse_json_field(row.get("items")) or []
-                subtotal = sum(float(i.get("price", 0)) * int(i.get("quantity", 0)) for i in items_data)
-                tax = subtotal * 0.1
-                service_charge = subtotal * 0.05
-                discount = float(row.get("discount", 0) or 0)
-                total = subtotal + tax + service_charge - discount
-                
-                carts.append({
-                    'id': str(row.get("id")),
-                    'cartId': row.get("cart_id", ""),
-                    'customerId': row.get("customer_id"),
-                    'tableNumber': row.get("table_number"),
-                    'items': [
-                        {
-                            'menuId': i.get("menuId", ""),
-                            'name': i.get("name", ""),
-                            'quantity': i.get("quantity", 0),
-                            'price': float(i.get("price", 0)),
-                            'specialInstructions': i.get("specialInstructions")
-                        }
-                        for i in items_data
-                    ],
-                    'subtotal': subtotal,
-                    'tax': tax,
-                    'serviceCharge': service_charge,
-                    'discount': discount,
-                    'total': total,
-                    'status': row.get("status", "active"),
-                    'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
-                    'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else ""
-                })
-            
-            return carts
+async def _order_nodes(cur, rows: List[Dict[str, Any]]) -> List[OrderRow]:
+    return order_rows(rows)
 
-@query.field("orders")
-async def resolve_orders(_, info, customerId: Optional[str] = None, status: Optional[str] = None):
-    """Get all orders"""
-    pool = get_db()
-    if not pool:
-        return []
-    
-    query_sql = "SELECT * FROM orders WHERE 1=1"
+def _order_columns(info, path=()) -> str:
+    """orders columns for the selected Order fields (id and created_at are always read for the cursor)"""
+    columns, _ = project(info, ORDER_COLUMNS, KEYSET_COLUMNS, path)
+    return columns
+
+def _orders_filter(customerId: Optional[str] = None, status: Optional[str] = None,
+                   paymentStatus: Optional[str] = None, tableNumber: Optional[str] = None):
+    where = "1=1"
     params = []
-    
     if customerId:
-        query_sql += " AND customer_id = %s"
+        where += " AND customer_id = %s"
         params.append(customerId)
     if status:
-        query_sql += " AND order_status = %s"
+        where += " AND order_status = %s"
         params.append(status)
-    
-    query_sql += " ORDER BY created_at DESC"
-    
-    async with pool.acquire() as conn:
-        async with conn.cursor() as cur:
-            await cur.execute(query_sql, params)
-            rows = await cur.fetchall()
-            
-            orders = []
-            for row in rows:
-                # With DictCursor, row is already a dictionary
-                items_data = parse_json_field(row.get("items")) or []
-                
-                orders.append({
-                    'id': str(row.get("id")),
-                    'orderId': row.get("order_id", ""),
-                    'customerId': row.get("customer_id"),
-                    'tableNumber': row.get("table_number"),
-                    'items': [
-                        {
-                            'menuId': item.get("menuId", "") if isinstance(item, dict) else "",
-                            'name': item.get("name", "") if isinstance(item, dict) else "",
-                            'quantity': item.get("quantity", 0) if isinstance(item, dict) else 0,
-                            'price': float(item.get("price", 0) if isinstance(item, dict) else 0),
-                            'specialInstructions': item.get("specialInstructions") if isinstance(item, dict) else None
-                        }
-                        for item in items_data
-                    ],
-                    'subtotal': float(row.get("subtotal", 0) or 0),
-                    'tax': float(row.get("tax", 0) or 0),
-                    'serviceCharge': float(row.get("service_charge", 0) or 0),
-                    'discount': float(row.get("discount", 0) or 0),
-                    'loyaltyPointsUsed': float(row.get("loyalty_points_used", 0) or 0),
-                    'loyaltyPointsEarned': float(row.get("loyalty_points_earned", 0) or 0),
-                    'total': float(row.get("total", 0) or 0),
-                    'paymentMethod': row.get("payment_method", "cash"),
-                    'paymentStatus': row.get("payment_status", "pending"),
-                    'orderStatus': row.get("order_status", "pending"),
-                    'kitchenStatus': row.get("kitchen_status"),
-                    'staffId': row.get("staff_id"),
-                    'notes': row.get("notes"),
-                    'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
-                    'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else ""
-                })
-    
-    return orders
+    if paymentStatus:
+        where += " AND payment_status = %s"
+        params.append(paymentStatus)
+    if tableNumber:
+        where += " AND table_number = %s"
+        params.append(tableNumber)
+    return where, params
+
+def _orders_by_date_filter(startDate: str, endDate: str):
+    # Half-open range on the bare column keeps idx_created_at usable (DATE(created_at) forced a full scan)
+    start, end = date_range(startDate, endDate)
+    return "created_at >= %s AND created_at < %s", [start, end]
+
+@query.field("cartsByCustomer")
+async def resolve_carts_by_customer(_, info, customerId: str, first: Optional[int] = None, after: Optional[str] = None):
+    """Get carts by customer ID, newest first (all of them unless `first` is given)"""
+    page = await _list_page("carts", "customer_id = %s", [customerId], first, after, cart_items.format_carts, default_size=None)
+    return page["nodes"] if page else []
+
+@query.field("cartsByCustomerConnection")
+async def resolve_carts_by_customer_connection(_, info, customerId: str, first: Optional[int] = None, after: Optional[str] = None):
+    """Keyset-paginated carts by customer ID"""
+    page = await _list_page("carts", "customer_id = %s", [customerId], first, after, cart_items.format_carts)
+    return connection(page)
+
+@query.field("activeCarts")
+async def resolve_active_carts(_, info, first: Optional[int] = None, after: Optional[str] = None):
+    """Get active carts, newest first (all of them unless `first` is given)"""
+    page = await _list_page("carts", "status = 'active'", [], first, after, cart_items.format_carts, default_size=None)
+    return page["nodes"] if page else []
+
+@query.field("activeCartsConnection")
+async def resolve_active_carts_connection(_, info, first: Optional[int] = None, after: Optional[str] = None):
+    """Keyset-paginated active carts"""
+    page = await _list_page("carts", "status = 'active'", [], first, after, cart_items.format_carts)
+    return connection(page)
+
+@query.field("orders")
+async def resolve_orders(_, info, first: Optional[int] = None, after: Optional[str] = None, **filters):
+    """Get orders, newest first (all of them unless `first` is given)"""
+    page = await _list_page("orders", *_orders_filter(**filters), first, after, _order_nodes, _order_columns(info), default_size=None)
+    return page["nodes"] if page else []
+
+@query.field("ordersConnection")
+async def resolve_orders_connection(_, info, first: Optional[int] = None, after: Optional[str] = None, **filters):
+    """Keyset-paginated orders"""
+    page = await _list_page("orders", *_orders_filter(**filters), first, after, _order_nodes, _order_columns(info, ("nodes",)))
+    return connection(page)
 
 @query.field("order")
 async def resolve_order(_, info, id: str):
@@ -389,46 +195,13 @@ async def resolve_order(_, info, id: str):
     
     async with pool.acquire() as conn:
         async with conn.cursor() as cur:
-            await cur.execute("SELECT * FROM orders WHERE id = %s", (id,))
+            await cur.execute(f"SELECT {_order_columns(info)} FROM orders WHERE id = %s", (id,))
             row = await cur.fetchone()
             
             if not row:
                 return None
             
-            # With DictCursor, row is already a dictionary
-            items_data = parse_json_field(row.get("items")) or []
-            
-            return {
-                'id': str(row.get("id")),
-                'orderId': row.get("order_id", ""),
-                'customerId': row.get("customer_id"),
-                'tableNumber': row.get("table_number"),
-                'items': [
-                    {
-                        'menuId': item.get("menuId", "") if isinstance(item, dict) else "",
-                        'name': item.get("name", "") if isinstance(item, dict) else "",
-                        'quantity': item.get("quantity", 0) if isinstance(item, dict) else 0,
-                        'price': float(item.get("price", 0) if isinstance(item, dict) else 0),
-                        'specialInstructions': item.get("specialInstructions") if isinstance(item, dict) else None
-                    }
-                    for item in items_data
-                ],
-                'subtotal': float(row.get("subtotal", 0) or 0),
-                'tax': float(row.get("tax", 0) or 0),
-                'serviceCharge': float(row.get("service_charge", 0) or 0),
-                'discount': float(row.get("discount", 0) or 0),
-                'loyaltyPointsUsed': float(row.get("loyalty_points_used", 0) or 0),
-                'loyaltyPointsEarned': float(row.get("loyalty_points_earned", 0) or 0),
-                'total': float(row.get("total", 0) or 0),
-                'paymentMethod': row.get("payment_method", "cash"),
-                'paymentStatus': row.get("payment_status", "pending"),
-                'orderStatus': row.get("order_status", "pending"),
-                'kitchenStatus': row.get("kitchen_status"),
-                'staffId': row.get("staff_id"),
-                'notes': row.get("notes"),
-                'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
-                'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else ""
-            }
+            return OrderRow(row)
 
 @query.field("orderByOrderId")
 async def resolve_order_by_order_id(_, info, orderId: str):
@@ -439,206 +212,87 @@ async def resolve_order_by_order_id(_, info, orderId: str):
     
     async with pool.acquire() as conn:
         async with conn.cursor() as cur:
-            await cur.execute("SELECT * FROM orders WHERE order_id = %s", (orderId,))
+            await cur.execute(f"SELECT {_order_columns(info)} FROM orders WHERE order_id = %s", (orderId,))
             row = await cur.fetchone()
             
             if not row:
                 return None
             
-            items_data = parse_json_field(row.get("items")) or []
-            
-            return {
-                'id': str(row.get("id")),
-                'orderId': row.get("order_id", ""),
-                'customerId': row.get("customer_id"),
-                'tableNumber': row.get("table_number"),
-                'items': [
-                    {
-                        'menuId': item.get("menuId", "") if isinstance(item, dict) else "",
-                        'name': item.get("name", "") if isinstance(item, dict) else "",
-                        'quantity': item.get("quantity", 0) if isinstance(item, dict) else 0,
-                        'price': float(item.get("price", 0) if isinstance(item, dict) else 0),
-                        'specialInstructions': item.get("specialInstructions") if isinstance(item, dict) else None
-                    }
-                    for item in items_data
-                ],
-                'subtotal': float(row.get("subtotal", 0) or 0),
-                'tax': float(row.get("tax", 0) or 0),
-                'serviceCharge': float(row.get("service_charge", 0) or 0),
-                'discount': float(row.get("discount", 0) or 0),
-                'loyaltyPointsUsed': float(row.get("loyalty_points_used", 0) or 0),
-                'loyaltyPointsEarned': float(row.get("loyalty_points_earned", 0) or 0),
-                'total': float(row.get("total", 0) or 0),
-                'paymentMethod': row.get("payment_method", "cash"),
-                'paymentStatus': row.get("payment_status", "pending"),
-                'orderStatus': row.get("order_status", "pending"),
-                'kitchenStatus': row.get("kitchen_status"),
-                'staffId': row.get("staff_id"),
-                'notes': row.get("notes"),
-                'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
-                'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else "",
-                'completedAt': row.get("completed_at").isoformat() if row.get("completed_at") else None
-            }
+            return OrderRow(row)
 
 @query.field("ordersByDate")
-async def resolve_orders_by_date(_, info, startDate: str, endDate: str):
-    """Get orders by date range"""
-    pool = get_db()
-    if not pool:
-        return []
-    
-    async with pool.acquire() as conn:
-        async with conn.cursor() as cur:
-            await cur.execute("""
-                SELECT * FROM orders 
-                WHERE DATE(created_at) >= %s AND DATE(created_at) <= %s 
-                ORDER BY created_at DESC
-            """, (startDate, endDate))
-            rows = await cur.fetchall()
-            
-            orders = []
-            for row in rows:
-                items_data = parse_json_field(row.get("items")) or []
-                
-                orders.append({
-                    'id': str(row.get("id")),
-                    'orderId': row.get("order_id", ""),
-                    'customerId': row.get("customer_id"),
-                    'tableNumber': row.get("table_number"),
-                    'items': [
-                        {
-                            'menuId': item.get("menuId", "") if isinstance(item, dict) else "",
-                            'name': item.get("name", "") if isinstance(item, dict) else "",
-                            'quantity': item.get("quantity", 0) if isinstance(item, dict) else 0,
-                            'price': float(item.get("price", 0) if isinstance(item, dict) else 0),
-                            'specialInstructions': item.get("specialInstructions") if isinstance(item, dict) else None
-                        }
-                        for item in items_data
-                    ],
-                    'subtotal': float(row.get("subtotal", 0) or 0),
-                    'tax': float(row.get("tax", 0) or 0),
-                    'serviceCharge': float(row.get("service_charge", 0) or 0),
-                    'discount': float(row.get("discount", 0) or 0),
-                    'loyaltyPointsUsed': float(row.get("loyalty_points_used", 0) or 0),
-                    'loyaltyPointsEarned': float(row.get("loyalty_points_earned", 0) or 0),
-                    'total': float(row.get("total", 0) or 0),
-                    'paymentMethod': row.get("payment_method", "cash"),
-                    'paymentStatus': row.get("payment_status", "pending"),
-                    'orderStatus': row.get("order_status", "pending"),
-                    'kitchenStatus': row.get("kitchen_status"),
-                    'staffId': row.get("staff_id"),
-                    'notes': row.get("notes"),
-                    'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
-                    'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else "",
-                    'completedAt': row.get("completed_at").isoformat() if row.get("completed_at") else None
-                })
-            
-            return orders
+async def resolve_orders_by_date(_, info, startDate: str, endDate: str, first: Optional[int] = None, after: Optional[str] = None):
+    """Get orders created between two dates (inclusive), newest first (all of them unless `first` is given)"""
+    page = await _list_page("orders", *_orders_by_date_filter(startDate, endDate), first, after, _order_nodes, _order_columns(info), default_size=None)
+    return page["nodes"] if page else []
+
+@query.field("ordersByDateConnection")
+async def resolve_orders_by_date_connection(_, info, startDate: str, endDate: str, first: Optional[int] = None, after: Optional[str] = None):
+    """Keyset-paginated orders created between two dates (inclusive)"""
+    page = await _list_page("orders", *_orders_by_date_filter(startDate, endDate), first, after, _order_nodes, _order_columns(info, ("nodes",)))
+    return connection(page)
 
 @query.field("menuByMenuId")
 async def resolve_menu_by_menu_id(_, info, menuId: str):
     """Get menu by menu ID"""
-    pool = get_db()
-    if not pool:
+    if not get_db():
         return None
-    
-    async with pool.acquire() as conn:
-        async with conn.cursor() as cur:
-            await cur.execute("SELECT * FROM menus WHERE menu_id = %s", (menuId,))
-            row = await cur.fetchone()
-            
-            if not row:
-                return None
-            
-            ingredients_data = parse_json_field(row.get("ingredients")) or []
-            tags_data = parse_json_field(row.get("tags")) or []
-            
-            return {
-                'id': str(row.get("id")),
-                'menuId': row.get("menu_id", ""),
-                'name': row.get("name", ""),
-                'description': row.get("description"),
-                'category': row.get("category", ""),
-                'price': float(row.get("price", 0) or 0),
-                'image': row.get("image"),
-                'ingredients': [
-                    {
-                        'ingredientId': ing.get("ingredientId", ""),
-                        'ingredientName': ing.get("ingredientName", ""),
-                        'quantity': float(ing.get("quantity", 0)),
-                        'unit': ing.get("unit", "")
-                    }
-                    for ing in ingredients_data
-                ],
-                'available': bool(row.get("available", True)),
-                'preparationTime': row.get("preparation_time", 15),
-                'tags': tags_data,
-                'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
-                'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else ""
-            }
+    return await menu_cache.get_by_menu_id(menuId)
 
 @query.field("checkMenuStock")
 async def resolve_check_menu_stock(_, info, menuId: str, quantity: int):
     """Check menu stock"""
-    pool = get_db()
-    if not pool:
+    if not get_db():
         return []
     
-    async with pool.acquire() as conn:
-        async with conn.cursor() as cur:
-            await cur.execute("SELECT * FROM menus WHERE menu_id = %s", (menuId,))
-            row = await cur.fetchone()
-            
-            if not row:
-                return []
-            
-            # With DictCursor, row is already a dictionary
-            ingredients_data = parse_json_field(row.get("ingredients")) or []
-            
-            results = []
-            for ing in ingredients_data:
-                required = float(ing.get("quantity", 0)) * quantity
-                ingredient_id = ing.get("ingredientId", "")
-                
-                # Check stock from inventory service
-                try:
-                    check_query = """
-                        query CheckStock($ingredientId: String!, $quantity: Float!) {
-                            checkStock(ingredientId: $ingredientId, quantity: $quantity) {
-                                available
-                                currentStock
-                                message
-                            }
-                        }
-                    """
-                token = info.context.get('token')
-                stock_data = await call_graphql_service(
-                    INVENTORY_SERVICE_URL,
-                    check_query,
-                    {"ingredientId": ingredient_id, "quantity": required},
-                    token
-                )
-                    
-                    stock_check = stock_data.get("checkStock", {})
-                    results.append({
-                        'available': stock_check.get("available", False),
-                        'message': stock_check.get("message", ""),
-                        'ingredientId': ingredient_id,
-                        'ingredientName': ing.get("ingredientName", ""),
-                        'required': required,
-                        'availableQuantity': float(stock_check.get("currentStock", 0))
-                    })
-                except Exception as e:
-                    results.append({
-                        'available': False,
-                        'message': f"Error checking stock: {str(e)}",
-                        'ingredientId': ingredient_id,
-                        'ingredientName': ing.get("ingredientName", ""),
-                        'required': required,
-                        'availableQuantity': 0.0
-                    })
+    menu_data = await menu_cache.get_by_menu_id(menuId)
+    if not menu_data:
+        return []
+    
+    results = []
+    for ing in menu_data['ingredients']:
+        required = float(ing.get("quantity", 0)) * quantity
+        ingredient_id = ing.get("ingredientId", "")
+        
+        # Check stock from inventory service
+        try:
+            check_query = """
+                query CheckStock($ingredientId: String!, $quantity: Float!) {
+                    checkStock(ingredientId: $ingredientId, quantity: $quantity) {
+                        available
+                        currentStock
+                        message
+                    }
+                }
+            """
+            token = info.context.get('token')
+            stock_data = await call_graphql_service(
+                INVENTORY_SERVICE_URL,
+                check_query,
+                {"ingredientId": ingredient_id, "quantity": required},
+                token
+            )
             
-            return results
+            stock_check = stock_data.get("checkStock", {})
+            results.append({
+                'available': stock_check.get("available", False),
+                'message': stock_check.get("message", ""),
+                'ingredientId': ingredient_id,
+                'ingredientName': ing.get("ingredientName", ""),
+                'required': required,
+                'availableQuantity': float(stock_check.get("currentStock", 0))
+            })
+        except Exception as e:
+            results.append({
+                'available': False,
+                'message': f"Error checking stock: {str(e)}",
+                'ingredientId': ingredient_id,
+                'ingredientName': ing.get("ingredientName", ""),
+                'required': required,
+                'availableQuantity': 0.0
+            })
+    
+    return results
 
 # Mutation resolvers
 @mutation.field("createMenu")
@@ -651,8 +305,8 @@ async def resolve_create_menu(_, info, input: Dict[str, Any]):
     
     async with pool.acquire() as conn:
         async with conn.cursor() as cur:
-            ingredients_json = json.dumps(input.get("ingredients", []))
-            tags_json = json.dumps(input.get("tags", []))
+            ingredients_json = codec.dumps(input.get("ingredients", []))
+            tags_json = codec.dumps(input.get("tags", []))
             
             await cur.execute("""
                 INSERT INTO menus (menu_id, name, description, category, price, image, ingredients, available, preparation_time, tags)
@@ -665,6 +319,7 @@ async def resolve_create_menu(_, info, input: Dict[str, Any]):
             ))
             
             await conn.commit()
+            menu_cache.invalidate()
             
             # Fetch by menu_id instead of lastrowid for reliability
             await cur.execute("SELECT * FROM menus WHERE menu_id = %s", (input['menuId'],))
@@ -673,36 +328,10 @@ async def resolve_create_menu(_, info, input: Dict[str, Any]):
             if not row:
                 raise Exception("Failed to create menu")
             
-            ingredients_data = parse_json_field(row.get("ingredients")) or []
-            tags_data = parse_json_field(row.get("tags")) or []
-            
-            menu_id = row.get("id")
-            if menu_id is None:
+            if row.get("id") is None:
                 raise Exception("Menu created but ID not found")
             
-            return {
-                'id': str(menu_id),
-                'menuId': row.get("menu_id", ""),
-                'name': row.get("name", ""),
-                'description': row.get("description"),
-                'category': row.get("category", ""),
-                'price': float(row.get("price", 0) or 0),
-                'image': row.get("image"),
-                'ingredients': [
-                    {
-                        'ingredientId': ing.get("ingredientId", ""),
-                        'ingredientName': ing.get("ingredientName", ""),
-                        'quantity': float(ing.get("quantity", 0)),
-                        'unit': ing.get("unit", "")
-                    }
-                    for ing in ingredients_data
-                ],
-                'available': bool(row.get("available", True)),
-                'preparationTime': row.get("preparation_time", 15),
-                'tags': tags_data,
-                'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
-                'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else ""
-            }
+            return format_menu(row)
 
 @mutation.field("updateMenu")
 @require_min_role("manager")
@@ -734,7 +363,7 @@ async def resolve_update_menu(_, info, id: str, input: Dict[str, Any]):
                 params.append(input.get('image'))
             if 'ingredients' in input:
                 updates.append("ingredients = %s")
-                params.append(json.dumps(input['ingredients']))
+                params.append(codec.dumps(input['ingredients']))
             if 'available' in input:
                 updates.append("available = %s")
                 params.append(input['available'])
@@ -743,7 +372,7 @@ async def resolve_update_menu(_, info, id: str, input: Dict[str, Any]):
                 params.append(input['preparationTime'])
             if 'tags' in input:
                 updates.append("tags = %s")
-                params.append(json.dumps(input['tags']))
+                params.append(codec.dumps(input['tags']))
             
             if not updates:
                 raise Exception("No fields to update")
@@ -754,6 +383,7 @@ async def resolve_update_menu(_, info, id: str, input: Dict[str, Any]):
                 params
             )
             await conn.commit()
+            menu_cache.invalidate()
             
             await cur.execute("SELECT * FROM menus WHERE id = %s", (id,))
             row = await cur.fetchone()
@@ -761,33 +391,7 @@ async def resolve_update_menu(_, info, id: str, input: Dict[str, Any]):
             if not row:
                 raise Exception("Menu not found")
             
-            # With DictCursor, row is already a dictionary
-            ingredients_data = parse_json_field(row.get("ingredients")) or []
-            tags_data = parse_json_field(row.get("tags")) or []
-            
-            return {
-                'id': str(row.get("id")),
-                'menuId': row.get("menu_id", ""),
-                'name': row.get("name", ""),
-                'description': row.get("description"),
-                'category': row.get("category", ""),
-                'price': float(row.get("price", 0) or 0),
-                'image': row.get("image"),
-                'ingredients': [
-                    {
-                        'ingredientId': ing.get("ingredientId", ""),
-                        'ingredientName': ing.get("ingredientName", ""),
-                        'quantity': float(ing.get("quantity", 0)),
-                        'unit': ing.get("unit", "")
-                    }
-                    for ing in ingredients_data
-                ],
-                'available': bool(row.get("available", True)),
-                'preparationTime': row.get("preparation_time", 15),
-                'tags': tags_data,
-                'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
-                'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else ""
-            }
+            return format_menu(row)
 
 @mutation.field("deleteMenu")
 @require_min_role("admin")
@@ -801,6 +405,7 @@ async def resolve_delete_menu(_, info, id: str):
         async with conn.cursor() as cur:
             await cur.execute("DELETE FROM menus WHERE id = %s", (id,))
             await conn.commit()
+            menu_cache.invalidate()
             return cur.rowcount > 0
 
 @mutation.field("toggleMenuAvailability")
@@ -815,6 +420,7 @@ async def resolve_toggle_menu_availability(_, info, id: str):
         async with conn.cursor() as cur:
             await cur.execute("UPDATE menus SET available = NOT available WHERE id = %s", (id,))
             await conn.commit()
+            menu_cache.invalidate()
             
             await cur.execute("SELECT * FROM menus WHERE id = %s", (id,))
             row = await cur.fetchone()
@@ -822,32 +428,7 @@ async def resolve_toggle_menu_availability(_, info, id: str):
             if not row:
                 raise Exception("Menu not found")
             
-            ingredients_data = parse_json_field(row.get("ingredients")) or []
-            tags_data = parse_json_field(row.get("tags")) or []
-            
-            return {
-                'id': str(row.get("id")),
-                'menuId': row.get("menu_id", ""),
-                'name': row.get("name", ""),
-                'description': row.get("description"),
-                'category': row.get("category", ""),
-                'price': float(row.get("price", 0) or 0),
-                'image': row.get("image"),
-                'ingredients': [
-                    {
-                        'ingredientId': ing.get("ingredientId", ""),
-                        'ingredientName': ing.get("ingredientName", ""),
-                        'quantity': float(ing.get("quantity", 0)),
-                        'unit': ing.get("unit", "")
-                    }
-                    for ing in ingredients_data
-                ],
-                'available': bool(row.get("available", True)),
-                'preparationTime': row.get("preparation_time", 15),
-                'tags': tags_data,
-                'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
-                'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else ""
-            }
+            return format_menu(row)
 
 @mutation.field("createCart")
 @require_auth
@@ -876,21 +457,7 @@ async def resolve_create_cart(_, info, input: Dict[str, Any]):
             if not row:
                 raise Exception("Cart not created")
             
-            return {
-                'id': str(row.get("id")),
-                'cartId': row.get("cart_id", ""),
-                'customerId': row.get("customer_id"),
-                'tableNumber': row.get("table_number"),
-                'items': [],
-                'subtotal': 0.0,
-                'tax': 0.0,
-                'serviceCharge': 0.0,
-                'discount': 0.0,
-                'total': 0.0,
-                'status': row.get("status", "active"),
-                'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
-                'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else ""
-            }
+            return cart_items.format_cart(row, [])
 
 @mutation.field("applyDiscount")
 @require_min_role("manager")
@@ -902,66 +469,45 @@ async def resolve_apply_discount(_, info, cartId: str, discount: float):
     
     async with pool.acquire() as conn:
         async with conn.cursor() as cur:
-            await cur.execute("UPDATE carts SET discount = %s WHERE cart_id = %s", (discount, cartId))
+            await cart_items.apply_discount(cur, cartId, discount)
             await conn.commit()
             
-            await cur.execute("SELECT * FROM carts WHERE cart_id = %s", (cartId,))
-            row = await cur.fetchone()
-            
-            if not row:
+            cart_data = await cart_items.load_cart(cur, cartId)
+            if not cart_data:
                 raise Exception("Cart not found")
-            
-            items_data = parse_json_field(row.get("items")) or []
-            subtotal = sum(float(i.get("price", 0)) * int(i.get("quantity", 0)) for i in items_data)
-            tax = subtotal * 0.1
-            service_charge = subtotal * 0.05
-            total = subtotal + tax + service_charge - discount
-            
-            return {
-                'id': str(row.get("id")),
-                'cartId': row.get("cart_id", ""),
-                'customerId': row.get("customer_id"),
-                'tableNumber': row.get("table_number"),
-                'items': [
-                    {
-                        'menuId': i.get("menuId", ""),
-                        'name': i.get("name", ""),
-                        'quantity': i.get("quantity", 0),
-                        'price': float(i.get("price", 0)),
-                        'specialInstructions': i.get("specialInstructions")
-                    }
-                    for i in items_data
-                ],
-                'subtotal': subtotal,
-                'tax': tax,
-                'serviceCharge': service_charge,
-                'discount': discount,
-                'total': total,
-                'status': row.get("status", "active"),
-                'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
-                'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else ""
-            }
+            return cart_data
 
 @mutation.field("createOrderFromCart")
 @require_auth
-async def resolve_create_order_from_cart(_, info, cartId: str, input: Dict[str, Any]):
-    """Create order from cart - requires authentication"""
+async def resolve_create_order_from_cart(_, info, cartId: str, input: Dict[str, Any],
+                                         idempotencyKey: Optional[str] = None):
+    """Create order from cart - requires authentication; retries with the same idempotencyKey get the first order"""
     pool = get_db()
     if not pool:
         raise Exception("Database connection not available")
     
+    return await idempotent_requests.run(
+        idempotencyKey, "createOrderFromCart", {"cartId": cartId, "input": input},
+        lambda fingerprint: create_order_from_cart(pool, cartId, input, idempotencyKey, fingerprint)
+    )
+
+async def create_order_from_cart(pool, cartId: str, input: Dict[str, Any],
+                                 idempotency_key: Optional[str], fingerprint: Optional[str]):
     import uuid
     
+    order_id = input.get("orderId", f"ORD-{uuid.uuid4().hex[:8].upper()}")
+    
     async with pool.acquire() as conn:
         async with conn.cursor() as cur:
-            # Get cart
-            await cur.execute("SELECT * FROM carts WHERE cart_id = %s", (cartId,))
-            cart_row = await cur.fetchone()
-            
-            if not cart_row:
-                raise Exception("Cart not found")
+            # Claim the key before locking the cart; a replayed request stops here
+            if idempotency_key:
+                stored = await claim(cur, idempotency_key, "createOrderFromCart", fingerprint, order_id)
+                if stored is not None:
+                    await conn.rollback()
+                    return stored
             
-            items = parse_json_field(cart_row.get("items")) or []
+            # Lock the cart and read its lines
+            cart_row, items = await cart_items.checkout(cur, cartId)
             
             # Calculate totals
             subtotal = sum(float(item.get("price", 0)) * int(item.get("quantity", 0)) for item in items)
@@ -972,26 +518,37 @@ async def resolve_create_order_from_cart(_, info, cartId: str, input: Dict[str,
             loyalty_points_earned = subtotal * 0.01
             total = subtotal + tax + service_charge - discount - (loyalty_points_used * 0.01)
             
-            order_id = input.get("orderId", f"ORD-{uuid.uuid4().hex[:8].upper()}")
+            customer_id = input.get("customerId") or cart_row.get("customer_id")
+            table_number = input.get("tableNumber") or cart_row.get("table_number")
             
-            items_json = json.dumps(items)
+            items_json = codec.dumps(items)
             await cur.execute("""
                 INSERT INTO orders (order_id, customer_id, table_number, items, subtotal, tax, service_charge, discount, 
                                   loyalty_points_used, loyalty_points_earned, total, payment_method, payment_status, 
                                   order_status, notes)
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             """, (
-                order_id, input.get("customerId") or cart_row.get("customer_id"), 
-                input.get("tableNumber") or cart_row.get("table_number"), items_json,
+                order_id, customer_id, table_number, items_json,
                 subtotal, tax, service_charge, discount, loyalty_points_used, loyalty_points_earned, total,
                 input.get("paymentMethod", "cash"), "pending", "pending", input.get("notes")
             ))
             
-            await conn.commit()
-            
             # Clear cart
-            await cur.execute("UPDATE carts SET items = '[]', status = 'completed' WHERE cart_id = %s", (cartId,))
+            await cart_items.clear_items(cur, cartId, status="completed")
+            
+            # Kitchen, inventory and loyalty updates are delivered by the outbox dispatcher
+            await enqueue_order_side_effects(
+                cur, order_id, table_number, items, input.get("notes"),
+                customer_id, loyalty_points_earned
+            )
+            response = {
+                'loyaltyPointsEarned': loyalty_points_earned,
+                'message': 'Order created from cart successfully, kitchen and inventory updates queued'
+            }
+            if idempotency_key:
+                await record_response(cur, idempotency_key, response)
             await conn.commit()
+            outbox_dispatcher.notify()
             
             # Fetch created order
             await cur.execute("SELECT * FROM orders WHERE order_id = %s", (order_id,))
@@ -1000,46 +557,31 @@ async def resolve_create_order_from_cart(_, info, cartId: str, input: Dict[str,
             if not row:
                 raise Exception("Order created but not found")
             
-            items_data = parse_json_field(row.get("items")) or []
-            
-            return {
-                'order': {
-                    'id': str(row.get("id")),
-                    'orderId': row.get("order_id", ""),
-                    'customerId': row.get("customer_id"),
-                    'tableNumber': row.get("table_number"),
-                    'items': [
-                        {
-                            'menuId': item.get("menuId", ""),
-                            'name': item.get("name", ""),
-                            'quantity': item.get("quantity", 0),
-                            'price': float(item.get("price", 0)),
-                            'specialInstructions': item.get("specialInstructions")
-                        }
-                        for item in items_data
-                    ],
-                    'subtotal': float(row.get("subtotal", 0) or 0),
-                    'tax': float(row.get("tax", 0) or 0),
-                    'serviceCharge': float(row.get("service_charge", 0) or 0),
-                    'discount': float(row.get("discount", 0) or 0),
-                    'loyaltyPointsUsed': float(row.get("loyalty_points_used", 0) or 0),
-                    'loyaltyPointsEarned': float(row.get("loyalty_points_earned", 0) or 0),
-                    'total': float(row.get("total", 0) or 0),
-                    'paymentMethod': row.get("payment_method", "cash"),
-                    'paymentStatus': row.get("payment_status", "pending"),
-                    'orderStatus': row.get("order_status", "pending"),
-                    'kitchenStatus': row.get("kitchen_status"),
-                    'staffId': row.get("staff_id"),
-                    'notes': row.get("notes"),
-                    'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
-                    'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else "",
-                    'completedAt': row.get("completed_at").isoformat() if row.get("completed_at") else None
-                },
-                'kitchenOrderCreated': False,
-                'stockUpdated': False,
-                'loyaltyPointsEarned': loyalty_points_earned,
-                'message': 'Order created from cart successfully'
-            }
+            order_row = OrderRow(row)
+            publish_order_update(order_row, 'created')
+            return {'order': order_row, **response}
+
+@query.field("orderSideEffects")
+async def resolve_order_side_effects(_, info, orderId: str):
+    """Outbox events of an order with their delivery state"""
+    return await get_aggregate_events(orderId)
+
+async def _side_effect_states(info, order_id: str) -> Dict[str, str]:
+    """event type -> outbox status for a created order, read once per request (results may be cached for replays)"""
+    pending = info.context.setdefault("order_side_effects", {})
+    if order_id not in pending:
+        pending[order_id] = asyncio.ensure_future(get_aggregate_events(order_id))
+    return {event["type"]: event["status"] for event in await pending[order_id]}
+
+@order_creation_result.field("kitchenOrderCreated")
+async def resolve_kitchen_order_created(result, info):
+    """Deprecated: whether the kitchen ticket has been delivered yet"""
+    return (await _side_effect_states(info, result["order"].orderId)).get(KITCHEN_CREATE_ORDER) == "done"
+
+@order_creation_result.field("stockUpdated")
+async def resolve_stock_updated(result, info):
+    """Deprecated: whether the stock deduction has been delivered yet (True when the order deducts nothing)"""
+    return (await _side_effect_states(info, result["order"].orderId)).get(INVENTORY_REDUCE_STOCK, "done") == "done"
 
 @mutation.field("addItemToCart")
 @require_auth
@@ -1049,79 +591,16 @@ async def resolve_add_item_to_cart(_, info, cartId: str, item: Dict[str, Any]):
     if not pool:
         raise Exception("Database connection not available")
     
-    menuId = item.get("menuId", "")
-    quantity = item.get("quantity", 1)
-    specialInstructions = item.get("specialInstructions")
-    
     async with pool.acquire() as conn:
         async with conn.cursor() as cur:
-            # Get cart
-            await cur.execute("SELECT * FROM carts WHERE cart_id = %s", (cartId,))
-            cart_row = await cur.fetchone()
-            
-            if not cart_row:
-                raise Exception("Cart not found")
-            
-            items = parse_json_field(cart_row.get("items")) or []
-            
-            # Add or update item
-            item_found = False
-            for existing_item in items:
-                if existing_item.get("menuId") == menuId:
-                    existing_item["quantity"] = existing_item.get("quantity", 0) + quantity
-                    if specialInstructions:
-                        existing_item["specialInstructions"] = specialInstructions
-                    item_found = True
-                    break
-            
-            if not item_found:
-                items.append({
-                    "menuId": menuId,
-                    "name": item.get("name", ""),
-                    "quantity": quantity,
-                    "price": float(item.get("price", 0)),
-                    "specialInstructions": specialInstructions
-                })
-            
-            items_json = json.dumps(items)
-            await cur.execute("UPDATE carts SET items = %s WHERE cart_id = %s", (items_json, cartId))
-            await conn.commit()
-            
-            # Fetch updated cart
-            await cur.execute("SELECT * FROM carts WHERE cart_id = %s", (cartId,))
-            cart_row = await cur.fetchone()
-            items_data = parse_json_field(cart_row.get("items")) or []
-            
-            subtotal = sum(float(i.get("price", 0)) * int(i.get("quantity", 0)) for i in items_data)
-            tax = subtotal * 0.1
-            service_charge = subtotal * 0.05
-            discount = float(cart_row.get("discount", 0) or 0)
-            total = subtotal + tax + service_charge - discount
+            try:
+                await cart_items.add_item(cur, cartId, item)
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
             
-            return {
-                'id': str(cart_row.get("id")),
-                'cartId': cart_row.get("cart_id", ""),
-                'customerId': cart_row.get("customer_id"),
-                'tableNumber': cart_row.get("table_number"),
-                'items': [
-                    {
-                        'menuId': i.get("menuId", ""),
-                        'name': i.get("name", ""),
-                        'quantity': i.get("quantity", 0),
-                        'price': float(i.get("price", 0)),
-                        'specialInstructions': i.get("specialInstructions")
-                    }
-                    for i in items_data
-                ],
-                'subtotal': subtotal,
-                'tax': tax,
-                'serviceCharge': service_charge,
-                'discount': discount,
-                'total': total,
-                'status': cart_row.get("status", "active"),
-                'createdAt': cart_row.get("created_at").isoformat() if cart_row.get("created_at") else "",
-                'updatedAt': cart_row.get("updated_at").isoformat() if cart_row.get("updated_at") else ""
-            }
+            return await cart_items.load_cart(cur, cartId)
 
 @mutation.field("updateCartItem")
 async def resolve_update_cart_item(_, info, cartId: str, menuId: str, quantity: int):
@@ -1132,62 +611,14 @@ async def resolve_update_cart_item(_, info, cartId: str, menuId: str, quantity:
     
     async with pool.acquire() as conn:
         async with conn.cursor() as cur:
-            await cur.execute("SELECT * FROM carts WHERE cart_id = %s", (cartId,))
-            cart_row = await cur.fetchone()
-            
-            if not cart_row:
-                raise Exception("Cart not found")
-            
-            items = parse_json_field(cart_row.get("items")) or []
-            
-            # Update item
-            for item in items:
-                if item.get("menuId") == menuId:
-                    if quantity <= 0:
-                        items.remove(item)
-                    else:
-                        item["quantity"] = quantity
-                    break
-            
-            items_json = json.dumps(items)
-            await cur.execute("UPDATE carts SET items = %s WHERE cart_id = %s", (items_json, cartId))
-            await conn.commit()
-            
-            # Fetch updated cart
-            await cur.execute("SELECT * FROM carts WHERE cart_id = %s", (cartId,))
-            cart_row = await cur.fetchone()
-            items_data = parse_json_field(cart_row.get("items")) or []
-            
-            subtotal = sum(float(i.get("price", 0)) * int(i.get("quantity", 0)) for i in items_data)
-            tax = subtotal * 0.1
-            service_charge = subtotal * 0.05
-            discount = float(cart_row.get("discount", 0) or 0)
-            total = subtotal + tax + service_charge - discount
+            try:
+                await cart_items.set_item_quantity(cur, cartId, menuId, quantity)
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
             
-            return {
-                'id': str(cart_row.get("id")),
-                'cartId': cart_row.get("cart_id", ""),
-                'customerId': cart_row.get("customer_id"),
-                'tableNumber': cart_row.get("table_number"),
-                'items': [
-                    {
-                        'menuId': i.get("menuId", ""),
-                        'name': i.get("name", ""),
-                        'quantity': i.get("quantity", 0),
-                        'price': float(i.get("price", 0)),
-                        'specialInstructions': i.get("specialInstructions")
-                    }
-                    for i in items_data
-                ],
-                'subtotal': subtotal,
-                'tax': tax,
-                'serviceCharge': service_charge,
-                'discount': discount,
-                'total': total,
-                'status': cart_row.get("status", "active"),
-                'createdAt': cart_row.get("created_at").isoformat() if cart_row.get("created_at") else "",
-                'updatedAt': cart_row.get("updated_at").isoformat() if cart_row.get("updated_at") else ""
-            }
+            return await cart_items.load_cart(cur, cartId)
 
 @mutation.field("removeItemFromCart")
 async def resolve_remove_item_from_cart(_, info, cartId: str, menuId: str):
@@ -1203,39 +634,29 @@ async def resolve_clear_cart(_, info, cartId: str):
     
     async with pool.acquire() as conn:
         async with conn.cursor() as cur:
-            await cur.execute("UPDATE carts SET items = %s WHERE cart_id = %s", ("[]", cartId))
-            await conn.commit()
-            
-            await cur.execute("SELECT * FROM carts WHERE cart_id = %s", (cartId,))
-            cart_row = await cur.fetchone()
-            
-            if not cart_row:
-                return None
+            try:
+                await cart_items.clear_items(cur, cartId)
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
             
-            return {
-                'id': str(cart_row.get("id")),
-                'cartId': cart_row.get("cart_id", ""),
-                'customerId': cart_row.get("customer_id"),
-                'tableNumber': cart_row.get("table_number"),
-                'items': [],
-                'subtotal': 0.0,
-                'tax': 0.0,
-                'serviceCharge': 0.0,
-                'discount': 0.0,
-                'total': 0.0,
-                'status': cart_row.get("status", "active"),
-                'createdAt': cart_row.get("created_at").isoformat() if cart_row.get("created_at") else "",
-                'updatedAt': cart_row.get("updated_at").isoformat() if cart_row.get("updated_at") else ""
-            }
+            return await cart_items.load_cart(cur, cartId)
 
 @mutation.field("createOrder")
-async def resolve_create_order(_, info, input: Dict[str, Any]):
-    """Create order - requires authentication"""
+async def resolve_create_order(_, info, input: Dict[str, Any], idempotencyKey: Optional[str] = None):
+    """Create order - requires authentication; retries with the same idempotencyKey get the first order"""
     require_auth(info.context)
     pool = get_db()
     if not pool:
         raise Exception("Database connection not available")
     
+    return await idempotent_requests.run(
+        idempotencyKey, "createOrder", {"input": input},
+        lambda fingerprint: create_order(pool, input, idempotencyKey, fingerprint)
+    )
+
+async def create_order(pool, input: Dict[str, Any], idempotency_key: Optional[str], fingerprint: Optional[str]):
     import uuid
     from datetime import datetime
     
@@ -1247,147 +668,52 @@ async def resolve_create_order(_, info, input: Dict[str, Any]):
     subtotal = sum(float(item.get("price", 0)) * int(item.get("quantity", 0)) for item in items)
     tax = subtotal * 0.1
     service_charge = subtotal * 0.05
+    
 # Loyalty logic
     loyalty_points_used = float(input.get("loyaltyPointsUsed", 0))
     discount = loyalty_points_used * 100.0 if loyalty_points_used else 0.0 # 1 point = 100 rupiah (matched JS)
     
     total = subtotal + tax + service_charge - discount
     
-    token = info.context.get('token')
+    customer_id = input.get("customerId")
+    loyalty_points_earned = int(total * 0.01) if customer_id else 0
     
     async with pool.acquire() as conn:
         async with conn.cursor() as cur:
-            items_json = json.dumps(items)
+            # Claim the key first; a replayed request stops here
+            if idempotency_key:
+                stored = await claim(cur, idempotency_key, "createOrder", fingerprint, order_id)
+                if stored is not None:
+                    await conn.rollback()
+                    return stored
+            
+            items_json = codec.dumps(items)
             await cur.execute("""
                 INSERT INTO orders (order_id, customer_id, table_number, items, subtotal, tax, service_charge, discount, 
                                   loyalty_points_used, loyalty_points_earned, total, payment_method, payment_status, 
                                   order_status, notes)
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             """, (
-                order_id, input.get("customerId"), input.get("tableNumber"), items_json,
+                order_id, customer_id, input.get("tableNumber"), items_json,
                 subtotal, tax, service_charge, discount, loyalty_points_used, 0, total,
                 input.get("paymentMethod", "cash"), "pending", "pending", input.get("notes")
             ))
             
             order_db_id = cur.lastrowid
-            await conn.commit()
             
-            # 1. Integrate with Kitchen Service
-            kitchen_order_created = False
-            try:
-                kitchen_query = """
-                    mutation CreateKitchenOrder($input: CreateKitchenOrderInput!) {
-                      createKitchenOrder(input: $input) {
-                        id
-                        orderId
-                        status
-                      }
-                    }
-                """
-                
-                kitchen_items = [
-                    {
-                        "menuId": item.get("menuId"),
-                        "name": item.get("name"),
-                        "quantity": int(item.get("quantity")),
-                        "specialInstructions": item.get("specialInstructions")
-                    }
-                    for item in items
-                ]
-                
-                await call_graphql_service(
-                    KITCHEN_SERVICE_URL,
-                    kitchen_query,
-                    {
-                        "input": {
-                            "orderId": order_id,
-                            "tableNumber": input.get("tableNumber"),
-                            "items": kitchen_items,
-                            "priority": 0,
-                            "notes": input.get("notes")
-                        }
-                    },
-                    token
-                )
-                kitchen_order_created = True
-                
-                # Update order kitchen status
-                await cur.execute("UPDATE orders SET kitchen_status = 'pending' WHERE id = %s", (order_db_id,))
-                await conn.commit()
-                
-            except Exception as e:
-                print(f"Error creating kitchen order: {str(e)}")
-            
-            # 2. Integrate with Inventory Service
-            stock_updated = False
-            try:
-                # Fetch menus to get ingredients
-                for order_item in items:
-                    menu_id = order_item.get("menuId")
-                    await cur.execute("SELECT * FROM menus WHERE menu_id = %s", (menu_id,))
-                    menu_row = await cur.fetchone()
-                    
-                    if menu_row:
-                        ingredients = parse_json_field(menu_row.get("ingredients")) or []
-                        for ingredient in ingredients:
-                            reduce_query = """
-                                mutation ReduceStock($ingredientId: ID!, $quantity: Float!, $reason: String, $referenceId: String, $referenceType: String) {
-                                  reduceStock(ingredientId: $ingredientId, quantity: $quantity, reason: $reason, referenceId: $referenceId, referenceType: $referenceType) {
-                                    id
-                                    quantity
-                                  }
-                                }
-                            """
-                            
-                            await call_graphql_service(
-                                INVENTORY_SERVICE_URL,
-                                reduce_query,
-                                {
-                                    "ingredientId": ingredient.get("ingredientId"),
-                                    "quantity": float(ingredient.get("quantity", 0)) * int(order_item.get("quantity", 1)),
-                                    "reason": f"Order {order_id}",
-                                    "referenceId": order_id,
-                                    "referenceType": "order"
-                                },
-                                token
-                            )
-                stock_updated = True
-            except Exception as e:
-                print(f"Error updating inventory: {str(e)}")
-            
-            # 3. Integrate with User Service - earn loyalty points
-            loyalty_points_earned = 0
-            customer_id = input.get("customerId")
-            if customer_id:
-                try:
-                    # Logic 1% of total
-                    loyalty_points_earned = int(total * 0.01)
-                    
-                    earn_points_query = """
-                        mutation EarnPoints($customerId: ID!, $points: Float!, $orderId: String, $description: String) {
-                          earnPoints(customerId: $customerId, points: $points, orderId: $orderId, description: $description) {
-                            id
-                            points
-                          }
-                        }
-                    """
-                    
-                    await call_graphql_service(
-                        USER_SERVICE_URL,
-                        earn_points_query,
-                        {
-                            "customerId": customer_id,
-                            "points": float(loyalty_points_earned),
-                            "orderId": order_id,
-                            "description": f"Points earned from order {order_id}"
-                        },
-                        token
-                    )
-                    
-                    await cur.execute("UPDATE orders SET loyalty_points_earned = %s WHERE id = %s", (loyalty_points_earned, order_db_id))
-                    await conn.commit()
-                except Exception as e:
-                    print(f"Error earning loyalty points: {str(e)}")
+            # Kitchen, inventory and loyalty updates are delivered by the outbox dispatcher
+            await enqueue_order_side_effects(
+                cur, order_id, input.get("tableNumber"), items, input.get("notes"),
+                customer_id, loyalty_points_earned
+            )
+            response = {
+                'loyaltyPointsEarned': float(loyalty_points_earned),
+                'message': 'Order created successfully, kitchen and inventory updates queued'
+            }
+            if idempotency_key:
+                await record_response(cur, idempotency_key, response)
+            await conn.commit()
+            outbox_dispatcher.notify()
             
             # Fetch created order
             await cur.execute("SELECT * FROM orders WHERE id = %s", (order_db_id,))
@@ -1396,47 +722,9 @@ async def resolve_create_order(_, info, input: Dict[str, Any]):
             if not row:
                 raise Exception("Order created but not found")
             
-            # With DictCursor, row is already a dictionary
-            items_data = parse_json_field(row.get("items")) or []
-            
-            return {
-                'order': {
-                    'id': str(row.get("id")),
-                    'orderId': row.get("order_id", ""),
-                    'customerId': row.get("customer_id"),
-                    'tableNumber': row.get("table_number"),
-                    'items': [
-                        {
-                            'menuId': item.get("menuId", "") if isinstance(item, dict) else item["menuId"],
-                            'name': item.get("name", "") if isinstance(item, dict) else item["name"],
-                            'quantity': item.get("quantity", 0) if isinstance(item, dict) else item["quantity"],
-                            'price': float(item.get("price", 0) if isinstance(item, dict) else item["price"]),
-                            'specialInstructions': item.get("specialInstructions") if isinstance(item, dict) else item.get("specialInstructions")
-                        }
-                        for item in items_data
-                    ],
-                    'subtotal': float(row.get("subtotal", 0) or 0),
-                    'tax': float(row.get("tax", 0) or 0),
-                    'serviceCharge': float(row.get("service_charge", 0) or 0),
-                    'discount': float(row.get("discount", 0) or 0),
-                    'loyaltyPointsUsed': float(row.get("loyalty_points_used", 0) or 0),
-                    'loyaltyPointsEarned': float(row.get("loyalty_points_earned", 0) or 0),
-                    'total': float(row.get("total", 0) or 0),
-                    'paymentMethod': row.get("payment_method", "cash"),
-                    'paymentStatus': row.get("payment_status", "pending"),
-                    'orderStatus': row.get("order_status", "pending"),
-                    'kitchenStatus': row.get("kitchen_status"),
-                    'staffId': row.get("staff_id"),
-                    'notes': row.get("notes"),
-                    'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
-                    'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else "",
-                    'completedAt': row.get("completed_at").isoformat() if row.get("completed_at") else None
-                },
-                'kitchenOrderCreated': kitchen_order_created,
-                'stockUpdated': stock_updated,
-                'loyaltyPointsEarned': float(loyalty_points_earned),
-                'message': 'Order created successfully'
-            }
+            order_row = OrderRow(row)
+            publish_order_update(order_row, 'created')
+            return {'order': order_row, **response}
 
 @mutation.field("updateOrderStatus")
 async def resolve_update_order_status(_, info, orderId: str, status: str):
@@ -1447,6 +735,7 @@ async def resolve_update_order_status(_, info, orderId: str, status: str):
     
     async with pool.acquire() as conn:
         async with conn.cursor() as cur:
+            previous = await previous_status(cur, orderId)
             await cur.execute("UPDATE orders SET order_status = %s WHERE order_id = %s", (status, orderId))
             await conn.commit()
             
@@ -1456,40 +745,9 @@ async def resolve_update_order_status(_, info, orderId: str, status: str):
             if not row:
                 raise Exception("Order not found")
             
-            # With DictCursor, row is already a dictionary
-            items_data = parse_json_field(row.get("items")) or []
-            
-            return {
-                'id': str(row.get("id")),
-                'orderId': row.get("order_id", ""),
-                'customerId': row.get("customer_id"),
-                'tableNumber': row.get("table_number"),
-                'items': [
-                    {
-                        'menuId': item.get("menuId", "") if isinstance(item, dict) else "",
-                        'name': item.get("name", "") if isinstance(item, dict) else "",
-                        'quantity': item.get("quantity", 0) if isinstance(item, dict) else 0,
-                        'price': float(item.get("price", 0) if isinstance(item, dict) else 0),
-                        'specialInstructions': item.get("specialInstructions") if isinstance(item, dict) else None
-                    }
-                    for item in items_data
-                ],
-                'subtotal': float(row.get("subtotal", 0) or 0),
-                'tax': float(row.get("tax", 0) or 0),
-                'serviceCharge': float(row.get("service_charge", 0) or 0),
-                'discount': float(row.get("discount", 0) or 0),
-                'loyaltyPointsUsed': float(row.get("loyalty_points_used", 0) or 0),
-                'loyaltyPointsEarned': float(row.get("loyalty_points_earned", 0) or 0),
-                'total': float(row.get("total", 0) or 0),
-                'paymentMethod': row.get("payment_method", "cash"),
-                'paymentStatus': row.get("payment_status", "pending"),
-                'orderStatus': row.get("order_status", "pending"),
-                'kitchenStatus': row.get("kitchen_status"),
-                'staffId': row.get("staff_id"),
-                'notes': row.get("notes"),
-                'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
-                'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else ""
-            }
+            order_row = OrderRow(row)
+            publish_order_update(order_row, 'updated', ['orderStatus'], previous)
+            return order_row
 
 @mutation.field("cancelOrder")
 async def resolve_cancel_order(_, info, orderId: str):
@@ -1500,45 +758,15 @@ async def resolve_cancel_order(_, info, orderId: str):
     if not pool:
         raise Exception("Database connection not available")
     
-    token = info.context.get('token')
-    
     async with pool.acquire() as conn:
         async with conn.cursor() as cur:
-            # Update local order status
+            # Update local order status and queue the kitchen cancellation in one transaction
+            previous = await previous_status(cur, orderId)
             await cur.execute("UPDATE orders SET order_status = 'cancelled' WHERE order_id = %s", (orderId,))
+            if cur.rowcount:
+                await enqueue(cur, KITCHEN_CANCEL_ORDER, orderId, {"orderId": orderId})
             await conn.commit()
-            
-            # Propagate to Kitchen Service
-            try:
-                # 1. Get Kitchen Order ID
-                kitchen_query = """
-                    query GetKitchenOrder($orderId: String!) {
-                      kitchenOrderByOrderId(orderId: $orderId) {
-                        id
-                      }
-                    }
-                """
-                kitchen_order_data = await call_graphql_service(KITCHEN_SERVICE_URL, kitchen_query, {"orderId": orderId}, token)
-                
-                if kitchen_order_data and kitchen_order_data.get("kitchenOrderByOrderId"):
-                    kitchen_id = kitchen_order_data["kitchenOrderByOrderId"]["id"]
-                    
-                    # 2. Cancel Kitchen Order
-                    cancel_mutation = """
-                        mutation CancelOrder($orderId: ID!) {
-                          cancelOrder(orderId: $orderId) {
-                            id
-                            status
-                          }
-                        }
-                    """
-                    await call_graphql_service(KITCHEN_SERVICE_URL, cancel_mutation, {"orderId": kitchen_id}, token)
-                    
-                    # Update local kitchen_status
-                    await cur.execute("UPDATE orders SET kitchen_status = 'cancelled' WHERE order_id = %s", (orderId,))
-                    await conn.commit()
-            except Exception as e:
-                print(f"Error synchronizing cancellation with Kitchen Service: {str(e)}")
+            outbox_dispatcher.notify()
     
     # Return updated order via resolve_update_order_status generic helper (fetching logic)
     # Be careful, resolve_update_order_status expects to just update status, but we already did it.
@@ -1551,40 +779,9 @@ async def resolve_cancel_order(_, info, orderId: str):
              if not row:
                  raise Exception("Order not found")
              
-             items_data = parse_json_field(row.get("items")) or []
-             
-             return {
-                'id': str(row.get("id")),
-                'orderId': row.get("order_id", ""),
-                'customerId': row.get("customer_id"),
-                'tableNumber': row.get("table_number"),
-                'items': [
-                    {
-                        'menuId': item.get("menuId", "") if isinstance(item, dict) else "",
-                        'name': item.get("name", "") if isinstance(item, dict) else "",
-                        'quantity': item.get("quantity", 0) if isinstance(item, dict) else 0,
-                        'price': float(item.get("price", 0) if isinstance(item, dict) else 0),
-                        'specialInstructions': item.get("specialInstructions") if isinstance(item, dict) else None
-                    }
-                    for item in items_data
-                ],
-                'subtotal': float(row.get("subtotal", 0) or 0),
-                'tax': float(row.get("tax", 0) or 0),
-                'serviceCharge': float(row.get("service_charge", 0) or 0),
-                'discount': float(row.get("discount", 0) or 0),
-                'loyaltyPointsUsed': float(row.get("loyalty_points_used", 0) or 0),
-                'loyaltyPointsEarned': float(row.get("loyalty_points_earned", 0) or 0),
-                'total': float(row.get("total", 0) or 0),
-                'paymentMethod': row.get("payment_method", "cash"),
-                'paymentStatus': row.get("payment_status", "pending"),
-                'orderStatus': row.get("order_status", "pending"),
-                'kitchenStatus': row.get("kitchen_status"),
-                'staffId': row.get("staff_id"),
-                'notes': row.get("notes"),
-                'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
-                'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else "",
-                'completedAt': row.get("completed_at").isoformat() if row.get("completed_at") else None
-            }
+             order_row = OrderRow(row)
+             publish_order_update(order_row, 'updated', ['orderStatus'], previous)
+             return order_row
 
 @mutation.field("updateOrder")
 async def resolve_update_order(_, info, orderId: str, input: Dict[str, Any]):
@@ -1603,7 +800,7 @@ async def resolve_update_order(_, info, orderId: str, input: Dict[str, Any]):
                 params.append(input['tableNumber'])
             if 'items' in input:
                 updates.append("items = %s")
-                params.append(json.dumps(input['items']))
+                params.append(codec.dumps(input['items']))
             if 'paymentMethod' in input:
                 updates.append("payment_method = %s")
                 params.append(input['paymentMethod'])
@@ -1625,40 +822,10 @@ async def resolve_update_order(_, info, orderId: str, input: Dict[str, Any]):
             if not row:
                 raise Exception("Order not found")
             
-            items_data = parse_json_field(row.get("items")) or []
-            
-            return {
-                'id': str(row.get("id")),
-                'orderId': row.get("order_id", ""),
-                'customerId': row.get("customer_id"),
-                'tableNumber': row.get("table_number"),
-                'items': [
-                    {
-                        'menuId': item.get("menuId", "") if isinstance(item, dict) else "",
-                        'name': item.get("name", "") if isinstance(item, dict) else "",
-                        'quantity': item.get("quantity", 0) if isinstance(item, dict) else 0,
-                        'price': float(item.get("price", 0) if isinstance(item, dict) else 0),
-                        'specialInstructions': item.get("specialInstructions") if isinstance(item, dict) else None
-                    }
-                    for item in items_data
-                ],
-                'subtotal': float(row.get("subtotal", 0) or 0),
-                'tax': float(row.get("tax", 0) or 0),
-                'serviceCharge': float(row.get("service_charge", 0) or 0),
-                'discount': float(row.get("discount", 0) or 0),
-                'loyaltyPointsUsed': float(row.get("loyalty_points_used", 0) or 0),
-                'loyaltyPointsEarned': float(row.get("loyalty_points_earned", 0) or 0),
-                'total': float(row.get("total", 0) or 0),
-                'paymentMethod': row.get("payment_method", "cash"),
-                'paymentStatus': row.get("payment_status", "pending"),
-                'orderStatus': row.get("order_status", "pending"),
-                'kitchenStatus': row.get("kitchen_status"),
-                'staffId': row.get("staff_id"),
-                'notes': row.get("notes"),
-                'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
-                'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else "",
-                'completedAt': row.get("completed_at").isoformat() if row.get("completed_at") else None
-            }
+            order_row = OrderRow(row)
+            if updates:
+                publish_order_update(order_row, 'updated', [field for field in input if field in ORDER_COLUMNS])
+            return order_row
 
 @mutation.field("updatePaymentStatus")
 async def resolve_update_payment_status(_, info, orderId: str, paymentStatus: str):
@@ -1678,40 +845,9 @@ async def resolve_update_payment_status(_, info, orderId: str, paymentStatus: st
             if not row:
                 raise Exception("Order not found")
             
-            items_data = parse_json_field(row.get("items")) or []
-            
-            return {
-                'id': str(row.get("id")),
-                'orderId': row.get("order_id", ""),
-                'customerId': row.get("customer_id"),
-                'tableNumber': row.get("table_number"),
-                'items': [
-                    {
-                        'menuId': item.get("menuId", "") if isinstance(item, dict) else "",
-                        'name': item.get("name", "") if isinstance(item, dict) else "",
-                        'quantity': item.get("quantity", 0) if isinstance(item, dict) else 0,
-                        'price': float(item.get("price", 0) if isinstance(item, dict) else 0),
-                        'specialInstructions': item.get("specialInstructions") if isinstance(item, dict) else None
-                    }
-                    for item in items_data
-                ],
-                'subtotal': float(row.get("subtotal", 0) or 0),
-                'tax': float(row.get("tax", 0) or 0),
-                'serviceCharge': float(row.get("service_charge", 0) or 0),
-                'discount': float(row.get("discount", 0) or 0),
-                'loyaltyPointsUsed': float(row.get("loyalty_points_used", 0) or 0),
-                'loyaltyPointsEarned': float(row.get("loyalty_points_earned", 0) or 0),
-                'total': float(row.get("total", 0) or 0),
-                'paymentMethod': row.get("payment_method", "cash"),
-                'paymentStatus': row.get("payment_status", "pending"),
-                'orderStatus': row.get("order_status", "pending"),
-                'kitchenStatus': row.get("kitchen_status"),
-                'staffId': row.get("staff_id"),
-                'notes': row.get("notes"),
-                'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
-                'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else "",
-                'completedAt': row.get("completed_at").isoformat() if row.get("completed_at") else None
-            }
+            order_row = OrderRow(row)
+            publish_order_update(order_row, 'updated', ['paymentStatus'])
+            return order_row
 
 @mutation.field("sendToKitchen")
 async def resolve_send_to_kitchen(_, info, orderId: str):
@@ -1722,6 +858,7 @@ async def resolve_send_to_kitchen(_, info, orderId: str):
     
     async with pool.acquire() as conn:
         async with conn.cursor() as cur:
+            previous = await previous_status(cur, orderId)
             await cur.execute("UPDATE orders SET kitchen_status = 'pending', order_status = 'in_kitchen' WHERE order_id = %s", (orderId,))
             await conn.commit()
             
@@ -1731,41 +868,28 @@ async def resolve_send_to_kitchen(_, info, orderId: str):
             if not row:
                 raise Exception("Order not found")
             
-            items_data = parse_json_field(row.get("items")) or []
-            
-            return {
-                'id': str(row.get("id")),
-                'orderId': row.get("order_id", ""),
-                'customerId': row.get("customer_id"),
-                'tableNumber': row.get("table_number"),
-                'items': [
-                    {
-                        'menuId': item.get("menuId", "") if isinstance(item, dict) else "",
-                        'name': item.get("name", "") if isinstance(item, dict) else "",
-                        'quantity': item.get("quantity", 0) if isinstance(item, dict) else 0,
-                        'price': float(item.get("price", 0) if isinstance(item, dict) else 0),
-                        'specialInstructions': item.get("specialInstructions") if isinstance(item, dict) else None
-                    }
-                    for item in items_data
-                ],
-                'subtotal': float(row.get("subtotal", 0) or 0),
-                'tax': float(row.get("tax", 0) or 0),
-                'serviceCharge': float(row.get("service_charge", 0) or 0),
-                'discount': float(row.get("discount", 0) or 0),
-                'loyaltyPointsUsed': float(row.get("loyalty_points_used", 0) or 0),
-                'loyaltyPointsEarned': float(row.get("loyalty_points_earned", 0) or 0),
-                'total': float(row.get("total", 0) or 0),
-                'paymentMethod': row.get("payment_method", "cash"),
-                'paymentStatus': row.get("payment_status", "pending"),
-                'orderStatus': row.get("order_status", "pending"),
-                'kitchenStatus': row.get("kitchen_status"),
-                'staffId': row.get("staff_id"),
-                'notes': row.get("notes"),
-                'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
-                'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else "",
-                'completedAt': row.get("completed_at").isoformat() if row.get("completed_at") else None
-            }
+            order_row = OrderRow(row)
+            publish_order_update(order_row, 'updated', ['orderStatus', 'kitchenStatus'], previous)
+            return order_row
 
 # Export resolvers
-resolvers = [query, mutation, menu, order, cart, order_item, ingredient_info, stock_check_result]
+@order_connection.field("totalCount")
+@cart_connection.field("totalCount")
+async def resolve_total_count(parent, info):
+    """Count the whole filtered listing, only when a client selects totalCount"""
+    count = parent.get("_count")
+    pool = get_db()
+    if not count or not pool:
+        return 0
+    count_sql, params = count
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(count_sql, params)
+            row = await cur.fetchone()
+            return int(row["total"]) if row else 0
+
+resolvers = [
+    query, mutation, subscription, menu, order, cart, order_item, ingredient_info, stock_check_result,
+    order_connection, cart_connection, order_creation_result
+]
 
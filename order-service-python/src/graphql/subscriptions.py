@@ -0,0 +1,56 @@
+"""
+GraphQL subscriptions (graphql-transport-ws on /graphql)
+orderUpdated pushes one OrderUpdate per committed order change instead of clients polling `orders`.
+Events are indexed by order and by status (new and previous), so `orderUpdated(status: "pending")` also
+sees the update that moves an order out of pending.
+"""
+from datetime import datetime
+from typing import Optional, Dict, Any, Iterable
+from ariadne import SubscriptionType
+from src.event_bus import event_bus
+from src.graphql.order_rows import OrderRow
+
+ORDER_UPDATED = "orderUpdated"
+
+subscription = SubscriptionType()
+
+def _status_filter(status: str):
+    return lambda event: status in (event["order"].orderStatus, event["previousStatus"])
+
+async def previous_status(cur, order_id: str) -> Optional[str]:
+    """Lock the order and return its status before an update; skipped (None) while nobody is subscribed"""
+    if not event_bus.has_subscribers(ORDER_UPDATED):
+        return None
+    await cur.execute("SELECT order_status FROM orders WHERE order_id = %s FOR UPDATE", (order_id,))
+    row = await cur.fetchone()
+    return row["order_status"] if row else None
+
+def publish_order_update(order: OrderRow, event: str, changes: Iterable[str] = (),
+                         previous_status: Optional[str] = None):
+    """Publish a committed change; `changes` lists the Order fields it touched"""
+    if not event_bus.has_subscribers(ORDER_UPDATED):
+        return
+    event_bus.publish(ORDER_UPDATED, {
+        'event': event,
+        'orderId': order.orderId,
+        'changes': list(changes),
+        'previousStatus': previous_status,
+        'order': order,
+        'at': datetime.utcnow().isoformat() + 'Z'
+    }, keys=(f"order:{order.orderId}", f"status:{order.orderStatus}", previous_status and f"status:{previous_status}"))
+
+@subscription.source("orderUpdated")
+async def order_updated_source(_, info, orderId: Optional[str] = None, status: Optional[str] = None):
+    if orderId:
+        subscriber = event_bus.subscribe(ORDER_UPDATED, f"order:{orderId}", _status_filter(status) if status else None)
+    else:
+        subscriber = event_bus.subscribe(ORDER_UPDATED, f"status:{status}" if status else None)
+    try:
+        async for event in subscriber:
+            yield event
+    finally:
+        event_bus.unsubscribe(subscriber)
+
+@subscription.field("orderUpdated")
+async def resolve_order_updated(event: Dict[str, Any], info, **kwargs):
+    return event
@@ -1,17 +1,32 @@
 import os
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from ariadne import make_executable_schema, load_schema_from_path
 from ariadne.asgi import GraphQL
+from ariadne.asgi.handlers import GraphQLTransportWSHandler
 from dotenv import load_dotenv
-from src.database.connection import init_db
+from src.database.connection import init_db, close_db, get_pool_stats
+from src.services.http_client import init_http_clients, close_http_clients, get_http_client_stats
+from src.services.integrations import KITCHEN_SERVICE_URL, INVENTORY_SERVICE_URL, USER_SERVICE_URL
+from src.services.outbox import outbox_dispatcher, get_outbox_backlog
+from src.services.menu_cache import menu_cache
+from src.services.idempotency import idempotent_requests
 from src.graphql.resolvers import resolvers
 from src.auth import get_auth_context
+from src.tracing import extract as extract_trace_context, shutdown_tracing, get_tracing_stats
+from src.graphql.extensions import QueryStatsExtension, MetricsExtension, TracingExtension, get_operation_name
+from src.graphql.metrics import render_metrics, render_stats
+from src.codec import JSONResponse, CODEC_NAME
+from src.graphql.documents import (
+    PersistedQueryHTTPHandler, parse_query, validate_query, load_allowed_operations, get_document_stats
+)
+from src.database.instrumentation import get_query_totals
+from src.event_bus import event_bus
 
 load_dotenv()
 
-app = FastAPI(title="Order Service (Python)", version="1.0.0")
+app = FastAPI(title="Order Service (Python)", version="1.0.0", default_response_class=JSONResponse)
 
 # CORS middleware
 app.add_middleware(
@@ -30,11 +45,13 @@ type_defs = load_schema_from_path(schema_path)
 schema = make_executable_schema(type_defs, resolvers)
 
 # Context value function for GraphQL
-def get_context_value(request: Request) -> dict:
+def get_context_value(request: Request, data: dict = None) -> dict:
     """Build context with authentication info for each request"""
     auth_context = get_auth_context(request)
     return {
         "request": request,
+        "operation_name": get_operation_name(data),
+        "trace_parent": extract_trace_context(request.headers),
         **auth_context
     }
 
@@ -45,11 +62,23 @@ async def startup_event():
     print("🚀 Order Service (Python/Ariadne) running on http://localhost:4004")
     print("📊 GraphQL Explorer: http://localhost:4004/graphql")
     
+    # Preload the allowed operations registry (and warm the document cache)
+    load_allowed_operations()
+    
+    # Open pooled HTTP clients for inter-service calls
+    await init_http_clients({
+        "kitchen": KITCHEN_SERVICE_URL,
+        "inventory": INVENTORY_SERVICE_URL,
+        "user": USER_SERVICE_URL
+    })
+    
     max_retries = 10
     for i in range(max_retries):
         try:
             await init_db()
             print("✅ Order Service (Python/Ariadne): MySQL database connected")
+            # Deliver queued kitchen/inventory/loyalty side-effects in the background
+            outbox_dispatcher.start()
             return
         except Exception as e:
             if i < max_retries - 1:
@@ -60,8 +89,12 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Close database connection on shutdown"""
-    pass
+    """End subscriptions, stop the outbox dispatcher, then close HTTP clients and the database pool and flush traces"""
+    event_bus.close_all()
+    await outbox_dispatcher.stop()
+    await close_http_clients()
+    await close_db()
+    shutdown_tracing()
 
 @app.get("/")
 async def root():
@@ -77,6 +110,42 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+@app.get("/stats")
+async def stats():
+    """Inter-service HTTP client pool, outbox dispatcher, menu cache, SQL statement, tracing, document cache, subscription and idempotency metrics"""
+    try:
+        backlog = await get_outbox_backlog()
+    except Exception as e:
+        backlog = {"error": str(e)}
+    return {
+        "http_clients": get_http_client_stats(),
+        "outbox": {**outbox_dispatcher.stats(), "backlog": backlog},
+        "menu_cache": menu_cache.stats(),
+        "sql": get_query_totals(),
+        "tracing": get_tracing_stats(),
+        "graphql_documents": get_document_stats(),
+        "json_codec": CODEC_NAME,
+        "subscriptions": event_bus.stats(),
+        "idempotency": idempotent_requests.stats()
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Resolver, operation, DB pool, HTTP client, outbox, cache, SQL, document cache, subscription and idempotency metrics in Prometheus text format"""
+    return PlainTextResponse(
+        render_metrics(
+            render_stats("db_pool", get_pool_stats()),
+            render_stats("http_client", get_http_client_stats(), label="service"),
+            render_stats("outbox", outbox_dispatcher.stats()),
+            render_stats("menu_cache", menu_cache.stats()),
+            render_stats("sql", get_query_totals()),
+            render_stats("graphql", get_document_stats()),
+            render_stats("subscriptions", event_bus.stats()),
+            render_stats("idempotency", idempotent_requests.stats())
+        ),
+        media_type="text/plain; version=0.0.4"
+    )
+
 # Ariadne GraphQL Explorer HTML (native GraphiQL with dark theme)
 GRAPHQL_EXPLORER_HTML = """
 <!DOCTYPE html>
@@ -131,7 +200,11 @@ async def graphql_playground():
 graphql_app = GraphQL(
     schema, 
     debug=os.getenv("DEBUG", "False").lower() == "true",
-    context_value=get_context_value
+    context_value=get_context_value,
+    query_parser=parse_query,
+    query_validator=validate_query,
+    http_handler=PersistedQueryHTTPHandler(extensions=[QueryStatsExtension, MetricsExtension, TracingExtension]),
+    websocket_handler=GraphQLTransportWSHandler()
 )
 
 @app.post("/graphql")
@@ -139,6 +212,11 @@ async def graphql_server(request: Request):
     """GraphQL endpoint - handles async resolvers with auth context"""
     return await graphql_app.handle_request(request)
 
+@app.websocket("/graphql")
+async def graphql_subscriptions(websocket: WebSocket):
+    """GraphQL subscriptions over WebSocket (graphql-transport-ws)"""
+    await graphql_app.handle_websocket(websocket)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=4004)
@@ -0,0 +1,146 @@
+"""
+Normalized cart storage
+Cart lines live in cart_items (one row per cart and menu) and the cart's subtotal/tax/service charge/total
+columns are adjusted by the line's delta in the same transaction. Every write locks the carts row first,
+so concurrent taps on the same cart serialize instead of overwriting each other's JSON.
+"""
+from typing import Optional, List, Dict, Any, Tuple
+
+TAX_RATE = 0.1
+SERVICE_CHARGE_RATE = 0.05
+
+def _apply_delta_sql(delta: str = "%s") -> str:
+    # MySQL evaluates single-table UPDATE assignments left to right, so tax/service/total see the new subtotal
+    return f"""
+        UPDATE carts
+        SET subtotal = subtotal + {delta},
+            tax = subtotal * {TAX_RATE},
+            service_charge = subtotal * {SERVICE_CHARGE_RATE},
+            total = subtotal + tax + service_charge - discount
+        WHERE cart_id = %s
+    """
+
+def _iso(value) -> str:
+    return value.isoformat() if value else ""
+
+def format_cart_item(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'menuId': row.get("menu_id", ""),
+        'name': row.get("name", ""),
+        'quantity': int(row.get("quantity", 0) or 0),
+        'price': float(row.get("price", 0) or 0),
+        'specialInstructions': row.get("special_instructions")
+    }
+
+def format_cart(row: Dict[str, Any], items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Shape a carts row and its cart_items rows for the Cart GraphQL type"""
+    return {
+        'id': str(row.get("id")),
+        'cartId': row.get("cart_id", ""),
+        'customerId': row.get("customer_id"),
+        'tableNumber': row.get("table_number"),
+        'items': [format_cart_item(item) for item in items],
+        'subtotal': float(row.get("subtotal", 0) or 0),
+        'tax': float(row.get("tax", 0) or 0),
+        'serviceCharge': float(row.get("service_charge", 0) or 0),
+        'discount': float(row.get("discount", 0) or 0),
+        'total': float(row.get("total", 0) or 0),
+        'status': row.get("status", "active"),
+        'createdAt': _iso(row.get("created_at")),
+        'updatedAt': _iso(row.get("updated_at"))
+    }
+
+async def fetch_items(cur, cart_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """cart_items rows for several carts in one query, grouped by cart_id in insertion order"""
+    grouped: Dict[str, List[Dict[str, Any]]] = {cart_id: [] for cart_id in cart_ids}
+    if not cart_ids:
+        return grouped
+    placeholders = ", ".join(["%s"] * len(cart_ids))
+    await cur.execute(
+        f"SELECT * FROM cart_items WHERE cart_id IN ({placeholders}) ORDER BY id", list(cart_ids)
+    )
+    for item in await cur.fetchall():
+        grouped.setdefault(item["cart_id"], []).append(item)
+    return grouped
+
+async def format_carts(cur, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    items = await fetch_items(cur, [row["cart_id"] for row in rows])
+    return [format_cart(row, items.get(row["cart_id"], [])) for row in rows]
+
+async def load_cart(cur, cart_id: str) -> Optional[Dict[str, Any]]:
+    await cur.execute("SELECT * FROM carts WHERE cart_id = %s", (cart_id,))
+    row = await cur.fetchone()
+    if not row:
+        return None
+    return (await format_carts(cur, [row]))[0]
+
+async def lock_cart(cur, cart_id: str) -> Dict[str, Any]:
+    """Lock the carts row for the rest of the transaction"""
+    await cur.execute("SELECT * FROM carts WHERE cart_id = %s FOR UPDATE", (cart_id,))
+    row = await cur.fetchone()
+    if not row:
+        raise Exception("Cart not found")
+    return row
+
+async def add_item(cur, cart_id: str, item: Dict[str, Any]):
+    """Add quantity to a line (creating it at the given price) and move the totals by quantity x line price"""
+    quantity = int(item.get("quantity", 1))
+    await lock_cart(cur, cart_id)
+    await cur.execute("""
+        INSERT INTO cart_items (cart_id, menu_id, name, quantity, price, special_instructions)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            quantity = quantity + VALUES(quantity),
+            special_instructions = COALESCE(VALUES(special_instructions), special_instructions)
+    """, (
+        cart_id, item.get("menuId", ""), item.get("name", ""), quantity,
+        float(item.get("price", 0)), item.get("specialInstructions")
+    ))
+    # An existing line keeps its price, so the delta uses the stored one
+    await cur.execute(
+        _apply_delta_sql("%s * (SELECT price FROM cart_items WHERE cart_id = %s AND menu_id = %s)"),
+        (quantity, cart_id, item.get("menuId", ""), cart_id)
+    )
+
+async def set_item_quantity(cur, cart_id: str, menu_id: str, quantity: int):
+    """Set a line's quantity (0 or less removes it); unknown lines are left alone"""
+    await lock_cart(cur, cart_id)
+    await cur.execute(
+        "SELECT quantity, price FROM cart_items WHERE cart_id = %s AND menu_id = %s",
+        (cart_id, menu_id)
+    )
+    line = await cur.fetchone()
+    if not line:
+        return
+    if quantity <= 0:
+        quantity = 0
+        await cur.execute("DELETE FROM cart_items WHERE cart_id = %s AND menu_id = %s", (cart_id, menu_id))
+    else:
+        await cur.execute(
+            "UPDATE cart_items SET quantity = %s WHERE cart_id = %s AND menu_id = %s",
+            (quantity, cart_id, menu_id)
+        )
+    await cur.execute(_apply_delta_sql(), ((quantity - int(line["quantity"])) * line["price"], cart_id))
+
+async def clear_items(cur, cart_id: str, status: Optional[str] = None):
+    """Remove every line and zero the totals and discount (optionally closing the cart)"""
+    await lock_cart(cur, cart_id)
+    await cur.execute("DELETE FROM cart_items WHERE cart_id = %s", (cart_id,))
+    await cur.execute(f"""
+        UPDATE carts
+        SET items = '[]', subtotal = 0, tax = 0, service_charge = 0, discount = 0, total = 0
+            {", status = %s" if status else ""}
+        WHERE cart_id = %s
+    """, (status, cart_id) if status else (cart_id,))
+
+async def apply_discount(cur, cart_id: str, discount: float):
+    await cur.execute(
+        "UPDATE carts SET discount = %s, total = subtotal + tax + service_charge - discount WHERE cart_id = %s",
+        (discount, cart_id)
+    )
+
+async def checkout(cur, cart_id: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Lock the cart and return its row and its lines in the order-item shape"""
+    row = await lock_cart(cur, cart_id)
+    items = await fetch_items(cur, [cart_id])
+    return row, [format_cart_item(item) for item in items[cart_id]]
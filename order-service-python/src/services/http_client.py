@@ -0,0 +1,145 @@
+"""
+Shared HTTP client pool for inter-service GraphQL calls
+One long-lived httpx.AsyncClient per downstream host, opened on startup and closed on shutdown
+"""
+import os
+import time
+import httpx
+from typing import Optional, Dict, Any
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+from src.tracing import span, inject
+from src import codec
+
+load_dotenv()
+
+# Client configuration (per downstream host)
+HTTP_TIMEOUT = float(os.getenv("HTTP_CLIENT_TIMEOUT", 10.0))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CLIENT_CONNECT_TIMEOUT", 3.0))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_CLIENT_MAX_CONNECTIONS", 20))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_CLIENT_MAX_KEEPALIVE", 10))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_CLIENT_KEEPALIVE_EXPIRY", 30.0))
+HTTP2_ENABLED = os.getenv("HTTP_CLIENT_HTTP2", "True").lower() == "true"
+
+# HTTP/2 needs the optional h2 package (httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+clients: Dict[str, httpx.AsyncClient] = {}
+client_names: Dict[str, str] = {}
+stats: Dict[str, Dict[str, Any]] = {}
+
+def _origin(url: str) -> str:
+    """Return scheme://host:port for a URL, used as the pool key"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+def _new_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+        ),
+        http2=HTTP2_ENABLED and HTTP2_AVAILABLE
+    )
+
+def _new_stats() -> Dict[str, Any]:
+    return {
+        "requests": 0,
+        "errors": 0,
+        "in_flight": 0,
+        "total_time_ms": 0.0,
+        "max_time_ms": 0.0
+    }
+
+async def init_http_clients(services: Dict[str, str]):
+    """Open one pooled client per downstream service
+
+    services maps a display name (e.g. "kitchen") to the service GraphQL URL
+    """
+    for name, url in services.items():
+        origin = _origin(url)
+        client_names[origin] = name
+        if origin not in clients:
+            clients[origin] = _new_client()
+            stats[origin] = _new_stats()
+
+def get_http_client(url: str) -> httpx.AsyncClient:
+    """Get the pooled client for the host of url (created lazily if not registered)"""
+    origin = _origin(url)
+    client = clients.get(origin)
+    if client is None or client.is_closed:
+        client = _new_client()
+        clients[origin] = client
+        stats.setdefault(origin, _new_stats())
+    return client
+
+async def post_json(url: str, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+    """POST a JSON payload through the pooled client and record timing stats"""
+    client = get_http_client(url)
+    entry = stats[_origin(url)]
+    entry["requests"] += 1
+    entry["in_flight"] += 1
+    started = time.perf_counter()
+    try:
+        with span(f"POST {client_names.get(_origin(url), _origin(url))}", "client", attributes={"http.url": url}) as current:
+            response = await client.post(
+                url, content=codec.dumps_bytes(payload),
+                headers=inject({"Content-Type": "application/json", **(headers or {})})
+            )
+            if current is not None:
+                current.set_attribute("http.status_code", response.status_code)
+            response.raise_for_status()
+            return response
+    except Exception:
+        entry["errors"] += 1
+        raise
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        entry["in_flight"] -= 1
+        entry["total_time_ms"] += elapsed_ms
+        entry["max_time_ms"] = max(entry["max_time_ms"], elapsed_ms)
+
+def _pool_connections(client: httpx.AsyncClient) -> Dict[str, int]:
+    """Read open/idle connection counts from the underlying httpcore pool"""
+    try:
+        connections = client._transport._pool.connections
+        idle = sum(1 for c in connections if c.is_idle())
+        return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+    except Exception:
+        return {"open": 0, "idle": 0, "active": 0}
+
+def get_http_client_stats() -> Dict[str, Any]:
+    """Snapshot of per-service request and connection pool metrics"""
+    result = {}
+    for origin, client in clients.items():
+        entry = stats.get(origin, _new_stats())
+        completed = entry["requests"] - entry["in_flight"]
+        result[client_names.get(origin, origin)] = {
+            "origin": origin,
+            "http2": HTTP2_ENABLED and HTTP2_AVAILABLE,
+            "closed": client.is_closed,
+            "requests": entry["requests"],
+            "errors": entry["errors"],
+            "in_flight": entry["in_flight"],
+            "avg_time_ms": round(entry["total_time_ms"] / completed, 2) if completed else 0.0,
+            "max_time_ms": round(entry["max_time_ms"], 2),
+            "connections": _pool_connections(client),
+            "limits": {
+                "max_connections": HTTP_MAX_CONNECTIONS,
+                "max_keepalive_connections": HTTP_MAX_KEEPALIVE,
+                "keepalive_expiry": HTTP_KEEPALIVE_EXPIRY
+            }
+        }
+    return result
+
+async def close_http_clients():
+    """Close all pooled clients"""
+    for client in clients.values():
+        await client.aclose()
+    clients.clear()
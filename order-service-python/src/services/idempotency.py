@@ -0,0 +1,163 @@
+"""
+Idempotent order creation
+createOrder/createOrderFromCart take an optional idempotencyKey. The first execution claims the key in
+order_idempotency_keys at the start of its transaction (the primary key makes racing replicas wait for it and
+then see the claim); a claimed key rolls the retry back before anything is written and returns the stored result.
+Results are also kept in a recent-keys cache, so most retries never reach the database, and a retry that
+arrives while the first execution is still running waits for it instead of running again.
+"""
+import os
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Callable, Awaitable
+from src.database.connection import get_db
+from src import codec
+from src.graphql.order_rows import OrderRow
+from dotenv import load_dotenv
+
+load_dotenv()
+
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", 1000))  # recent keys kept in memory
+IDEMPOTENCY_CACHE_TTL = float(os.getenv("IDEMPOTENCY_CACHE_TTL", 600))  # seconds
+IDEMPOTENCY_KEY_RETENTION = int(os.getenv("IDEMPOTENCY_KEY_RETENTION", 24))  # hours a key is kept in the table
+IDEMPOTENCY_PURGE_INTERVAL = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", 3600))  # seconds between purges
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+def request_fingerprint(operation: str, arguments: Dict[str, Any]) -> str:
+    """sha256 of the operation and its arguments, to reject a key reused for a different request"""
+    raw = json.dumps({"operation": operation, "arguments": arguments}, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _check_fingerprint(stored: str, fingerprint: str):
+    if stored != fingerprint:
+        raise Exception("idempotencyKey was already used for a different request")
+
+async def claim(cur, key: str, operation: str, fingerprint: str, order_id: str) -> Optional[Dict[str, Any]]:
+    """Claim the key in the caller's transaction
+
+    Returns None when the key is new; for a key that is already claimed returns the stored result and the
+    caller must roll back. A concurrent claim from another transaction blocks here until that one finishes.
+    """
+    await cur.execute("""
+        INSERT IGNORE INTO order_idempotency_keys (idempotency_key, operation, request_hash, order_id)
+        VALUES (%s, %s, %s, %s)
+    """, (key, operation, fingerprint, order_id))
+    if cur.rowcount:
+        return None
+    return await load_result(cur, key, fingerprint)
+
+async def record_response(cur, key: str, response: Dict[str, Any]):
+    """Store the non-order fields of the result with the claim (same transaction)"""
+    await cur.execute(
+        "UPDATE order_idempotency_keys SET response = %s WHERE idempotency_key = %s",
+        (codec.dumps(response), key)
+    )
+
+async def load_result(cur, key: str, fingerprint: str) -> Dict[str, Any]:
+    # Locking read: sees the claiming transaction's commit even inside an older snapshot
+    await cur.execute("""
+        SELECT k.request_hash, k.response, o.*
+        FROM order_idempotency_keys k
+        JOIN orders o ON o.order_id = k.order_id
+        WHERE k.idempotency_key = %s
+        LOCK IN SHARE MODE
+    """, (key,))
+    row = await cur.fetchone()
+    if not row:
+        raise Exception("idempotencyKey is claimed but its order was not found")
+    _check_fingerprint(row["request_hash"], fingerprint)
+    return {**codec.parse_json_field(row["response"], {}), "order": OrderRow(row)}
+
+class IdempotentRequests:
+    """Recent-keys cache and in-flight registry in front of the order_idempotency_keys table"""
+
+    def __init__(self, cache_size: int, cache_ttl: float):
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._recent: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (fingerprint, result, expires_at)
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._last_purge = time.monotonic()
+        self._stats = {"executed": 0, "cache_hits": 0, "waited": 0, "conflicts": 0, "purged": 0}
+
+    def _cached(self, key: str) -> Optional[tuple]:
+        entry = self._recent.get(key)
+        if entry is None:
+            return None
+        if entry[2] <= time.monotonic():
+            del self._recent[key]
+            return None
+        self._recent.move_to_end(key)
+        return entry
+
+    def _remember(self, key: str, fingerprint: str, result: Dict[str, Any]):
+        if self.cache_size <= 0:
+            return
+        self._recent[key] = (fingerprint, result, time.monotonic() + self.cache_ttl)
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.cache_size:
+            self._recent.popitem(last=False)
+
+    async def run(self, key: Optional[str], operation: str, arguments: Dict[str, Any],
+                  execute: Callable[[Optional[str]], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Run execute(fingerprint) at most once per key; duplicates get the first result"""
+        if not key:
+            return await execute(None)
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            raise Exception(f"idempotencyKey must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters")
+        fingerprint = request_fingerprint(operation, arguments)
+        while True:
+            cached = self._cached(key)
+            if cached is not None:
+                if cached[0] != fingerprint:
+                    self._stats["conflicts"] += 1
+                _check_fingerprint(cached[0], fingerprint)
+                self._stats["cache_hits"] += 1
+                return cached[1]
+            pending = self._in_flight.get(key)
+            if pending is None:
+                break
+            # Same key still executing: wait, then take its cached result (or run ourselves if it failed)
+            self._stats["waited"] += 1
+            await asyncio.shield(pending)
+        done = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = done
+        try:
+            result = await execute(fingerprint)
+            self._stats["executed"] += 1
+            self._remember(key, fingerprint, result)
+            return result
+        finally:
+            del self._in_flight[key]
+            done.set_result(None)
+            self._maybe_purge()
+
+    def _maybe_purge(self):
+        if time.monotonic() - self._last_purge < IDEMPOTENCY_PURGE_INTERVAL:
+            return
+        self._last_purge = time.monotonic()
+        asyncio.get_running_loop().create_task(self._purge())
+
+    async def _purge(self):
+        """Delete keys past IDEMPOTENCY_KEY_RETENTION (runs in the background)"""
+        pool = get_db()
+        if not pool:
+            return
+        try:
+            async with pool.acquire() as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute(
+                        "DELETE FROM order_idempotency_keys WHERE created_at < NOW() - INTERVAL %s HOUR",
+                        (IDEMPOTENCY_KEY_RETENTION,)
+                    )
+                    self._stats["purged"] += cur.rowcount
+                    await conn.commit()
+        except Exception as e:
+            print(f"⚠️ Idempotency key purge failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"cached": len(self._recent), "in_flight": len(self._in_flight), **self._stats}
+
+idempotent_requests = IdempotentRequests(IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_CACHE_TTL)
@@ -0,0 +1,168 @@
+"""
+Downstream GraphQL calls made by the order service
+Kitchen tickets, stock deductions and loyalty points for orders
+"""
+import os
+from typing import Optional, List, Dict, Any
+from src.services.http_client import post_json
+from src import codec
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Service URLs
+KITCHEN_SERVICE_URL = os.getenv("KITCHEN_SERVICE_URL", "http://localhost:4001/graphql")
+INVENTORY_SERVICE_URL = os.getenv("INVENTORY_SERVICE_URL", "http://localhost:4002/graphql")
+USER_SERVICE_URL = os.getenv("USER_SERVICE_URL", "http://localhost:4003/graphql")
+
+# Per-dependency timeouts (seconds) for order side-effects
+KITCHEN_CALL_TIMEOUT = float(os.getenv("KITCHEN_CALL_TIMEOUT", 5.0))
+INVENTORY_CALL_TIMEOUT = float(os.getenv("INVENTORY_CALL_TIMEOUT", 5.0))
+USER_CALL_TIMEOUT = float(os.getenv("USER_CALL_TIMEOUT", 3.0))
+
+async def call_graphql_service(url: str, query: str, variables: dict = None, token: str = None):
+    """Helper function to call GraphQL service"""
+    try:
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = token
+
+        response = await post_json(
+            url,
+            {"query": query, "variables": variables or {}},
+            headers
+        )
+        data = codec.loads(response.content)
+
+        if "errors" in data:
+            raise Exception(data["errors"][0]["message"])
+
+        return data.get("data", {})
+    except Exception as e:
+        print(f"Error calling service at {url}: {str(e)}")
+        raise
+
+async def create_kitchen_order(order_id: str, table_number, items: List[Dict[str, Any]], notes: Optional[str], token: str = None) -> bool:
+    """Create the kitchen ticket for an order (an existing ticket counts as created)"""
+    kitchen_query = """
+        mutation CreateKitchenOrder($input: CreateKitchenOrderInput!) {
+          createKitchenOrder(input: $input) {
+            id
+            orderId
+            status
+          }
+        }
+    """
+    kitchen_items = [
+        {
+            "menuId": item.get("menuId"),
+            "name": item.get("name"),
+            "quantity": int(item.get("quantity")),
+            "specialInstructions": item.get("specialInstructions")
+        }
+        for item in items
+    ]
+    try:
+        await call_graphql_service(
+            KITCHEN_SERVICE_URL,
+            kitchen_query,
+            {
+                "input": {
+                    "orderId": order_id,
+                    "tableNumber": table_number,
+                    "items": kitchen_items,
+                    "priority": 0,
+                    "notes": notes
+                }
+            },
+            token
+        )
+    except Exception as e:
+        # Kitchen rejects duplicate order ids, so a retried delivery is already done
+        if "already exists" not in str(e):
+            raise
+    return True
+
+async def cancel_kitchen_order(order_id: str, token: str = None) -> bool:
+    """Cancel the kitchen ticket for an order, returns False if there is none"""
+    kitchen_query = """
+        query GetKitchenOrder($orderId: String!) {
+          kitchenOrderByOrderId(orderId: $orderId) {
+            id
+            status
+          }
+        }
+    """
+    kitchen_order_data = await call_graphql_service(KITCHEN_SERVICE_URL, kitchen_query, {"orderId": order_id}, token)
+    kitchen_order = (kitchen_order_data or {}).get("kitchenOrderByOrderId")
+    if not kitchen_order:
+        return False
+    if kitchen_order.get("status") == "cancelled":
+        return True
+
+    cancel_mutation = """
+        mutation CancelOrder($orderId: String!) {
+          cancelOrder(orderId: $orderId) {
+            id
+            status
+          }
+        }
+    """
+    await call_graphql_service(KITCHEN_SERVICE_URL, cancel_mutation, {"orderId": kitchen_order["id"]}, token)
+    return True
+
+async def reduce_order_stock(order_id: str, deductions: List[Dict[str, Any]], token: str = None) -> bool:
+    """Deduct the ingredients of an order from inventory in one batched call
+
+    Inventory ignores a repeated batch for the same order reference.
+    """
+    if not deductions:
+        return True
+    reduce_query = """
+        mutation ReduceStockBatch($items: [StockReductionInput!]!, $reason: String, $referenceId: String, $referenceType: String) {
+          reduceStockBatch(items: $items, reason: $reason, referenceId: $referenceId, referenceType: $referenceType) {
+            id
+            quantity
+          }
+        }
+    """
+    await call_graphql_service(
+        INVENTORY_SERVICE_URL,
+        reduce_query,
+        {
+            "items": deductions,
+            "reason": f"Order {order_id}",
+            "referenceId": order_id,
+            "referenceType": "order"
+        },
+        token
+    )
+    return True
+
+async def earn_loyalty_points(customer_id: Optional[str], points: float, order_id: str, token: str = None) -> bool:
+    """Credit loyalty points for an order (no-op for guest orders)
+
+    User service ignores a repeated credit for the same order.
+    """
+    if not customer_id:
+        return False
+    earn_points_query = """
+        mutation EarnPoints($customerId: ID!, $points: Float!, $orderId: String, $description: String) {
+          earnPoints(customerId: $customerId, points: $points, orderId: $orderId, description: $description) {
+            id
+            points
+          }
+        }
+    """
+    await call_graphql_service(
+        USER_SERVICE_URL,
+        earn_points_query,
+        {
+            "customerId": customer_id,
+            "points": float(points),
+            "orderId": order_id,
+            "description": f"Points earned from order {order_id}"
+        },
+        token
+    )
+    return True
@@ -0,0 +1,202 @@
+"""
+Process-local menu catalogue cache
+The whole menus table is loaded once, parsed into GraphQL-ready objects and indexed by id, menu_id,
+category and availability. Menu mutations invalidate it; MENU_CACHE_TTL bounds staleness across replicas.
+With MENU_CACHE_TTL=0 every read queries the table directly: single menus by key, listings selecting only the
+requested columns.
+"""
+import os
+import time
+import asyncio
+from typing import Optional, List, Dict, Any
+from src.database.connection import get_db
+from src.codec import parse_json_field
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MENU_CACHE_TTL = float(os.getenv("MENU_CACHE_TTL", 60))  # seconds, 0 disables caching
+
+# Menu field -> menus columns, for projecting uncached listings onto the selection set
+MENU_COLUMNS = {
+    "id": ("id",),
+    "menuId": ("menu_id",),
+    "name": ("name",),
+    "description": ("description",),
+    "category": ("category",),
+    "price": ("price",),
+    "image": ("image",),
+    "ingredients": ("ingredients",),
+    "available": ("available",),
+    "preparationTime": ("preparation_time",),
+    "tags": ("tags",),
+    "createdAt": ("created_at",),
+    "updatedAt": ("updated_at",)
+}
+
+def format_menu(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a menus row for the Menu GraphQL type"""
+    ingredients_data = parse_json_field(row.get("ingredients")) or []
+    tags_data = parse_json_field(row.get("tags")) or []
+    return {
+        'id': str(row.get("id")),
+        'menuId': row.get("menu_id", ""),
+        'name': row.get("name", ""),
+        'description': row.get("description"),
+        'category': row.get("category", ""),
+        'price': float(row.get("price", 0) or 0),
+        'image': row.get("image"),
+        'ingredients': [
+            {
+                'ingredientId': ing.get("ingredientId", ""),
+                'ingredientName': ing.get("ingredientName", ""),
+                'quantity': float(ing.get("quantity", 0)),
+                'unit': ing.get("unit", "")
+            }
+            for ing in ingredients_data
+        ],
+        'available': bool(row.get("available", True)),
+        'preparationTime': row.get("preparation_time", 15),
+        'tags': tags_data,
+        'createdAt': row.get("created_at").isoformat() if row.get("created_at") else "",
+        'updatedAt': row.get("updated_at").isoformat() if row.get("updated_at") else ""
+    }
+
+class MenuSnapshot:
+    """Immutable indexed view of the menus table (lists keep ORDER BY name)"""
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.menus = [format_menu(row) for row in rows if row.get("id") is not None]
+        self.by_id = {m['id']: m for m in self.menus}
+        # MySQL compares these columns case-insensitively, so the indexes do too
+        self.by_menu_id = {m['menuId'].lower(): m for m in self.menus}
+        self.by_category: Dict[str, List[Dict[str, Any]]] = {}
+        categories: Dict[str, str] = {}
+        for m in self.menus:
+            key = (m['category'] or "").lower()
+            self.by_category.setdefault(key, []).append(m)
+            if m['category']:
+                categories.setdefault(key, m['category'])
+        self.categories = [categories[key] for key in sorted(categories)]
+        self.by_availability = {
+            True: [m for m in self.menus if m['available']],
+            False: [m for m in self.menus if not m['available']]
+        }
+
+class MenuCache:
+    """Loads the catalogue on demand (single flight) and serves reads from memory"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._snapshot: Optional[MenuSnapshot] = None
+        self._expires_at = 0.0
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        self._stats = {"hits": 0, "misses": 0, "loads": 0, "invalidations": 0}
+
+    async def snapshot(self) -> MenuSnapshot:
+        """Current catalogue, reloading it if it was invalidated or expired"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() < self._expires_at:
+            self._stats["hits"] += 1
+            return snapshot
+        self._stats["misses"] += 1
+        async with self._lock:
+            # Another request may have reloaded while we waited
+            if self._snapshot is not None and time.monotonic() < self._expires_at:
+                return self._snapshot
+            generation = self._generation
+            snapshot = MenuSnapshot(await self._load_rows())
+            self._stats["loads"] += 1
+            # Skip installing if a write invalidated the cache during the load
+            if self.ttl > 0 and generation == self._generation:
+                self._snapshot = snapshot
+                self._expires_at = time.monotonic() + self.ttl
+            return snapshot
+
+    async def _fetch(self, sql: str, params: list = ()) -> List[Dict[str, Any]]:
+        pool = get_db()
+        if not pool:
+            raise Exception("Database connection not available")
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(sql, params)
+                return await cur.fetchall()
+
+    async def _load_rows(self) -> List[Dict[str, Any]]:
+        return await self._fetch("SELECT * FROM menus ORDER BY name ASC")
+
+    async def _query_rows(self, columns: str, category: Optional[str], available: Optional[bool]) -> List[Dict[str, Any]]:
+        where = "1=1"
+        params = []
+        if category:
+            where += " AND category = %s"
+            params.append(category)
+        if available is not None:
+            where += " AND available = %s"
+            params.append(bool(available))
+        return await self._fetch(f"SELECT {columns} FROM menus WHERE {where} ORDER BY name ASC", params)
+
+    async def _query_one(self, column: str, value: str) -> Optional[Dict[str, Any]]:
+        """Keyed single-row lookup used while caching is disabled"""
+        self._stats["misses"] += 1
+        rows = await self._fetch(f"SELECT * FROM menus WHERE {column} = %s LIMIT 1", [value])
+        return format_menu(rows[0]) if rows else None
+
+    def invalidate(self):
+        """Drop the catalogue; call after committing a menu write"""
+        self._generation += 1
+        self._snapshot = None
+        self._expires_at = 0.0
+        self._stats["invalidations"] += 1
+
+    async def list(self, category: Optional[str] = None, available: Optional[bool] = None,
+                   columns: str = "*") -> List[Dict[str, Any]]:
+        """Menus filtered like the SQL query (category and/or availability), ordered by name
+
+        `columns` only applies when caching is disabled; the cached catalogue always holds whole rows.
+        """
+        if self.ttl <= 0:
+            self._stats["misses"] += 1
+            return [format_menu(row) for row in await self._query_rows(columns, category, available)]
+        snapshot = await self.snapshot()
+        if category:
+            menus = snapshot.by_category.get(category.lower(), [])
+            if available is not None:
+                menus = [m for m in menus if m['available'] == bool(available)]
+            return list(menus)
+        if available is not None:
+            return list(snapshot.by_availability[bool(available)])
+        return list(snapshot.menus)
+
+    async def get(self, id: str) -> Optional[Dict[str, Any]]:
+        if self.ttl <= 0:
+            return await self._query_one("id", id)
+        return (await self.snapshot()).by_id.get(str(id))
+
+    async def get_by_menu_id(self, menu_id: str) -> Optional[Dict[str, Any]]:
+        if self.ttl <= 0:
+            return await self._query_one("menu_id", menu_id)
+        return (await self.snapshot()).by_menu_id.get((menu_id or "").lower())
+
+    async def categories(self) -> List[str]:
+        if self.ttl <= 0:
+            self._stats["misses"] += 1
+            rows = await self._fetch(
+                "SELECT DISTINCT category FROM menus WHERE category IS NOT NULL AND category <> '' ORDER BY category"
+            )
+            return [row["category"] for row in rows]
+        return list((await self.snapshot()).categories)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        snapshot = self._snapshot
+        return {
+            "ttl": self.ttl,
+            "cached": snapshot is not None,
+            "size": len(snapshot.menus) if snapshot else 0,
+            "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+            **self._stats
+        }
+
+menu_cache = MenuCache(MENU_CACHE_TTL)
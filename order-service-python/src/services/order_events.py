@@ -0,0 +1,60 @@
+"""
+Outbox handlers for order side-effects
+Each handler is idempotent so a retried delivery never duplicates kitchen tickets, stock movements or points
+"""
+from typing import Dict, Any
+from src.database.connection import get_db
+from src.services.outbox import register_handler
+from src.services.integrations import (
+    create_kitchen_order, cancel_kitchen_order, reduce_order_stock, earn_loyalty_points,
+    KITCHEN_CALL_TIMEOUT, INVENTORY_CALL_TIMEOUT, USER_CALL_TIMEOUT
+)
+
+KITCHEN_CREATE_ORDER = "kitchen.create_order"
+KITCHEN_CANCEL_ORDER = "kitchen.cancel_order"
+INVENTORY_REDUCE_STOCK = "inventory.reduce_stock"
+LOYALTY_EARN_POINTS = "loyalty.earn_points"
+
+async def _execute(sql: str, params: tuple):
+    """Run a single statement against order_db and commit"""
+    pool = get_db()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(sql, params)
+            await conn.commit()
+
+async def _order_status(order_id: str):
+    pool = get_db()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT order_status FROM orders WHERE order_id = %s", (order_id,))
+            row = await cur.fetchone()
+            return row.get("order_status") if row else None
+
+@register_handler(KITCHEN_CREATE_ORDER, KITCHEN_CALL_TIMEOUT)
+async def handle_kitchen_create_order(payload: Dict[str, Any], idempotency_key: str):
+    """Send the order to the kitchen queue unless it was cancelled meanwhile"""
+    if await _order_status(payload["orderId"]) == "cancelled":
+        return
+    await create_kitchen_order(payload["orderId"], payload.get("tableNumber"), payload.get("items", []), payload.get("notes"))
+    await _execute("UPDATE orders SET kitchen_status = 'pending' WHERE order_id = %s", (payload["orderId"],))
+
+@register_handler(KITCHEN_CANCEL_ORDER, KITCHEN_CALL_TIMEOUT)
+async def handle_kitchen_cancel_order(payload: Dict[str, Any], idempotency_key: str):
+    """Cancel the kitchen ticket of a cancelled order"""
+    if await cancel_kitchen_order(payload["orderId"]):
+        await _execute("UPDATE orders SET kitchen_status = 'cancelled' WHERE order_id = %s", (payload["orderId"],))
+
+@register_handler(INVENTORY_REDUCE_STOCK, INVENTORY_CALL_TIMEOUT)
+async def handle_inventory_reduce_stock(payload: Dict[str, Any], idempotency_key: str):
+    """Deduct the order's ingredients from inventory"""
+    await reduce_order_stock(payload["orderId"], payload.get("deductions", []))
+
+@register_handler(LOYALTY_EARN_POINTS, USER_CALL_TIMEOUT)
+async def handle_loyalty_earn_points(payload: Dict[str, Any], idempotency_key: str):
+    """Credit the customer's loyalty points and record them on the order"""
+    if await earn_loyalty_points(payload.get("customerId"), payload["points"], payload["orderId"]):
+        await _execute(
+            "UPDATE orders SET loyalty_points_earned = %s WHERE order_id = %s",
+            (payload["points"], payload["orderId"])
+        )
@@ -0,0 +1,261 @@
+"""
+Transactional outbox for order side-effects
+Events are inserted in the same transaction as the order row and delivered by a background dispatcher
+"""
+import os
+import time
+import random
+import asyncio
+from typing import Optional, List, Dict, Any, Callable, Awaitable
+from src.database.connection import get_db
+from src import codec
+from dotenv import load_dotenv
+from src.tracing import span, current_traceparent, parse_traceparent
+
+load_dotenv()
+
+# Dispatcher configuration
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 20))
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", 5))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", 1.0))  # seconds
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 8))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", 2.0))  # seconds, doubled per attempt
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", 300.0))  # seconds
+OUTBOX_LOCK_TIMEOUT = int(os.getenv("OUTBOX_LOCK_TIMEOUT", 60))  # seconds before a claimed event is retried
+
+Handler = Callable[[Dict[str, Any], str], Awaitable[None]]
+handlers: Dict[str, Dict[str, Any]] = {}
+
+def register_handler(event_type: str, timeout: float):
+    """Register the coroutine that delivers an event type
+
+    The handler receives (payload, idempotency_key) and must be safe to run more than once.
+    """
+    def decorator(func: Handler) -> Handler:
+        handlers[event_type] = {"func": func, "timeout": timeout}
+        return func
+    return decorator
+
+async def enqueue(cur, event_type: str, aggregate_id: str, payload: Dict[str, Any], idempotency_key: Optional[str] = None):
+    """Insert an outbox event using the caller's cursor (committed with the caller's transaction)
+
+    The idempotency key defaults to "<event_type>:<aggregate_id>"; enqueueing the same key twice is a no-op.
+    The active trace context is stored with the payload so delivery continues the same trace.
+    """
+    traceparent = current_traceparent()
+    if traceparent:
+        payload = {**payload, "traceparent": traceparent}
+    await cur.execute("""
+        INSERT IGNORE INTO order_outbox (event_type, aggregate_id, idempotency_key, payload)
+        VALUES (%s, %s, %s, %s)
+    """, (event_type, aggregate_id, idempotency_key or f"{event_type}:{aggregate_id}", codec.dumps(payload)))
+
+def backoff_delay(attempts: int) -> float:
+    """Exponential backoff with jitter for the given number of failed attempts"""
+    delay = min(OUTBOX_BACKOFF_MAX, OUTBOX_BACKOFF_BASE * (2 ** max(attempts - 1, 0)))
+    return delay * random.uniform(0.5, 1.0)
+
+class OutboxDispatcher:
+    """Background worker that drains the outbox in batches with bounded concurrency"""
+
+    def __init__(self, batch_size: int, concurrency: int, poll_interval: float, max_attempts: int):
+        self.batch_size = batch_size
+        self.concurrency = max(concurrency, 1)
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._stats = {
+            "batches": 0,
+            "claimed": 0,
+            "delivered": 0,
+            "retried": 0,
+            "failed": 0,
+            "in_flight": 0,
+            "total_delivery_ms": 0.0,
+            "max_delivery_ms": 0.0,
+            "last_error": None
+        }
+
+    def start(self):
+        """Start the dispatcher loop on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the dispatcher loop; claimed events are retried after OUTBOX_LOCK_TIMEOUT"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self):
+        """Wake the dispatcher right away (call after committing new events)"""
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                processed = await self.dispatch_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._stats["last_error"] = str(e)
+                print(f"❌ Outbox dispatcher error: {str(e)}")
+                processed = 0
+            if processed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def _claim(self, cur) -> list:
+        """Lock a batch of due events (and events abandoned by a stopped worker)"""
+        await cur.execute("""
+            SELECT id, event_type, aggregate_id, idempotency_key, payload, attempts
+            FROM order_outbox
+            WHERE (status = 'pending' AND next_attempt_at <= NOW(3))
+               OR (status = 'processing' AND locked_until < NOW(3))
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """, (self.batch_size,))
+        events = await cur.fetchall()
+        if events:
+            placeholders = ", ".join(["%s"] * len(events))
+            await cur.execute(f"""
+                UPDATE order_outbox
+                SET status = 'processing', attempts = attempts + 1,
+                    locked_until = NOW(3) + INTERVAL %s SECOND
+                WHERE id IN ({placeholders})
+            """, (OUTBOX_LOCK_TIMEOUT, *[event["id"] for event in events]))
+        return events
+
+    async def dispatch_batch(self) -> int:
+        """Claim and deliver one batch, returns the number of events processed"""
+        pool = get_db()
+        if not pool:
+            return 0
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                events = await self._claim(cur)
+                await conn.commit()
+        if not events:
+            return 0
+
+        self._stats["batches"] += 1
+        self._stats["claimed"] += len(events)
+        errors = await asyncio.gather(*(self._deliver(event) for event in events))
+
+        # Record outcomes with one connection for the whole batch
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                done_ids = [event["id"] for event, error in zip(events, errors) if error is None]
+                if done_ids:
+                    placeholders = ", ".join(["%s"] * len(done_ids))
+                    await cur.execute(f"""
+                        UPDATE order_outbox
+                        SET status = 'done', locked_until = NULL, last_error = NULL, processed_at = NOW()
+                        WHERE id IN ({placeholders})
+                    """, done_ids)
+                for event, error in zip(events, errors):
+                    if error is None:
+                        continue
+                    attempts = int(event.get("attempts") or 0) + 1
+                    if attempts >= self.max_attempts:
+                        self._stats["failed"] += 1
+                        print(f"❌ Outbox event {event['idempotency_key']} failed after {attempts} attempts: {error}")
+                        await cur.execute("""
+                            UPDATE order_outbox
+                            SET status = 'failed', locked_until = NULL, last_error = %s
+                            WHERE id = %s
+                        """, (error[:1000], event["id"]))
+                    else:
+                        self._stats["retried"] += 1
+                        await cur.execute("""
+                            UPDATE order_outbox
+                            SET status = 'pending', locked_until = NULL, last_error = %s,
+                                next_attempt_at = NOW(3) + INTERVAL %s MICROSECOND
+                            WHERE id = %s
+                        """, (error[:1000], int(backoff_delay(attempts) * 1_000_000), event["id"]))
+                await conn.commit()
+        return len(events)
+
+    async def _deliver(self, event: Dict[str, Any]) -> Optional[str]:
+        """Run the handler for one event, returns an error message or None on success"""
+        async with self._semaphore:
+            self._stats["in_flight"] += 1
+            started = time.perf_counter()
+            try:
+                handler = handlers.get(event["event_type"])
+                if not handler:
+                    raise Exception(f"No handler registered for outbox event '{event['event_type']}'")
+                payload = event.get("payload")
+                if isinstance(payload, str):
+                    payload = codec.loads(payload)
+                with span(
+                    f"outbox {event['event_type']}", "consumer", parse_traceparent(payload.get("traceparent")),
+                    {"outbox.idempotency_key": event["idempotency_key"], "outbox.attempt": int(event.get("attempts") or 0) + 1}
+                ):
+                    await asyncio.wait_for(handler["func"](payload, event["idempotency_key"]), timeout=handler["timeout"])
+                self._stats["delivered"] += 1
+                return None
+            except asyncio.TimeoutError:
+                error = f"timed out after {handlers[event['event_type']]['timeout']}s"
+            except Exception as e:
+                error = str(e) or e.__class__.__name__
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                self._stats["in_flight"] -= 1
+                self._stats["total_delivery_ms"] += elapsed_ms
+                self._stats["max_delivery_ms"] = max(self._stats["max_delivery_ms"], elapsed_ms)
+            self._stats["last_error"] = error
+            print(f"Error delivering outbox event {event['idempotency_key']}: {error}")
+            return error
+
+    def stats(self) -> Dict[str, Any]:
+        attempted = self._stats["claimed"] - self._stats["in_flight"]
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "batch_size": self.batch_size,
+            "concurrency": self.concurrency,
+            "avg_delivery_ms": round(self._stats["total_delivery_ms"] / attempted, 2) if attempted else 0.0,
+            **{k: (round(v, 2) if isinstance(v, float) else v) for k, v in self._stats.items()}
+        }
+
+outbox_dispatcher = OutboxDispatcher(OUTBOX_BATCH_SIZE, OUTBOX_CONCURRENCY, OUTBOX_POLL_INTERVAL, OUTBOX_MAX_ATTEMPTS)
+
+async def get_outbox_backlog() -> Dict[str, int]:
+    """Count outbox events by status"""
+    pool = get_db()
+    if not pool:
+        return {}
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT status, COUNT(*) AS count FROM order_outbox GROUP BY status")
+            return {row["status"]: int(row["count"]) for row in await cur.fetchall()}
+
+async def get_aggregate_events(aggregate_id: str) -> List[Dict[str, Any]]:
+    """Delivery state of the events queued for one aggregate (an order), oldest first"""
+    pool = get_db()
+    if not pool:
+        return []
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("""
+                SELECT event_type, status, attempts, last_error, created_at, processed_at
+                FROM order_outbox WHERE aggregate_id = %s ORDER BY id
+            """, (aggregate_id,))
+            return [{
+                "type": row["event_type"],
+                "status": row["status"],
+                "attempts": int(row["attempts"] or 0),
+                "lastError": row["last_error"],
+                "createdAt": row["created_at"].isoformat() if row["created_at"] else None,
+                "processedAt": row["processed_at"].isoformat() if row["processed_at"] else None
+            } for row in await cur.fetchall()]
@@ -124,10 +124,20 @@ def migrate():
                 FOREIGN KEY (customer_loyalty_id) REFERENCES customer_loyalty(id) ON DELETE CASCADE,
                 INDEX idx_customer_loyalty (customer_loyalty_id),
                 INDEX idx_transaction_type (transaction_type),
-                INDEX idx_order_id (order_id)
+                INDEX idx_order_id (order_id),
+                UNIQUE KEY unique_order_transaction (order_id, transaction_type)
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
         """)
 
+        # One transaction of each type per order on existing tables (earnPoints relies on it to credit an order once)
+        try:
+            cursor.execute(
+                "ALTER TABLE loyalty_transactions ADD UNIQUE KEY unique_order_transaction (order_id, transaction_type)"
+            )
+        except Exception as e:
+            if "Duplicate key name" not in str(e):
+                print(f"⚠️  Could not add unique_order_transaction on loyalty_transactions: {e}")
+
         # Create refresh_tokens table for JWT refresh token support
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS refresh_tokens (
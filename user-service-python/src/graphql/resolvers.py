@@ -5,6 +5,7 @@ import hashlib
 import secrets
 from datetime import datetime, timedelta
 from ariadne import QueryType, MutationType, ObjectType
+from mysql.connector import IntegrityError, errorcode
 from src.database.connection import get_db_connection
 from src.auth import require_auth, require_min_role
 
@@ -12,6 +13,7 @@ JWT_SECRET = "rahasia-negara-api-key-2024"
 REFRESH_TOKEN_SECRET = "refresh-secret-key-change-in-production"
 ACCESS_TOKEN_EXPIRY_HOURS = 7  # 7 hours like Apollo JS
 REFRESH_TOKEN_EXPIRY_DAYS = 7  # 7 days like Apollo JS
+DEFAULT_LOYALTY_PROGRAM_ID = 1  # "Anugerah Rewards", seeded by migrate.py
 
 query = QueryType()
 mutation = MutationType()
@@ -727,36 +729,53 @@ def resolve_earn_points(_, info, customerId: str, points: float, orderId: Option
     cursor = conn.cursor(dictionary=True)
     
     try:
-        # Get or create loyalty record
+        # Get or create the loyalty record, locked so concurrent credits for the customer run one at a time
         cursor.execute(
-            "SELECT * FROM customer_loyalty WHERE customer_id = %s AND status = 'active' LIMIT 1",
+            "SELECT id FROM customer_loyalty WHERE customer_id = %s AND status = 'active' LIMIT 1 FOR UPDATE",
             (customerId,)
         )
         loyalty = cursor.fetchone()
         
         if not loyalty:
             cursor.execute("""
-                INSERT INTO customer_loyalty (customer_id, total_points, redeemed_points, tier, status)
-                VALUES (%s, %s, 0, 'bronze', 'active')
-            """, (customerId, points))
+                INSERT INTO customer_loyalty (customer_id, loyalty_program_id, total_points, redeemed_points, tier, status)
+                VALUES (%s, %s, 0, 0, 'bronze', 'active')
+            """, (customerId, DEFAULT_LOYALTY_PROGRAM_ID))
             loyalty_id = cursor.lastrowid
         else:
             loyalty_id = loyalty['id']
+        
+        # Points for an order are credited once: the unique (order_id, transaction_type) key rejects a repeated
+        # or concurrent credit, which returns the original transaction without touching the balance
+        existing = None
+        try:
+            cursor.execute("""
+                INSERT INTO loyalty_transactions (customer_loyalty_id, transaction_type, points, order_id, description)
+                VALUES (%s, 'earn', %s, %s, %s)
+            """, (loyalty_id, points, orderId, description))
+        except IntegrityError as e:
+            if e.errno != errorcode.ER_DUP_ENTRY or not orderId:
+                raise
+            conn.rollback()
+            cursor.execute("""
+                SELECT id FROM loyalty_transactions
+                WHERE order_id = %s AND transaction_type = 'earn'
+                LIMIT 1
+            """, (orderId,))
+            existing = cursor.fetchone()
+        
+        if existing:
+            transaction_id = existing['id']
+        else:
+            transaction_id = cursor.lastrowid
             cursor.execute("""
                 UPDATE customer_loyalty 
-                SET total_points = total_points + %s 
+                SET total_points = total_points + %s, last_activity_date = CURRENT_DATE
                 WHERE id = %s
             """, (points, loyalty_id))
+            conn.commit()
         
-        # Create transaction
-        cursor.execute("""
-            INSERT INTO loyalty_transactions (customer_id, transaction_type, points, order_id, description)
-            VALUES (%s, 'earned', %s, %s, %s)
-        """, (customerId, points, orderId, description))
-        
-        conn.commit()
-        
-        cursor.execute("SELECT * FROM loyalty_transactions WHERE id = %s", (cursor.lastrowid,))
+        cursor.execute("SELECT * FROM loyalty_transactions WHERE id = %s", (transaction_id,))
         transaction = cursor.fetchone()
         
         return {